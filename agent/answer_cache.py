@@ -0,0 +1,169 @@
+"""Answer-level cache that serves repeated knowledge questions without calling the LLM."""
+
+import json
+import re
+import time
+from typing import Any, Dict, List, Literal, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from .cache import TTLCache
+from .config import Configuration
+from .message_store import rehydrate_message
+from .metrics import ANSWER_CACHE_LOOKUPS
+from .state import State
+from .tokens import message_text
+from .tools import _normalize_query, knowledge_version, retrieval
+from .utils import debug_print
+
+_config = Configuration()
+answer_cache = TTLCache(
+    max_entries=_config.answer_cache_max_entries,
+    ttl=_config.answer_cache_ttl,
+    max_bytes=_config.answer_cache_max_bytes,
+)
+
+# Aggregated answer-cache counters
+answer_cache_stats: Dict[str, Any] = {
+    "lookups": 0,
+    "hits": 0,
+    "misses": 0,
+    "denied": 0,
+    "ineligible": 0,
+    "stored": 0,
+    "not_stored": 0,
+    "llm_calls_saved": 0,
+    "ms_saved": 0.0,
+}
+
+# Questions that lean on earlier turns ("and for contractors?", "how do I request it?")
+_FOLLOW_UP = re.compile(
+    r"^\s*(and|also|so|but|then|what about|how about)\b"
+    r"|\b(it|its|that|this|these|those|they|them|their|he|she|him|her|above|previous|earlier|again|same)\b",
+    re.IGNORECASE,
+)
+
+
+def is_follow_up(question: str) -> bool:
+    """Whether a question seems to refer back to earlier turns."""
+    return bool(_FOLLOW_UP.search(question))
+
+
+def _current_turn(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Messages from the latest HumanMessage onwards."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return list(messages[index:])
+    return []
+
+
+def cache_key(state: State) -> str:
+    """Key for the current question, or "" when its answer may depend on the conversation."""
+    messages = state.get("messages", [])
+    turn = _current_turn(messages)
+    if not turn:
+        return ""
+    question = message_text(turn[0])
+    first_turn = len(turn) == len(messages) and not state.get("history_summary")
+    if not first_turn and is_follow_up(question):
+        return ""
+    normalized = _normalize_query(question)
+    if not normalized:
+        return ""
+    company_id = state.get("company_id", 0)
+    # The knowledge version retires every answer of a company once its knowledge changes
+    return f"{company_id}:{knowledge_version(company_id)}:{normalized}"
+
+
+async def answer_cache_lookup(state: State) -> Dict[str, Any]:
+    """
+    Graph node: answers the question from the cache, or records the key for storing the answer.
+
+    The company id is the client's claim, so a hit is served only to a token
+    the knowledge base accepts for that company; anyone else gets a miss.
+    """
+    if not _config.answer_cache_enabled:
+        return {}
+    answer_cache_stats["lookups"] += 1
+    key = cache_key(state)
+    if not key:
+        answer_cache_stats["ineligible"] += 1
+        ANSWER_CACHE_LOOKUPS.inc(result="ineligible")
+        return {"answer_cache_key": ""}
+
+    started = time.perf_counter()
+    found, entry = answer_cache.get(key)
+    if found and await retrieval.authorize(state.get("auth_token") or "", state.get("company_id", 0)) is not None:
+        answer_cache_stats["denied"] += 1
+        found = False
+    if not found:
+        answer_cache_stats["misses"] += 1
+        ANSWER_CACHE_LOOKUPS.inc(result="miss")
+        return {"answer_cache_key": key, "turn_started_at": time.time()}
+
+    answer_cache_stats["hits"] += 1
+    answer_cache_stats["llm_calls_saved"] += entry["llm_calls"]
+    answer_cache_stats["ms_saved"] += max(0.0, entry["cost_ms"] - (time.perf_counter() - started) * 1000)
+    ANSWER_CACHE_LOOKUPS.inc(result="hit")
+    debug_print("Answer cache hit:", key)
+    return {
+        "messages": [AIMessage(content=entry["content"])],
+        "answer_cache_key": "",
+        "welcome_message": True,
+        "last_error": "",
+    }
+
+
+def route_answer_cache(state: State) -> Literal["fast_path", "__end__"]:
+    """Ends the turn when the cache already answered it."""
+    messages = state.get("messages", [])
+    return "__end__" if messages and isinstance(messages[-1], AIMessage) else "fast_path"
+
+
+async def _used_knowledge(turn: Sequence[BaseMessage]) -> bool:
+    """Whether a document_knowledge call in this turn succeeded."""
+    for message in turn:
+        if isinstance(message, ToolMessage) and message.name == "document_knowledge":
+            try:
+                if json.loads(message_text(await rehydrate_message(message))).get("success"):
+                    return True
+            except (json.JSONDecodeError, AttributeError):
+                continue
+    return False
+
+
+def _is_personal(state: State, content: str) -> bool:
+    """Answers naming the user would leak to colleagues asking the same question."""
+    lowered = content.lower()
+    values = (state.get(k) for k in ("first_name", "last_name", "full_name", "email"))
+    return any(value and len(value) >= 3 and value.lower() in lowered for value in values)
+
+
+async def store_answer(state: State, answer: BaseMessage) -> None:
+    """Store the final answer of a cacheable turn that was grounded in the knowledge base."""
+    key = state.get("answer_cache_key")
+    if not _config.answer_cache_enabled or not key:
+        return
+    turn = _current_turn(state.get("messages", []))
+    content = message_text(answer)
+    if not content or state.get("last_error") or not await _used_knowledge(turn) or _is_personal(state, content):
+        answer_cache_stats["not_stored"] += 1
+        return
+    started_at: Optional[float] = state.get("turn_started_at")
+    answer_cache.set(key, {
+        "content": content,
+        # The final answer plus every tool-calling LLM response of this turn (not fast-path ones)
+        "llm_calls": 1 + sum(1 for m in turn if isinstance(m, AIMessage) and m.name != "fast_path"),
+        "cost_ms": (time.time() - started_at) * 1000 if started_at else 0.0,
+    })
+    answer_cache_stats["stored"] += 1
+
+
+def invalidate_company_answers(company_id: int) -> int:
+    """Free a company's stored answers now; the knowledge version bump already made them unreachable."""
+    prefix = f"{company_id}:"
+    return answer_cache.invalidate(lambda key: key.startswith(prefix))
+
+
+def answer_cache_summary() -> Dict[str, Any]:
+    return {**answer_cache.stats(), **answer_cache_stats, "ms_saved": round(answer_cache_stats["ms_saved"], 1)}
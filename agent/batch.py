@@ -0,0 +1,185 @@
+"""Bulk question runs through the agent graph with ephemeral, never-persisted sessions."""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from .concurrency import ConcurrencyLimiter, QueueFullError
+from .graph import workflow
+from .tokens import message_text
+
+# Compiled without a checkpointer: batch runs leave nothing behind
+_batch_graph = None
+
+
+def _get_batch_graph():
+    global _batch_graph
+    if _batch_graph is None:
+        _batch_graph = workflow.compile()
+    return _batch_graph
+
+
+async def ndjson_items(chunks: AsyncIterable[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    """Decode an NDJSON byte stream incrementally; malformed lines become ``{"_error": ...}`` items."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode(line)
+    if buffer.strip():
+        yield _decode(buffer)
+
+
+def _decode(line: bytes) -> Dict[str, Any]:
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"_error": f"Invalid JSON: {e}"}
+    return item if isinstance(item, dict) else {"_error": "Each line must be a JSON object"}
+
+
+def _initial_state(item: Dict[str, Any], auth_token: str) -> Dict[str, Any]:
+    return {
+        "auth_token": item.get("auth_token") or auth_token,
+        "user_id": 0,
+        "company_id": int(item["company_id"]),
+        "email": "",
+        "first_name": "",
+        "last_name": "",
+        "full_name": "",
+        "company_name": item.get("company_name", ""),
+        "init": True,
+        # No greeting in evaluation answers
+        "welcome_message": True,
+        "messages": [HumanMessage(content=str(item["question"]))],
+    }
+
+
+async def run_item(index: int, item: Dict[str, Any], auth_token: str) -> Dict[str, Any]:
+    """Run one question through the graph and report the answer with latency and token stats."""
+    result: Dict[str, Any] = {"index": index, "id": item.get("id"), "company_id": item.get("company_id")}
+    if "_error" in item:
+        return {**result, "status": "error", "error": item["_error"], "latency_ms": 0.0}
+    if "question" not in item or "company_id" not in item:
+        return {**result, "status": "error", "error": "Items need 'company_id' and 'question'", "latency_ms": 0.0}
+
+    started = time.perf_counter()
+    try:
+        final = await _get_batch_graph().ainvoke(
+            _initial_state(item, auth_token),
+            config={"configurable": {"thread_id": f"batch-{uuid.uuid4()}"}},
+        )
+    except Exception as e:
+        return {
+            **result,
+            "question": item["question"],
+            "status": "error",
+            "error": f"{e.__class__.__name__}: {e}",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    ai_messages = [m for m in final.get("messages", []) if isinstance(m, AIMessage)]
+    usage = [m.usage_metadata for m in ai_messages if m.usage_metadata]
+    answer = ai_messages[-1] if ai_messages else None
+    return {
+        **result,
+        "question": item["question"],
+        "status": "error" if final.get("last_error") else "ok",
+        "answer": message_text(answer) if answer is not None else "",
+        "error": final.get("last_error") or None,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "llm_calls": len(usage),
+        "tool_calls": sum(len(m.tool_calls or []) for m in ai_messages),
+        "prompt_tokens": sum(u.get("input_tokens", 0) for u in usage),
+        "completion_tokens": sum(u.get("output_tokens", 0) for u in usage),
+    }
+
+
+async def _run_admitted(index: int, item: Dict[str, Any], auth_token: str, limiter: Optional[ConcurrencyLimiter]) -> Dict[str, Any]:
+    """``run_item`` inside a run slot of ``limiter``, waiting (not failing) while the limiter is saturated."""
+    if limiter is None:
+        return await run_item(index, item, auth_token)
+    while True:
+        try:
+            await limiter.acquire()
+            break
+        except QueueFullError as e:
+            await asyncio.sleep(e.retry_after)
+    started = time.perf_counter()
+    try:
+        return await run_item(index, item, auth_token)
+    finally:
+        limiter.release(time.perf_counter() - started)
+
+
+async def run_batch(
+    items: AsyncIterable[Dict[str, Any]],
+    concurrency: int,
+    auth_token: str = "",
+    limiter: Optional[ConcurrencyLimiter] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run items through the graph with ``concurrency`` workers and yield results in completion order.
+
+    Input is read lazily through a bounded queue, so a large upload is never
+    held in memory at once. With a ``limiter`` every item takes one of its run
+    slots like a chat turn, so batches share the worker's capacity with
+    interactive traffic. A final ``{"type": "summary"}`` record closes the stream.
+    """
+    pending: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue(maxsize=concurrency * 2)
+    results: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            index = 0
+            async for item in items:
+                await pending.put((index, item))
+                index += 1
+        finally:
+            for _ in range(concurrency):
+                await pending.put(None)
+
+    async def work() -> None:
+        try:
+            while (job := await pending.get()) is not None:
+                await results.put(await _run_admitted(job[0], job[1], auth_token, limiter))
+        finally:
+            await results.put(None)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    latencies: List[float] = []
+    summary = {"type": "summary", "items": 0, "ok": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    try:
+        running = concurrency
+        while running:
+            result = await results.get()
+            if result is None:
+                running -= 1
+                continue
+            summary["items"] += 1
+            summary["ok" if result["status"] == "ok" else "errors"] += 1
+            summary["prompt_tokens"] += result.get("prompt_tokens", 0)
+            summary["completion_tokens"] += result.get("completion_tokens", 0)
+            latencies.append(result["latency_ms"])
+            yield {"type": "result", **result}
+        await tasks[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    duration = time.perf_counter() - started
+    latencies.sort()
+    summary.update({
+        "duration_ms": round(duration * 1000, 2),
+        "items_per_second": round(summary["items"] / duration, 3) if duration else 0.0,
+        "p50_latency_ms": latencies[len(latencies) // 2] if latencies else None,
+        "p95_latency_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+    })
+    yield summary
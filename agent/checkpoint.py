@@ -0,0 +1,536 @@
+"""Durable SQLite checkpointer for the OnboardKit agent starter kit."""
+
+import asyncio
+import pathlib
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from .config import Configuration
+from .message_store import COMPACT_TYPE, create_serializer, use_payload_store
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS tool_payloads (
+    ref TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    stored_at REAL NOT NULL
+);
+"""
+
+# Suffix marking a zlib-compressed payload in the ``type`` column
+_COMPRESSED = "+z"
+
+_Statement = Tuple[str, Sequence[tuple]]
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    A file-backed checkpointer using SQLite in WAL mode.
+
+    - Channel values are stored once per channel version in ``blobs``; each
+      checkpoint row only references versions, so a step writes the channels
+      it changed (delta writes) instead of a full copy of the state.
+    - Payloads above ``compress_threshold`` bytes are zlib-compressed.
+    - Concurrent async writes are grouped into one transaction per flush
+      (group commit); callers still wait until their batch is committed.
+    - Any process opening the same file can resume any thread, so several
+      uvicorn workers can share one database. Offloaded tool results are
+      stored here too (``tool_payloads``, shared by all threads and dropped
+      ``payload_ttl`` seconds after their last use).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        flush_interval: float = 0.005,
+        max_batch: int = 64,
+        keep_last: int = 20,
+        compress_threshold: int = 1024,
+        payload_ttl: Optional[float] = None,
+        serde: Optional[Any] = None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.keep_last = keep_last
+        self.compress_threshold = compress_threshold
+        self.payload_ttl = payload_ttl
+        self._payloads_pruned_at = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        # Read-only connections, one per thread, for reads that must not queue behind writes
+        self._readers = threading.local()
+        self._pending: List[Tuple[List[_Statement], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._stats = {"flushes": 0, "batched_writes": 0, "bytes_written": 0}
+
+    # --- Serialization ---
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) > self.compress_threshold and type_ != COMPACT_TYPE:
+            return type_ + _COMPRESSED, zlib.compress(data, 6)
+        return type_, data
+
+    def _load(self, type_: str, data: Optional[bytes]) -> Any:
+        if type_.endswith(_COMPRESSED):
+            type_, data = type_[: -len(_COMPRESSED)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # --- Versions ---
+
+    def get_next_version(self, current: Optional[str], channel: Any = None) -> str:
+        """Zero-padded string versions sort correctly as TEXT (same scheme as MemorySaver)."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Statement builders ---
+
+    def _put_statements(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> Tuple[RunnableConfig, List[_Statement]]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        stored = {**checkpoint}
+        values = stored.pop("channel_values", {}) or {}
+
+        blobs = []
+        for channel, version in new_versions.items():
+            if channel in values:
+                type_, data = self._dump(values[channel])
+            else:
+                type_, data = "empty", None
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, data))
+
+        checkpoint_type, checkpoint_data = self._dump(stored)
+        metadata_type, metadata_data = self._dump(metadata)
+        row = (
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            configurable.get("checkpoint_id"),
+            checkpoint_type,
+            checkpoint_data,
+            metadata_type,
+            metadata_data,
+        )
+        statements: List[_Statement] = [
+            ("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs),
+            ("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [row]),
+        ]
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        return next_config, statements
+
+    def _writes_statements(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> List[_Statement]:
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append((
+                configurable["thread_id"],
+                configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"],
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                type_,
+                data,
+                task_path,
+            ))
+        # Special writes (errors, interrupts) overwrite, regular writes are first-wins
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        return [(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)]
+
+    def _delete_statements(self, thread_id: str) -> List[_Statement]:
+        return [
+            (f"DELETE FROM {table} WHERE thread_id = ?", [(str(thread_id),)])
+            for table in ("checkpoints", "blobs", "writes")
+        ]
+
+    # --- Execution ---
+
+    def _execute(self, statements: List[_Statement]) -> None:
+        """Run statements in a single transaction, then prune touched threads."""
+        threads = set()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, rows in statements:
+                    if rows:
+                        self._conn.executemany(sql, rows)
+                        if sql.startswith("INSERT OR REPLACE INTO checkpoints"):
+                            threads.update((row[0], row[1]) for row in rows)
+                        self._stats["bytes_written"] += sum(
+                            len(value) for row in rows for value in row if isinstance(value, bytes)
+                        )
+                for thread_id, checkpoint_ns in threads:
+                    self._prune(thread_id, checkpoint_ns)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Keep the newest ``keep_last`` checkpoints and drop blobs no kept checkpoint can reference."""
+        if self.keep_last <= 0:
+            return
+        oldest_kept = self._conn.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last - 1),
+        ).fetchone()
+        if oldest_kept is None:
+            return
+        checkpoint_id, type_, data = oldest_kept
+        key = (thread_id, checkpoint_ns, checkpoint_id)
+        self._conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", key
+        )
+        self._conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", key
+        )
+        # Versions only grow, so anything older than what the oldest kept checkpoint references is garbage
+        for channel, version in self._load(type_, data).get("channel_versions", {}).items():
+            self._conn.execute(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version < ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            )
+
+    async def _submit(self, statements: List[_Statement]) -> None:
+        """Queue statements for the next group commit and wait until it is durable."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((statements, future))
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush(loop, 0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, self.flush_interval)
+        await future
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(delay, lambda: asyncio.ensure_future(self._flush()))
+
+    async def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        statements = [statement for statements, _ in batch for statement in statements]
+        try:
+            await asyncio.to_thread(self._execute, statements)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._stats["flushes"] += 1
+        self._stats["batched_writes"] += len(batch)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": len(self._pending), "path": self.path}
+
+    # --- Tool payloads ---
+
+    async def aput_payloads(self, payloads: Sequence[Tuple[str, str]]) -> None:
+        """Store offloaded tool results (``(ref, content)``) with the next group commit; a known ref only refreshes its age."""
+        now = time.time()
+        rows = [(ref, zlib.compress(content.encode(), 6), now) for ref, content in payloads]
+        statements: List[_Statement] = [(
+            "INSERT INTO tool_payloads VALUES (?, ?, ?) ON CONFLICT(ref) DO UPDATE SET stored_at = excluded.stored_at",
+            rows,
+        )]
+        # Expired payloads can only be referenced by sessions that were evicted as idle
+        if self.payload_ttl and now - self._payloads_pruned_at > min(self.payload_ttl, 60.0):
+            self._payloads_pruned_at = now
+            statements.append(("DELETE FROM tool_payloads WHERE stored_at < ?", [(now - self.payload_ttl,)]))
+        await self._submit(statements)
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection; in WAL mode it reads while a write is in progress."""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            uri = pathlib.Path(self.path).absolute().as_uri() + "?mode=ro"
+            conn = self._readers.conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30.0)
+        return conn
+
+    def get_payload(self, ref: str) -> Optional[str]:
+        row = self._reader().execute("SELECT payload FROM tool_payloads WHERE ref = ?", (ref,)).fetchone()
+        return zlib.decompress(row[0]).decode() if row else None
+
+    async def aget_payload(self, ref: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_payload, ref)
+
+    def stored_bytes(self) -> int:
+        """Bytes of the database pages in use across all threads, from the page counts rather than a table scan."""
+        conn = self._reader()
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return pages * conn.execute("PRAGMA page_size").fetchone()[0]
+
+    # --- Reads ---
+
+    def _row_to_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, data, metadata_type, metadata_data = row
+        checkpoint = self._load(type_, data)
+        channel_values = {}
+        for channel, version in checkpoint.get("channel_versions", {}).items():
+            blob = self._conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self._load(*blob)
+        checkpoint["channel_values"] = channel_values
+
+        pending_writes = [
+            (task_id, channel, self._load(write_type, write_data))
+            for task_id, channel, write_type, write_data in self._conn.execute(
+                "SELECT task_id, channel, type, blob FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        ]
+        parent_config = None
+        if parent_checkpoint_id:
+            parent_config = {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            }
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=self._load(metadata_type, metadata_data),
+            parent_config=parent_config,
+            pending_writes=pending_writes,
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        with self._db_lock:
+            if checkpoint_id:
+                row = self._conn.execute(
+                    query + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)
+                ).fetchone()
+            return self._row_to_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(str(config["configurable"]["thread_id"]))
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+        if before:
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        results = []
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter:
+                    metadata = self._load(row[4], row[5])
+                    if any(metadata.get(k) != v for k, v in filter.items()):
+                        continue
+                results.append(self._row_to_tuple(thread_id, checkpoint_ns, tuple(row)))
+        yield from results
+
+    # --- Sync writes ---
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config, statements = self._put_statements(config, checkpoint, metadata, new_versions)
+        self._execute(statements)
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._execute(self._writes_statements(config, writes, task_id, task_path))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._execute(self._delete_statements(thread_id))
+
+    # --- Async API ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in results:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config, statements = self._put_statements(config, checkpoint, metadata, new_versions)
+        await self._submit(statements)
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._submit(self._writes_statements(config, writes, task_id, task_path))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._submit(self._delete_statements(thread_id))
+
+
+def create_checkpointer(config: Optional[Configuration] = None) -> BaseCheckpointSaver:
+    """Build the checkpointer selected by ``Configuration.checkpointer``."""
+    config = config or Configuration()
+    if config.checkpointer == "sqlite":
+        saver = SQLiteCheckpointSaver(
+            config.checkpoint_path,
+            flush_interval=config.checkpoint_flush_interval,
+            max_batch=config.checkpoint_max_batch,
+            keep_last=config.checkpoint_keep_last,
+            payload_ttl=config.session_idle_ttl,
+            serde=create_serializer(config),
+        )
+        # Offloaded tool results must be readable by whichever worker resumes the session
+        use_payload_store(saver)
+        return saver
+    return MemorySaver(serde=create_serializer(config))
@@ -0,0 +1,131 @@
+"""Token-budgeted history compaction for the OnboardKit agent starter kit."""
+
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, ToolMessage
+
+from .config import Configuration
+from .message_store import rehydrate_messages
+from .state import State
+from .tokens import count_message_tokens, count_tokens, message_text
+from .utils import debug_print
+
+_config = Configuration()
+
+TOOL_STUB_PREFIX = "[compacted tool result"
+
+
+def _split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns; each turn starts at a HumanMessage."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _stub_tool_message(message: ToolMessage, tokens: int) -> ToolMessage:
+    """Replace a bulky tool payload with a short stub; same id, so add_messages swaps it in place."""
+    return ToolMessage(
+        content=f"{TOOL_STUB_PREFIX}: {message.name or 'tool'} returned ~{tokens} tokens, omitted from history]",
+        id=message.id,
+        tool_call_id=message.tool_call_id,
+        name=message.name,
+    )
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _summarize_turn(turn: Sequence[BaseMessage]) -> str:
+    """One extractive summary line per folded turn: question, searches and the final answer."""
+    question = next((message_text(m) for m in turn if isinstance(m, HumanMessage)), "")
+    searches = [
+        call["args"].get("query", "")
+        for m in turn if isinstance(m, AIMessage)
+        for call in m.tool_calls or []
+    ]
+    answer = next(
+        (message_text(m) for m in reversed(turn) if isinstance(m, AIMessage) and not m.tool_calls and m.content),
+        "",
+    )
+    line = f"- User: {_shorten(question, 160)}"
+    if searches:
+        line += f" (searched: {'; '.join(_shorten(q, 60) for q in searches if q)})"
+    if answer:
+        line += f" → Assistant: {_shorten(answer, 240)}"
+    return line
+
+
+def _roll_summary(summary: str, new_lines: List[str], budget: int) -> str:
+    """Append new lines to the rolling summary, dropping the oldest lines beyond the budget."""
+    lines = [line for line in summary.splitlines() if line] + new_lines
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+async def compact_history(state: State) -> Dict[str, Any]:
+    """
+    Keeps the conversation history within ``history_token_budget``.
+
+    Only runs when the history is over budget. The last ``history_keep_turns``
+    turns stay verbatim; older tool payloads are replaced with stubs first, and
+    if that is not enough the oldest turns are folded into ``history_summary``.
+    The summary is extended incrementally, never rebuilt from the full history.
+    """
+    # Counted at full size: offloaded tool results still reach the LLM
+    messages = await rehydrate_messages(state.get("messages", []))
+    summary = state.get("history_summary", "")
+    before = count_message_tokens(messages, _config.model) + count_tokens(summary, _config.model)
+    stats = {"tokens_before": before, "tokens_after": before, "stubbed": 0, "folded_turns": 0}
+
+    turns = _split_turns(messages)
+    old_turns = turns[: -_config.history_keep_turns] if _config.history_keep_turns else turns
+    if before <= _config.history_token_budget or not old_turns:
+        return {"compaction_stats": stats}
+
+    total = before
+    updates: List[BaseMessage] = []
+    replaced: Dict[str, BaseMessage] = {}
+
+    # 1. Stub bulky tool payloads outside the verbatim window
+    for turn in old_turns:
+        for message in turn:
+            if not isinstance(message, ToolMessage) or message_text(message).startswith(TOOL_STUB_PREFIX):
+                continue
+            tokens = count_tokens(message_text(message), _config.model)
+            stub = _stub_tool_message(message, tokens)
+            saved = tokens - count_tokens(stub.content, _config.model)
+            if saved > 0:
+                updates.append(stub)
+                replaced[message.id] = stub
+                total -= saved
+                stats["stubbed"] += 1
+
+    # 2. Fold the oldest turns into the rolling summary until the budget is met
+    new_lines: List[str] = []
+    for turn in old_turns:
+        if total <= _config.history_token_budget:
+            break
+        current = [replaced.get(m.id, m) for m in turn]
+        total -= count_message_tokens(current, _config.model)
+        new_lines.append(_summarize_turn(turn))
+        updates = [m for m in updates if m.id not in {c.id for c in current}]
+        updates.extend(RemoveMessage(id=m.id) for m in turn)
+        stats["folded_turns"] += 1
+
+    result: Dict[str, Any] = {"messages": updates}
+    if new_lines:
+        total -= count_tokens(summary, _config.model)
+        summary = _roll_summary(summary, new_lines, _config.history_summary_token_budget)
+        total += count_tokens(summary, _config.model)
+        result["history_summary"] = summary
+
+    stats["tokens_after"] = total
+    result["compaction_stats"] = stats
+    debug_print("History compaction:", stats)
+    return result
@@ -0,0 +1,214 @@
+"""Rule-based fast path that answers small talk and routes plain knowledge questions without an LLM call."""
+
+import math
+import re
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from .answer_cache import is_follow_up
+from .config import Configuration
+from .metrics import metrics
+from .state import State
+from .tokens import message_text
+from .utils import debug_print
+
+_config = Configuration()
+
+FAST_PATH_ROUTES = metrics.counter("onboardkit_fast_path_routes", "Fast-path routing decisions")
+
+# Per-route counters
+fast_path_stats: Dict[str, int] = {
+    "greeting": 0,
+    "acknowledgement": 0,
+    "farewell": 0,
+    "knowledge": 0,
+    "llm": 0,
+    "classified": 0,
+}
+
+# --- Rules ---
+# Matched against the whole normalized message, so "hi, where is the handbook?" is not small talk
+_GREETING = re.compile(
+    r"^(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening)|morning)( there| all| team| everyone)?$"
+)
+_ACKNOWLEDGEMENT = re.compile(
+    r"^((ok|okay|k|great|cool|awesome|perfect|nice|got it|sounds good|understood|noted|brilliant)( thanks| thank you)?"
+    r"|(thanks|thank you|thx|ty|cheers|many thanks)( so much| very much| a lot)?( for the help| for your help)?)$"
+)
+_FAREWELL = re.compile(r"^(bye|goodbye|see you|see ya|that's all|that is all)( for now| then| thanks)?$")
+_QUESTION_START = re.compile(r"^(what|how|when|where|who|which|why|can|could|do|does|is|are|should|will)\b")
+_WORD = re.compile(r"[a-z0-9']+")
+# Onboarding topics the knowledge base covers; a plain question must name one to skip the LLM
+_KB_TERMS = frozenset(
+    "onboarding handbook policy policies holiday holidays vacation pto leave sick parental absence benefits benefit "
+    "insurance health dental vision pension 401k retirement payroll payday pay salary payslip bonus equity stock "
+    "expenses expense reimbursement travel laptop equipment hardware software badge access building office desk "
+    "parking wifi vpn password email account login portal security training course mandatory compliance manager "
+    "hr contract probation notice hours schedule shift remote hybrid overtime timesheet dress code lunch canteen "
+    "relocation visa referral review performance".split()
+)
+# Questions about the conversation itself ("could you rephrase your last answer?") are the LLM's
+_CONVERSATIONAL = re.compile(
+    r"\b(you|your|yours|yourself|rephrase|repeat|reword|summari[sz]e|answer|answers|said|say|meant|mean|"
+    r"last|previous|earlier|above|again|that|this|it|those|these)\b"
+)
+_STOPWORDS = frozenset(
+    "a an the is are was were be do does did i me my we our you your to of for in on at by with and or "
+    "what how when where who which why can could should will".split()
+)
+
+_TEMPLATES = {
+    "greeting": "Hi{name}! Welcome to {company}. I can help with onboarding questions about policies, benefits, "
+                "equipment and more. What would you like to know?",
+    "greeting_again": "Hi{name}! What else can I help you with?",
+    "acknowledgement": "You're welcome{name}! Let me know if there's anything else I can help with.",
+    "farewell": "Goodbye{name}! Come back any time you have more onboarding questions.",
+}
+
+# --- Optional local classifier (multinomial naive Bayes over seed phrases) ---
+_SEEDS = {
+    "greeting": ["hi", "hello there", "hey team", "good morning", "hiya", "hello again", "hey hey", "morning all"],
+    "acknowledgement": ["thanks", "thank you so much", "ok great", "perfect thanks", "got it", "cool thank you",
+                        "appreciate it", "that helps", "brilliant cheers", "ok understood"],
+    "farewell": ["bye", "goodbye", "see you later", "talk soon", "that's all for now"],
+    "knowledge": ["what is the holiday policy", "how do i get a laptop", "where is the employee handbook",
+                  "when is payday", "how many vacation days do i have", "who do i ask for building access",
+                  "what benefits do we get", "how do i submit expenses", "which training is mandatory"],
+}
+
+
+class _NaiveBayes:
+    def __init__(self, seeds: Dict[str, List[str]]):
+        self.vocabulary = set()
+        self.counts: Dict[str, Counter] = {}
+        for label, phrases in seeds.items():
+            words = [w for phrase in phrases for w in _WORD.findall(phrase)]
+            self.counts[label] = Counter(words)
+            self.vocabulary.update(words)
+        self.totals = {label: sum(c.values()) for label, c in self.counts.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label and its posterior probability (uniform prior, Laplace smoothing)."""
+        words = [w for w in _WORD.findall(text) if w in self.vocabulary]
+        if not words:
+            return "", 0.0
+        size = len(self.vocabulary)
+        scores = {
+            label: sum(math.log((counts[w] + 1) / (self.totals[label] + size)) for w in words)
+            for label, counts in self.counts.items()
+        }
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / norm
+
+
+_classifier: Optional[_NaiveBayes] = None
+
+
+def _classify(text: str) -> Tuple[str, float]:
+    global _classifier
+    if _classifier is None:
+        _classifier = _NaiveBayes(_SEEDS)
+    return _classifier.predict(text)
+
+
+# --- Routing ---
+def _normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _asks_knowledge_base(normalized: str, terms: List[str]) -> bool:
+    """Positive evidence that a question is for the knowledge base: a topic term, or the classifier's confident vote."""
+    if _CONVERSATIONAL.search(normalized):
+        return False
+    if any(term in _KB_TERMS or term.rstrip("s") in _KB_TERMS for term in terms):
+        return True
+    if _config.fast_path_classifier:
+        label, confidence = _classify(normalized)
+        if label == "knowledge" and confidence >= _config.fast_path_classifier_threshold:
+            fast_path_stats["classified"] += 1
+            return True
+    return False
+
+
+def classify_message(text: str, first_turn: bool) -> str:
+    """Route for a user message: greeting, acknowledgement, farewell, knowledge or llm."""
+    normalized = _normalize(text)
+    if not normalized:
+        return "llm"
+    if _GREETING.match(normalized):
+        return "greeting"
+    if _ACKNOWLEDGEMENT.match(normalized):
+        return "acknowledgement"
+    if _FAREWELL.match(normalized):
+        return "farewell"
+
+    terms = [w for w in normalized.split() if w not in _STOPWORDS]
+    asks = text.strip().endswith("?") or _QUESTION_START.match(normalized)
+    # One self-contained question about an onboarding topic; several questions, follow-ups and
+    # anything about the conversation itself need the LLM
+    if (
+        asks and len(terms) >= 2 and text.count("?") <= 1 and len(text) <= 200
+        and (first_turn or not is_follow_up(text)) and _asks_knowledge_base(normalized, terms)
+    ):
+        return "knowledge"
+
+    # Small talk only: questions the rules rejected (follow-ups, several questions) stay with the LLM
+    if _config.fast_path_classifier and len(normalized.split()) <= 8:
+        label, confidence = _classify(normalized)
+        if label in _TEMPLATES and confidence >= _config.fast_path_classifier_threshold:
+            fast_path_stats["classified"] += 1
+            return label
+    return "llm"
+
+
+def _template(route: str, state: State) -> str:
+    first_name = state.get("first_name") or (state.get("full_name") or "").split(" ")[0]
+    name = f", {first_name}" if route != "greeting" and first_name else (f" {first_name}" if first_name else "")
+    if route == "greeting" and state.get("welcome_message"):
+        route = "greeting_again"
+    return _TEMPLATES[route].format(name=name, company=state.get("company_name") or "the team")
+
+
+def fast_path(state: State) -> Dict[str, Any]:
+    """Graph node: answers small talk from templates and sends plain questions straight to the tools."""
+    if not _config.fast_path_enabled:
+        return {}
+    messages = state.get("messages", [])
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return {}
+
+    text = message_text(messages[-1])
+    first_turn = len(messages) == 1 and not state.get("history_summary")
+    route = classify_message(text, first_turn)
+    fast_path_stats[route] += 1
+    FAST_PATH_ROUTES.inc(route=route)
+    debug_print("Fast path route:", route)
+
+    if route == "llm":
+        return {}
+    if route == "knowledge":
+        # Synthetic tool call; react_agent writes the answer once the search results are in
+        call = {"name": "document_knowledge", "args": {"query": text.strip()}, "id": f"call_{uuid.uuid4().hex[:24]}"}
+        return {"messages": [AIMessage(content="", tool_calls=[call], name="fast_path")]}
+    return {
+        "messages": [AIMessage(content=_template(route, state), name="fast_path")],
+        "welcome_message": True,
+        "last_error": "",
+    }
+
+
+def route_fast_path(state: State) -> Literal["react_agent", "tools", "__end__"]:
+    """Tools for a synthetic search, end for a template answer, otherwise the LLM."""
+    last = state.get("messages", [])[-1]
+    if isinstance(last, AIMessage):
+        return "tools" if last.tool_calls else "__end__"
+    return "react_agent"
+
+
+def fast_path_summary() -> Dict[str, Any]:
+    total = sum(v for k, v in fast_path_stats.items() if k != "classified")
+    return {**fast_path_stats, "bypass_rate": round(1 - fast_path_stats["llm"] / total, 4) if total else 0.0}
@@ -1,38 +1,120 @@
 """Streamlined, state-driven graph for the OnboardKit agent starter kit."""
 
-from typing import Any, Dict, Literal
-from langchain_core.messages import ToolMessage, BaseMessage, AIMessage
+import inspect
+import time
+from typing import Any, Callable, Dict, Literal
+from langchain_core.messages import ToolMessage, BaseMessage, AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
 
+from .answer_cache import answer_cache_lookup, route_answer_cache, store_answer
+from .checkpoint import create_checkpointer
+from .compaction import compact_history
+from .config import Configuration
+from .fast_path import fast_path, route_fast_path
+from .message_store import offload_tool_payloads
+from .metrics import NODE_DURATION, NODE_ERRORS, ROUTE_DECISIONS, log_event
+from .model_tiers import record_escalation, router_confidence, select_role
+from .prefetch import cancel_prefetch, start_prefetch
 from .state import State
+from .tokens import message_text
 from .tools import TOOLS # Only document_knowledge remains
 from .utils import (
     generate_llm_response, build_result, debug_print
 )
 
+_config = Configuration()
 
-async def react_agent(state: State) -> Dict[str, Any]:
+
+def timed_node(name: str, node: Any) -> Callable[..., Any]:
+    """Wraps a node (function of the state, or a Runnable such as ToolNode) with duration and error metrics."""
+    is_runnable = hasattr(node, "ainvoke")
+    is_async = inspect.iscoroutinefunction(node)
+    takes_config = not is_runnable and "config" in inspect.signature(node).parameters
+
+    async def run(state: State, config: RunnableConfig) -> Any:
+        started = time.perf_counter()
+        try:
+            if is_runnable:
+                return await node.ainvoke(state, config)
+            result = node(state, config) if takes_config else node(state)
+            return await result if is_async else result
+        except Exception as e:
+            NODE_ERRORS.inc(node=name, error=e.__class__.__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            NODE_DURATION.observe(elapsed, node=name)
+            log_event("node", node=name, duration_ms=round(elapsed * 1000, 2))
+
+    run.__name__ = name
+    return run
+
+
+async def react_agent(state: State, config: RunnableConfig) -> Dict[str, Any]:
     """Simplified LLM call with state management."""
     debug_print("react_agent state: ", state)
 
-    llm_output = await generate_llm_response(state)
+    # First LLM call of a turn: optionally search for the user message in parallel
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    messages = state.get("messages", [])
+    prefetching = bool(messages) and isinstance(messages[-1], HumanMessage) and start_prefetch(
+        thread_id, message_text(messages[-1]), state.get("auth_token", ""), state.get("company_id", 0)
+    )
+
+    # The first call of a turn only routes (search or answer directly); later calls write the answer
+    role = select_role(state, _config)
+    llm_output = await generate_llm_response(state, role=role)
+    if role == "router":
+        confidence, reason = router_confidence(llm_output["messages"][-1])
+        if llm_output.get("last_error"):
+            confidence, reason = 0.0, "error"
+        # Anything but a search (a final answer, an error) always goes to the answer tier;
+        # uncertain searches only when escalation is on
+        searched = bool(getattr(llm_output["messages"][-1], "tool_calls", None)) and not llm_output.get("last_error")
+        if not searched or (_config.router_escalation_enabled and confidence < _config.router_min_confidence):
+            # The router decision is dropped, not kept in the history (its tokens were never streamed)
+            debug_print(f"Escalating router decision ({reason}, confidence {confidence})")
+            record_escalation(reason)
+            llm_output = await generate_llm_response(state, role="answer")
     
     # Process the LLM's raw output (response message or tool call)
-    return build_result(llm_output)
+    result = build_result(llm_output)
+
+    answer = result.get("messages", [None])[-1]
+    if prefetching and not (isinstance(answer, AIMessage) and answer.tool_calls):
+        cancel_prefetch(thread_id)
 
+    # Keep final answers of cacheable questions for the next user asking the same
+    if isinstance(answer, AIMessage) and not answer.tool_calls and not llm_output.get("last_error"):
+        await store_answer(state, answer)
+    return result
 
-def route_tools(state: State) -> Literal["react_agent", "__end__"]:
+
+tool_node = ToolNode(TOOLS)
+
+
+async def run_tools(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    """Runs the requested tools; bulky results go to the payload store, the history keeps references."""
+    result = await tool_node.ainvoke(state, config)
+    if isinstance(result, dict) and result.get("messages"):
+        result = {**result, "messages": await offload_tool_payloads(result["messages"])}
+    return result
+
+
+def route_tools(state: State) -> Literal["tools", "__end__"]:
     """Routes to tools if LLM requested them, otherwise to end."""
     last_msg = state.get("messages", [])[-1] if state.get("messages") else None
     
     # Check if the last message contains tool calls
     if last_msg and getattr(last_msg, "tool_calls", []):
         debug_print("Routing to TOOLS")
+        ROUTE_DECISIONS.inc(route="tools")
         return "tools"
     
     debug_print("Routing to END")
+    ROUTE_DECISIONS.inc(route="end")
     return "__end__"
 
 
@@ -40,21 +122,34 @@ def route_tools(state: State) -> Literal["react_agent", "__end__"]:
 workflow = StateGraph(State)
 
 # Nodes:
-# 1. react_agent: LLM calls, decides on response or tool use
-# 2. tools: Executes the document_knowledge tool call
-workflow.add_node("react_agent", react_agent)
-workflow.add_node("tools", ToolNode(TOOLS))
+# 1. compact_history: Keeps the history within the token budget before the LLM sees it
+# 2. answer_cache: Serves repeated knowledge questions from stored answers (when enabled)
+# 3. fast_path: Answers small talk from templates, sends plain questions straight to the tools
+# 4. react_agent: LLM calls, decides on response or tool use
+# 5. tools: Executes the document_knowledge tool call
+workflow.add_node("compact_history", timed_node("compact_history", compact_history))
+workflow.add_node("answer_cache", timed_node("answer_cache", answer_cache_lookup))
+workflow.add_node("fast_path", timed_node("fast_path", fast_path))
+workflow.add_node("react_agent", timed_node("react_agent", react_agent))
+workflow.add_node("tools", timed_node("tools", run_tools))
 
 # Edges/Routing:
-# 1. Entry point: Always start with the agent to get a response (including the welcome message)
-workflow.set_entry_point("react_agent") 
+# 1. Entry point: Compact the history once per turn, then get a response (including the welcome message)
+workflow.set_entry_point("compact_history")
+workflow.add_edge("compact_history", "answer_cache")
+
+# 2. From answer_cache: End the turn on a hit, otherwise try the fast path
+workflow.add_conditional_edges("answer_cache", route_answer_cache)
+
+# 3. From fast_path: End on a template answer, search on a plain question, otherwise ask the LLM
+workflow.add_conditional_edges("fast_path", route_fast_path)
 
-# 2. From react_agent: Route to tools if tool calls are present, otherwise end
+# 4. From react_agent: Route to tools if tool calls are present, otherwise end
 workflow.add_conditional_edges("react_agent", route_tools)
 
-# 3. From tools: Always return to react_agent to process the tool results
+# 5. From tools: Always return to react_agent to process the tool results
 workflow.add_edge("tools", "react_agent")
 
 
-# Compile and persist
-graph = workflow.compile(checkpointer=MemorySaver())
\ No newline at end of file
+# Compile and persist (MemorySaver by default, SQLite when configured)
+graph = workflow.compile(checkpointer=create_checkpointer(Configuration()))
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""Compact storage for the conversation history: tool-payload offloading and a binary message serializer."""
+
+import hashlib
+import sys
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import ormsgpack
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from .cache import TTLCache
+from .config import Configuration
+
+_config = Configuration()
+
+# Serialization type tag of an encoded message list (already compressed)
+COMPACT_TYPE = "compact-messages"
+
+PAYLOAD_REF_KEY = "payload_ref"
+
+# Tool results shared by every session, keyed by content hash so identical searches are stored once
+tool_payloads = TTLCache(
+    max_entries=_config.tool_payload_max_entries,
+    ttl=_config.session_idle_ttl,
+    max_bytes=_config.tool_payload_max_bytes,
+    sizeof=len,
+)
+
+# Durable copy shared by every worker (the SQLite checkpointer); without one, payloads live in this worker only
+_payload_store: Optional[Any] = None
+
+# Aggregated offloading counters
+payload_stats: Dict[str, int] = {
+    "offloaded": 0,
+    "deduplicated": 0,
+    "bytes_offloaded": 0,
+    "rehydrated": 0,
+    "loaded": 0,
+    "missing": 0,
+}
+
+
+def use_payload_store(store: Optional[Any]) -> None:
+    """
+    Persist offloaded payloads in ``store`` (``aput_payloads``/``aget_payload``),
+    so a session checkpointed by one worker can be resumed by another.
+    """
+    global _payload_store
+    _payload_store = store
+
+
+# --- Tool Payload Offloading ---
+async def offload_tool_payloads(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """
+    Move bulky tool results into the payload store; the history keeps a short reference.
+
+    With a durable store the payloads are written before the references are
+    returned, so no checkpoint can point at a payload that was never stored.
+    """
+    if not _config.compact_storage_enabled:
+        return list(messages)
+    result: List[BaseMessage] = []
+    stored: List[Tuple[str, str]] = []
+    for message in messages:
+        content = message.content if isinstance(message, ToolMessage) else None
+        if not isinstance(content, str) or len(content) < _config.tool_payload_offload_min_bytes:
+            result.append(message)
+            continue
+        ref = hashlib.blake2b(content.encode(), digest_size=12).hexdigest()
+        if tool_payloads.get(ref)[0]:
+            payload_stats["deduplicated"] += 1
+        # Stored again either way, which restarts the TTL for the newest reference
+        tool_payloads.set(ref, content)
+        stored.append((ref, content))
+        payload_stats["offloaded"] += 1
+        payload_stats["bytes_offloaded"] += len(content)
+        result.append(message.model_copy(update={
+            "content": f"[tool result {ref}: {len(content)} characters stored separately]",
+            "additional_kwargs": {**message.additional_kwargs, PAYLOAD_REF_KEY: ref},
+        }))
+    if stored and _payload_store is not None:
+        await _payload_store.aput_payloads(stored)
+    return result
+
+
+async def rehydrate_message(message: BaseMessage) -> BaseMessage:
+    """The message with its offloaded tool payload restored (a stub once the payload was evicted)."""
+    ref = message.additional_kwargs.get(PAYLOAD_REF_KEY) if isinstance(message, ToolMessage) else None
+    if ref is None:
+        return message
+    found, content = tool_payloads.get(ref)
+    if not found and _payload_store is not None:
+        # Offloaded by another worker, or evicted here: read the durable copy back into the cache
+        content = await _payload_store.aget_payload(ref)
+        found = content is not None
+        if found:
+            tool_payloads.set(ref, content)
+            payload_stats["loaded"] += 1
+    if found:
+        payload_stats["rehydrated"] += 1
+    else:
+        payload_stats["missing"] += 1
+        content = f"[tool result of {message.name or 'tool'} no longer available]"
+    kwargs = {k: v for k, v in message.additional_kwargs.items() if k != PAYLOAD_REF_KEY}
+    return message.model_copy(update={"content": content, "additional_kwargs": kwargs})
+
+
+async def rehydrate_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    return [await rehydrate_message(message) for message in messages]
+
+
+# --- Binary Message Serialization ---
+_MESSAGE_TYPES = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "tool": ToolMessage,
+    "system": SystemMessage,
+    "remove": RemoveMessage,
+}
+
+
+def _encode_messages(messages: Sequence[BaseMessage]) -> Optional[bytes]:
+    """
+    Encode a message list as ``[strings, rows]`` msgpack, zlib-compressed.
+
+    Each row is ``[type, content, id, name, extras]``. Types, names and the
+    keys of the remaining non-default fields are indices into ``strings``, so
+    a repeated string is stored once per list. Returns None for lists this
+    format does not cover (chunks, custom message classes).
+    """
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    rows = []
+    for message in messages:
+        if _MESSAGE_TYPES.get(message.type) is not type(message):
+            return None
+        fields = message.model_dump(exclude_defaults=True)
+        content = fields.pop("content", "")
+        message_id = fields.pop("id", None)
+        name = fields.pop("name", None)
+        fields.pop("type", None)
+        extras = [item for key, value in fields.items() for item in (intern(key), value)]
+        rows.append([intern(message.type), content, message_id, intern(name), extras])
+    try:
+        packed = ormsgpack.packb([strings, rows])
+    except (TypeError, ormsgpack.MsgpackEncodeError):
+        return None
+    return zlib.compress(packed, 6)
+
+
+def _decode_messages(data: bytes) -> List[BaseMessage]:
+    strings, rows = ormsgpack.unpackb(zlib.decompress(data))
+    # Shared by every message of every session that is loaded
+    strings = [sys.intern(s) for s in strings]
+    messages: List[BaseMessage] = []
+    for type_index, content, message_id, name_index, extras in rows:
+        cls = _MESSAGE_TYPES[strings[type_index]]
+        if cls is RemoveMessage:
+            messages.append(RemoveMessage(id=message_id))
+            continue
+        fields = {strings[extras[i]]: extras[i + 1] for i in range(0, len(extras), 2)}
+        if name_index >= 0:
+            fields["name"] = strings[name_index]
+        messages.append(cls(content=content, id=message_id, **fields))
+    return messages
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """
+    Checkpoint serializer that stores message lists in the compact binary format.
+
+    Always reads both formats, so ``compact=False`` still loads checkpoints
+    written while compact storage was on.
+    """
+
+    def __init__(self, compact: bool = True, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.compact = compact
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if self.compact and isinstance(obj, list) and obj and all(isinstance(item, BaseMessage) for item in obj):
+            data = _encode_messages(obj)
+            if data is not None:
+                return COMPACT_TYPE, data
+        return super().dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        if data[0] == COMPACT_TYPE:
+            return _decode_messages(data[1])
+        return super().loads_typed(data)
+
+
+def create_serializer(config: Optional[Configuration] = None) -> CompactSerializer:
+    config = config or Configuration()
+    return CompactSerializer(compact=config.compact_storage_enabled)
+
+
+# --- Accounting ---
+def checkpoint_bytes(checkpointer: Any) -> Optional[int]:
+    """Serialized bytes held by an in-memory checkpointer (or reported by one that knows its size)."""
+    stored_bytes = getattr(checkpointer, "stored_bytes", None)
+    if stored_bytes is not None:
+        return stored_bytes()
+    if not hasattr(checkpointer, "blobs"):
+        return None
+    total = sum(len(data) for _, data in checkpointer.blobs.values())
+    for namespaces in checkpointer.storage.values():
+        for checkpoints in namespaces.values():
+            total += sum(len(c[1]) + len(m[1]) for c, m, _ in checkpoints.values())
+    for writes in checkpointer.writes.values():
+        total += sum(len(write[2][1]) for write in writes.values())
+    return total
+
+
+def message_storage_summary(checkpointer: Any) -> Dict[str, Any]:
+    return {
+        "compact": _config.compact_storage_enabled,
+        "durable_payloads": _payload_store is not None,
+        "checkpoint_bytes": checkpoint_bytes(checkpointer),
+        "tool_payloads": {**tool_payloads.stats(), **payload_stats},
+    }
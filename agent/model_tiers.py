@@ -0,0 +1,91 @@
+"""Per-role model tiers: a small model routes the turn, the configured model writes the answers."""
+
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from .config import Configuration
+from .metrics import metrics
+
+_config = Configuration()
+
+# Tag of the router-tier LLM; its tokens are not streamed because the decision may still be escalated
+ROUTER_TAG = "tier:router"
+
+MODEL_ESCALATIONS = metrics.counter("onboardkit_model_escalations", "Router decisions repeated with the answer tier")
+
+# Per-role call counters; "escalated" counts router decisions that were repeated by the answer tier
+_EMPTY = {"calls": 0, "errors": 0, "duration_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+tier_stats: Dict[str, Any] = {
+    "router": dict(_EMPTY),
+    "answer": dict(_EMPTY),
+    "models": {},
+    "escalated": {},
+}
+
+
+def select_role(state: Dict[str, Any], config: Optional[Configuration] = None) -> str:
+    """
+    ``router`` for the first LLM call of a turn (search or answer directly?) when
+    tiers are enabled; ``answer`` otherwise and once tool results are in.
+    """
+    if not (config or _config).model_tiers_enabled:
+        return "answer"
+    messages = state.get("messages") or []
+    return "router" if messages and isinstance(messages[-1], HumanMessage) else "answer"
+
+
+def router_confidence(message: Any) -> Tuple[float, str]:
+    """
+    Heuristic confidence of a router-tier decision and the reason for it.
+
+    Well-formed searches are trusted; malformed or truncated output is not.
+    Final answers belong to the answer tier, so a direct answer scores 0 and
+    is always re-run there.
+    """
+    if not isinstance(message, AIMessage):
+        return 0.0, "no_message"
+    if getattr(message, "invalid_tool_calls", None):
+        return 0.0, "invalid_tool_call"
+    if (message.response_metadata or {}).get("finish_reason") == "length":
+        return 0.0, "truncated"
+    if message.tool_calls:
+        for call in message.tool_calls:
+            if call.get("name") != "document_knowledge" or not str((call.get("args") or {}).get("query", "")).strip():
+                return 0.1, "bad_search"
+        return 1.0, "search"
+    return 0.0, "answer"
+
+
+def record_escalation(reason: str) -> None:
+    MODEL_ESCALATIONS.inc(reason=reason)
+    tier_stats["escalated"][reason] = tier_stats["escalated"].get(reason, 0) + 1
+
+
+def record_tier_call(role: str, model: str, elapsed: float, prompt_tokens: int, completion_tokens: int, failed: bool = False) -> None:
+    stats = tier_stats[role]
+    stats["calls"] += 1
+    stats["errors"] += int(failed)
+    stats["duration_ms"] += elapsed * 1000
+    stats["prompt_tokens"] += prompt_tokens
+    stats["completion_tokens"] += completion_tokens
+    models = tier_stats["models"].setdefault(role, {})
+    models[model] = models.get(model, 0) + 1
+
+
+def model_tier_summary() -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"escalated": dict(tier_stats["escalated"])}
+    for role in ("router", "answer"):
+        stats = tier_stats[role]
+        calls = stats["calls"]
+        summary[role] = {
+            **stats,
+            "duration_ms": round(stats["duration_ms"], 1),
+            "avg_ms": round(stats["duration_ms"] / calls, 1) if calls else None,
+            "avg_prompt_tokens": round(stats["prompt_tokens"] / calls, 1) if calls else None,
+            "avg_completion_tokens": round(stats["completion_tokens"] / calls, 1) if calls else None,
+            "models": dict(tier_stats["models"].get(role, {})),
+        }
+    routed = summary["router"]["calls"]
+    summary["escalation_rate"] = round(sum(tier_stats["escalated"].values()) / routed, 4) if routed else 0.0
+    return summary
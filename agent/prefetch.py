@@ -0,0 +1,138 @@
+"""Speculative knowledge-base prefetch overlapping the first LLM call of a turn."""
+
+import asyncio
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import Configuration
+from .metrics import metrics
+from .utils import debug_print
+
+_config = Configuration()
+
+# Dropped before comparing the raw user message with the model's search query
+_STOPWORDS = frozenset(
+    "a an the is are was were be do does did i me my we our you your to of for in on at by with and or "
+    "what how when where who which why can could should would will please tell about there any".split()
+)
+_WORD = re.compile(r"\w+")
+
+# Speculative searches older than this are assumed abandoned (e.g. the run failed)
+_MAX_AGE_SECONDS = 120.0
+
+PREFETCH_RESULTS = metrics.counter("onboardkit_kb_prefetch", "Speculative knowledge searches by outcome")
+
+# Aggregated prefetch counters
+prefetch_stats: Dict[str, Any] = {
+    "started": 0,
+    "claimed": 0,
+    "discarded_no_tool_call": 0,
+    "discarded_dissimilar": 0,
+    "discarded_stale": 0,
+    "ms_saved": 0.0,
+}
+
+
+class _Prefetch:
+    __slots__ = ("query", "terms", "task", "started_at", "running_at", "finished_at")
+
+    def __init__(self, query: str, search: Callable[[], Awaitable[Dict[str, Any]]]):
+        self.query = query
+        self.terms = _terms(query)
+        self.started_at = time.perf_counter()
+        self.running_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task = asyncio.ensure_future(self._run(search))
+
+    async def _run(self, search: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.running_at = time.perf_counter()
+        try:
+            return await search()
+        finally:
+            self.finished_at = time.perf_counter()
+
+    def seconds_saved(self) -> float:
+        """How long the search had already been running when the tool claimed it."""
+        now = time.perf_counter()
+        return (self.finished_at or now) - (self.running_at or now)
+
+
+# In-flight speculative searches, one per thread (session)
+_prefetches: Dict[str, _Prefetch] = {}
+
+
+def _terms(text: str) -> frozenset:
+    return frozenset(w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS)
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _discard(thread_id: str, reason: str) -> None:
+    prefetch = _prefetches.pop(thread_id, None)
+    if prefetch is None:
+        return
+    prefetch.task.cancel()
+    prefetch_stats[f"discarded_{reason}"] += 1
+    PREFETCH_RESULTS.inc(outcome=reason)
+
+
+def start_prefetch(thread_id: Optional[str], query: str, auth_token: str, company_id: int) -> bool:
+    """Start searching the knowledge base for the raw user message while the LLM decides what to do."""
+    if not _config.kb_prefetch_enabled or not thread_id or len(_terms(query)) < _config.kb_prefetch_min_terms:
+        return False
+    # Imported here: the tools module consumes prefetches and is imported by the graph first
+    from .tools import _search_knowledge
+
+    now = time.perf_counter()
+    for stale in [t for t, p in _prefetches.items() if now - p.started_at > _MAX_AGE_SECONDS]:
+        _discard(stale, "stale")
+    _discard(thread_id, "stale")
+
+    _prefetches[thread_id] = _Prefetch(query, lambda: _search_knowledge(query, auth_token, company_id))
+    prefetch_stats["started"] += 1
+    return True
+
+
+def cancel_prefetch(thread_id: Optional[str]) -> None:
+    """The model answered without searching; drop the speculative result."""
+    if thread_id:
+        _discard(thread_id, "no_tool_call")
+
+
+def claim_prefetch(thread_id: Optional[str], queries: Sequence[str]) -> Optional[Tuple[int, "asyncio.Task[Dict[str, Any]]"]]:
+    """
+    Hand the prefetched search to the tool if one of its queries is similar enough.
+
+    Returns the index of the matching query and the search task, or None after
+    cancelling a prefetch that matches none of them.
+    """
+    prefetch = _prefetches.get(thread_id) if thread_id else None
+    if prefetch is None:
+        return None
+    scores: List[float] = [_similarity(prefetch.terms, _terms(q)) for q in queries]
+    best = max(range(len(scores)), key=scores.__getitem__, default=None)
+    if best is None or scores[best] < _config.kb_prefetch_similarity:
+        debug_print("KB prefetch discarded:", prefetch.query, list(queries))
+        _discard(thread_id, "dissimilar")
+        return None
+
+    del _prefetches[thread_id]
+    prefetch_stats["claimed"] += 1
+    prefetch_stats["ms_saved"] += prefetch.seconds_saved() * 1000
+    PREFETCH_RESULTS.inc(outcome="claimed")
+    return best, prefetch.task
+
+
+def prefetch_summary() -> Dict[str, Any]:
+    started = prefetch_stats["started"]
+    return {
+        **prefetch_stats,
+        "ms_saved": round(prefetch_stats["ms_saved"], 1),
+        "hit_rate": round(prefetch_stats["claimed"] / started, 4) if started else 0.0,
+        "inflight": len(_prefetches),
+    }
@@ -0,0 +1,90 @@
+"""Cache-friendly prompt assembly for the OnboardKit agent starter kit."""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .message_store import rehydrate_messages
+from .prompts import SESSION_STATE_PROMPT, SYSTEM_PROMPT
+from .tokens import count_message_tokens, count_tokens
+
+# Fallback/placeholder values for missing keys in state for prompt formatting
+_SESSION_DEFAULTS = {
+    "init": False,
+    "welcome_message": False,
+    "last_error": "",
+    "knowledge_base_search_performed": False,
+    "full_name": "",
+    "first_name": "",
+    "last_name": "",
+    "email": "",
+    "company_name": "",
+}
+
+# Aggregated prompt composition counters
+prompt_stats: Dict[str, int] = {
+    "prompts": 0,
+    "prompt_tokens": 0,
+    "prefix_tokens": 0,
+    "provider_prompt_tokens": 0,
+    "provider_cached_tokens": 0,
+}
+
+
+def session_block(state: Dict[str, Any]) -> str:
+    """Format the small per-session block that trails the conversation."""
+    values = {k: state.get(k, default) for k, default in _SESSION_DEFAULTS.items()}
+    values["personalized_name"] = state.get("full_name") or "valued user"
+    return SESSION_STATE_PROMPT.format(**values)
+
+
+async def build_prompt(state: Dict[str, Any], model: str = "gpt-4o") -> Tuple[List[Any], Dict[str, int]]:
+    """
+    Assemble the LLM input as a byte-stable prefix followed by a trailing session block.
+
+    Order: static system prompt, rolling history summary, conversation history,
+    then the per-session state. Everything before the session block only ever
+    grows by appending, so provider-side prefix caching applies across calls.
+    Returns the messages and the token split between cacheable prefix and tail.
+    """
+    prefix: List[Any] = [("system", SYSTEM_PROMPT)]
+    if state.get("history_summary"):
+        # Turns folded out of the history by the compaction node
+        prefix.append(("system", f"Summary of the earlier conversation:\n{state['history_summary']}"))
+    # Offloaded tool results are only materialized here, for the duration of the call
+    prefix.extend(await rehydrate_messages(state.get("messages", [])))
+    tail = session_block(state)
+
+    prefix_tokens = count_message_tokens(_texts(prefix), model)
+    tail_tokens = count_tokens(tail, model)
+    record_prompt(prefix_tokens, prefix_tokens + tail_tokens)
+    return [*prefix, ("system", tail)], {"prefix_tokens": prefix_tokens, "prompt_tokens": prefix_tokens + tail_tokens}
+
+
+def _texts(messages: List[Any]) -> List[Any]:
+    """Tuples carry their text as the second element; message objects are counted as-is."""
+    return [message[1] if isinstance(message, tuple) else message for message in messages]
+
+
+def record_prompt(prefix_tokens: int, prompt_tokens: int) -> None:
+    prompt_stats["prompts"] += 1
+    prompt_stats["prefix_tokens"] += prefix_tokens
+    prompt_stats["prompt_tokens"] += prompt_tokens
+
+
+def record_usage(usage: Optional[Dict[str, Any]]) -> None:
+    """Record provider-reported prompt tokens and how many were served from the prompt cache."""
+    if not usage:
+        return
+    prompt_stats["provider_prompt_tokens"] += usage.get("input_tokens", 0) or 0
+    details = usage.get("input_token_details") or {}
+    prompt_stats["provider_cached_tokens"] += details.get("cache_read", 0) or 0
+
+
+def prompt_cache_stats() -> Dict[str, Any]:
+    """Share of prompt tokens in the cacheable prefix, estimated and as reported by the provider."""
+    stats: Dict[str, Any] = dict(prompt_stats)
+    stats["prefix_share"] = round(stats["prefix_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0
+    stats["provider_cached_share"] = (
+        round(stats["provider_cached_tokens"] / stats["provider_prompt_tokens"], 4)
+        if stats["provider_prompt_tokens"] else 0.0
+    )
+    return stats
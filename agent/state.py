@@ -14,6 +14,10 @@ class State(TypedDict, total=False):
     # --- Core System ---
     messages: Annotated[Sequence[BaseMessage], add_messages]
     last_error: str
+    history_summary: str  # Rolling summary of turns folded out of `messages`
+    compaction_stats: Dict[str, int]  # Token counts before/after the last compaction
+    answer_cache_key: str  # Answer-cache key of the current turn ("" when not cacheable)
+    turn_started_at: float  # Wall-clock start of the current turn, for answer-cache savings
     # Removed UI state field
     
     # --- Session & Authentication ---
@@ -0,0 +1,230 @@
+"""Streaming document ingestion into the per-company local vector indexes."""
+
+import asyncio
+import codecs
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from .config import Configuration
+from .retrieval import HashingEmbedder, IndexHashes, _read_meta, append_index, content_hash, create_embedder, index_lock
+
+
+# --- Pipeline Stages ---
+async def read_text(source: Any, block_bytes: int, on_bytes: Optional[Callable[[int], None]] = None) -> AsyncIterator[str]:
+    """Decode an upload (anything with ``async read(n)``) block by block; multi-byte characters may span blocks."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    first = True
+    while True:
+        data = await source.read(block_bytes)
+        if not data:
+            break
+        if first and b"\0" in data[:8192]:
+            raise ValueError("Binary files are not supported; upload plain text")
+        first = False
+        if on_bytes is not None:
+            on_bytes(len(data))
+        yield decoder.decode(data)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def split_chunks(pieces: AsyncIterable[str], chunk_words: int, overlap_words: int) -> AsyncIterator[str]:
+    """Windows of ``chunk_words`` words, each repeating the last ``overlap_words`` words of the one before."""
+    step = max(1, chunk_words - overlap_words)
+    window: List[str] = []
+    carry = ""
+    emitted = False
+    async for piece in pieces:
+        text = carry + piece
+        words = text.split()
+        # A word cut at the block boundary continues in the next piece
+        carry = words.pop() if words and not text[-1].isspace() else ""
+        window.extend(words)
+        while len(window) >= chunk_words:
+            yield " ".join(window[:chunk_words])
+            emitted = True
+            del window[:step]
+    if carry:
+        window.append(carry)
+    # The remainder, unless it is only the overlap the last chunk already holds
+    if window and (not emitted or len(window) > chunk_words - step):
+        yield " ".join(window)
+
+
+async def batched(items: AsyncIterable[Any], size: int) -> AsyncIterator[List[Any]]:
+    batch: List[Any] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- Jobs ---
+class IngestJob:
+    """Progress of one upload, readable while it runs."""
+
+    def __init__(self, company_id: int, filename: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.company_id = company_id
+        self.filename = filename
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.bytes_read = 0
+        self.chunks = 0
+        self.chunks_indexed = 0
+        self.chunks_skipped = 0
+        self.batches = 0
+        self.created_at = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def view(self) -> Dict[str, Any]:
+        elapsed = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        return {
+            "job_id": self.id,
+            "company_id": self.company_id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "bytes_read": self.bytes_read,
+            "chunks": self.chunks,
+            "chunks_indexed": self.chunks_indexed,
+            "chunks_skipped": self.chunks_skipped,
+            "batches": self.batches,
+            "created_at": self.created_at,
+            "elapsed_s": round(elapsed, 3),
+            "bytes_per_s": round(self.bytes_read / elapsed, 1) if elapsed else None,
+            "chunks_per_s": round(self.chunks / elapsed, 1) if elapsed else None,
+        }
+
+
+class DocumentIngestor:
+    """
+    Runs uploads through read → split → skip known chunks → embed → append.
+
+    Chunks whose content hash is already in the company's index are skipped,
+    so re-uploading a document only indexes what changed. Uploads of the same
+    company run one at a time in a process, and their appends hold the index's
+    file lock across processes; ``on_indexed`` is called with the company id
+    once a job has added chunks, to invalidate caches that depend on them.
+    """
+
+    def __init__(
+        self,
+        config: Optional[Configuration] = None,
+        embedder: Optional[HashingEmbedder] = None,
+        on_indexed: Optional[Callable[[int], None]] = None,
+    ):
+        self.config = config or Configuration()
+        self.embedder = embedder or create_embedder(self.config)
+        self.on_indexed = on_indexed
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._hashes: Dict[int, IndexHashes] = {}
+
+    def directory(self, company_id: int) -> str:
+        return os.path.join(self.config.kb_index_dir, str(company_id))
+
+    def create_job(self, company_id: int, filename: str) -> IngestJob:
+        job = IngestJob(company_id, filename)
+        self.jobs[job.id] = job
+        # Forget the oldest finished jobs beyond the limit
+        for job_id in [job_id for job_id, old in self.jobs.items() if old.done][: max(0, len(self.jobs) - self.config.ingest_max_jobs)]:
+            del self.jobs[job_id]
+        return job
+
+    def company_jobs(self, company_id: int) -> List[Dict[str, Any]]:
+        return [job.view() for job in reversed(self.jobs.values()) if job.company_id == company_id]
+
+    def forget(self, company_id: int) -> None:
+        """Drop the remembered chunk hashes of a company, e.g. after its index was rebuilt offline."""
+        self._hashes.pop(company_id, None)
+
+    async def run(self, job: IngestJob, source: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Ingest ``source`` for ``job``, yielding a progress event per batch and a final event."""
+        lock = self._locks.setdefault(job.company_id, asyncio.Lock())
+        yield {"type": "job", **job.view()}
+        try:
+            async with lock:
+                job.status = "running"
+                job.started = time.perf_counter()
+                async for event in self._ingest(job, source):
+                    yield event
+            job.status = "completed"
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away; what was appended so far stays and is skipped on the next upload
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{e.__class__.__name__}: {e}"
+        finally:
+            job.finished = time.perf_counter() if job.started else None
+            if job.chunks_indexed and self.on_indexed is not None:
+                self.on_indexed(job.company_id)
+        yield {"type": "done", **job.view()}
+
+    async def _ingest(self, job: IngestJob, source: Any) -> AsyncIterator[Dict[str, Any]]:
+        config = self.config
+        directory = self.directory(job.company_id)
+        committed = self._hashes.setdefault(job.company_id, IndexHashes())
+
+        def snapshot() -> Set[str]:
+            with index_lock(directory):
+                return set(committed.refresh(directory, _read_meta(directory)))
+
+        # Skips what is already indexed without embedding it; append_index re-checks
+        # under the lock for chunks another worker committed since
+        known = await asyncio.to_thread(snapshot)
+
+        def count_bytes(size: int) -> None:
+            job.bytes_read += size
+
+        texts = split_chunks(
+            read_text(source, config.ingest_read_bytes, count_bytes),
+            config.ingest_chunk_words,
+            config.ingest_overlap_words,
+        )
+        async for batch in batched(texts, config.ingest_embed_batch):
+            chunks = []
+            for text in batch:
+                position = job.chunks
+                job.chunks += 1
+                digest = content_hash(text)
+                if digest in known:
+                    job.chunks_skipped += 1
+                    continue
+                # Seen once per upload too, so a repeated passage is indexed only once
+                known.add(digest)
+                chunks.append({"id": digest[:12], "content": text, "source": job.filename, "position": position, "hash": digest})
+            if chunks:
+                vectors = await asyncio.to_thread(self.embedder.embed, [chunk["content"] for chunk in chunks])
+                appended = await asyncio.to_thread(
+                    append_index, directory, chunks, vectors, self.embedder, config.kb_vector_dtype, committed
+                )
+                job.chunks_indexed += len(appended)
+                job.chunks_skipped += len(chunks) - len(appended)
+            job.batches += 1
+            yield {"type": "progress", **job.view()}
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "jobs": statuses,
+            "chunks_indexed": sum(job.chunks_indexed for job in self.jobs.values()),
+            "chunks_skipped": sum(job.chunks_skipped for job in self.jobs.values()),
+            "bytes_read": sum(job.bytes_read for job in self.jobs.values()),
+        }
@@ -0,0 +1,134 @@
+"""Knowledge-context packing for the document_knowledge tool."""
+
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from .tokens import count_tokens
+
+# Chunks with less room than this are dropped rather than truncated
+MIN_TRUNCATED_TOKENS = 48
+
+_WORD = re.compile(r"\w+")
+
+# Aggregated packing counters across all calls
+packing_stats: Dict[str, int] = {
+    "calls": 0,
+    "chunks_in": 0,
+    "chunks_kept": 0,
+    "duplicates_dropped": 0,
+    "near_duplicates_dropped": 0,
+    "budget_dropped": 0,
+    "truncated": 0,
+    "tokens_in": 0,
+    "tokens_kept": 0,
+    "tokens_dropped": 0,
+}
+
+
+def _shingles(text: str, size: int) -> Set[int]:
+    """Hashed word k-grams of a chunk."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {hash(tuple(words))}
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _source_id(doc: Dict[str, Any], position: int) -> str:
+    """Short, stable identifier the LLM can cite; long ids are hashed to 8 hex chars."""
+    raw = next((doc.get(k) for k in ("source_id", "document_id", "id", "source") if doc.get(k)), None)
+    if raw is None:
+        return f"s{position}"
+    raw = str(raw)
+    return raw if len(raw) <= 12 else hashlib.blake2b(raw.encode(), digest_size=4).hexdigest()
+
+
+def _truncate(text: str, tokens: int, max_tokens: int) -> str:
+    """Cut a chunk to roughly ``max_tokens``, preferring a sentence boundary."""
+    cut = text[: max(1, int(len(text) * max_tokens / tokens))]
+    boundary = cut.rfind(". ")
+    if boundary > len(cut) // 2:
+        cut = cut[: boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def pack_knowledge_context(
+    documents: Sequence[Dict[str, Any]],
+    token_budget: int,
+    near_duplicate_threshold: float = 0.8,
+    shingle_size: int = 5,
+    model: str = "gpt-4o",
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Build the knowledge context for the LLM from raw knowledge-base documents.
+
+    Exact duplicates (after whitespace/case normalization) and near duplicates
+    (word-shingle Jaccard similarity above the threshold) are dropped. The rest
+    is ordered by the KB ``score`` when present (KB order otherwise) and added
+    until ``token_budget`` is filled; the chunk that crosses the budget is
+    truncated if enough room is left. Returns the context and per-call stats.
+    """
+    chunks = [
+        (position, doc, doc["content"])
+        for position, doc in enumerate(documents, start=1)
+        if isinstance(doc, dict) and doc.get("content")
+    ]
+    stats = {k: 0 for k in packing_stats if k != "calls"}
+    stats["chunks_in"] = len(chunks)
+
+    # Highest score first; Python's sort is stable so unscored chunks keep KB order
+    chunks.sort(key=lambda chunk: -_score(chunk[1]))
+
+    seen: Set[str] = set()
+    kept_shingles: List[Set[int]] = []
+    parts: List[str] = []
+    remaining = token_budget
+    for position, doc, content in chunks:
+        tokens = count_tokens(content, model)
+        stats["tokens_in"] += tokens
+
+        normalized = " ".join(content.lower().split())
+        if normalized in seen:
+            stats["duplicates_dropped"] += 1
+            continue
+        seen.add(normalized)
+
+        shingles = _shingles(content, shingle_size)
+        if any(_jaccard(shingles, other) >= near_duplicate_threshold for other in kept_shingles):
+            stats["near_duplicates_dropped"] += 1
+            continue
+
+        text = content
+        if tokens > remaining:
+            if remaining < MIN_TRUNCATED_TOKENS:
+                stats["budget_dropped"] += 1
+                continue
+            text = _truncate(content, tokens, remaining)
+            stats["truncated"] += 1
+        part = f"[{_source_id(doc, position)}] {text}"
+        part_tokens = count_tokens(part, model)
+        remaining -= part_tokens
+        stats["tokens_kept"] += part_tokens
+        kept_shingles.append(shingles)
+        parts.append(part)
+
+    stats["chunks_kept"] = len(parts)
+    stats["tokens_dropped"] = max(0, stats["tokens_in"] - stats["tokens_kept"])
+    packing_stats["calls"] += 1
+    for key, value in stats.items():
+        packing_stats[key] += value
+    return "\n---\n".join(parts), stats
+
+
+def _score(doc: Dict[str, Any]) -> float:
+    score: Optional[Any] = doc.get("score", doc.get("similarity"))
+    try:
+        return float(score)
+    except (TypeError, ValueError):
+        return float("-inf")
@@ -0,0 +1,920 @@
+"""Retrieval backends behind document_knowledge: the remote knowledge-base API or a local vector index."""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import urllib.parse
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only the local backend needs numpy
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, where writers are only serialized within a process
+    fcntl = None
+
+from .cache import TTLCache
+from .config import Configuration
+from .metrics import KB_BACKEND_DURATION
+from .search_batcher import SearchBatcher
+from .utils import APIClient, KNOWLEDGE_BASE_URL, _create_error_response, _create_success_response, debug_print
+
+_WORD = re.compile(r"\w+")
+
+# Rows scored per matrix product, which bounds the temporary copy of int8 rows to float32
+_BLOCK_ROWS = 16384
+
+# Indexes with more cells than this are searched in a worker thread instead of on the event loop
+_INLINE_SEARCH_CELLS = 4 * 1024 * 1024
+
+
+def _tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+# --- Embedding ---
+@lru_cache(maxsize=65536)
+def _feature_slot(feature: str, dim: int) -> Tuple[int, float]:
+    """Bucket and sign of a hashed feature; stable across processes, unlike ``hash()``."""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of words and word bigrams into ``dim`` dimensions.
+
+    Needs no model or network, so any chunk can be embedded at ingestion and
+    query time alike. Swap in a model-backed embedder with the same ``name``,
+    ``dim`` and ``embed`` for semantic matching beyond shared vocabulary.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """L2-normalized float32 vectors, one row per text."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _tokenize(text)
+            features = Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+            for feature, count in features.items():
+                slot, sign = _feature_slot(feature, self.dim)
+                # Sublinear term frequency so a repeated word does not dominate the chunk
+                vectors[row, slot] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def create_embedder(config: Optional[Configuration] = None) -> HashingEmbedder:
+    config = config or Configuration()
+    return HashingEmbedder(config.kb_embedding_dim)
+
+
+# --- Index Files ---
+def _quantize(vectors: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Symmetric per-row int8 quantization; returns the rows and their float32 scales."""
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    rows = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+
+def _kmeans(vectors: "np.ndarray", partitions: int, iterations: int = 10, seed: int = 0) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Spherical k-means; returns unit-length centroids and the partition of every row."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), partitions, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            assignment[start:start + _BLOCK_ROWS] = np.argmax(vectors[start:start + _BLOCK_ROWS] @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=partitions)
+        # Empty partitions restart from a random row
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32), assignment
+
+
+def partitions_for(count: int, config: Optional[Configuration] = None) -> int:
+    """Partitions to build for ``count`` chunks: none below ``kb_ivf_min_chunks``, about sqrt(count) above."""
+    config = config or Configuration()
+    return int(math.sqrt(count)) if count >= config.kb_ivf_min_chunks else 0
+
+
+def build_index(
+    directory: str,
+    chunks: Sequence[Dict[str, Any]],
+    embedder: HashingEmbedder,
+    dtype: str = "float32",
+    partitions: int = 0,
+    vectors: Optional["np.ndarray"] = None,
+) -> Dict[str, Any]:
+    """
+    Write a company's index to ``directory``.
+
+    ``chunks`` are ``{"id", "content", ...}`` dicts; extra keys are returned
+    with search results. With ``partitions`` the rows are clustered and stored
+    grouped by partition, so a partitioned search reads a few contiguous slices.
+    """
+    if np is None:
+        raise RuntimeError("The local retrieval backend requires numpy")
+    os.makedirs(directory, exist_ok=True)
+    with index_lock(directory):
+        meta_path = os.path.join(directory, "meta.json")
+        # Readers ignore the directory until the new meta.json is written last
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        chunks = list(chunks)
+        if vectors is None:
+            vectors = embedder.embed([chunk["content"] for chunk in chunks])
+        partitions = min(partitions, len(chunks))
+
+        offsets = None
+        if partitions > 1:
+            centroids, assignment = _kmeans(vectors, partitions)
+            order = np.argsort(assignment, kind="stable")
+            vectors, chunks = vectors[order], [chunks[i] for i in order]
+            offsets = np.searchsorted(assignment[order], np.arange(partitions + 1)).astype(np.int64)
+            np.savez(os.path.join(directory, "partitions.npz"), centroids=centroids, offsets=offsets)
+        elif os.path.exists(os.path.join(directory, "partitions.npz")):
+            os.remove(os.path.join(directory, "partitions.npz"))
+
+        if dtype == "int8":
+            rows, scales = _quantize(vectors)
+            rows.tofile(os.path.join(directory, "vectors.i8"))
+            scales.tofile(os.path.join(directory, "scales.f32"))
+        else:
+            vectors.astype(np.float32).tofile(os.path.join(directory, "vectors.f32"))
+
+        with open(os.path.join(directory, "chunks.jsonl"), "wb") as f:
+            for chunk in chunks:
+                f.write(_chunk_line(chunk))
+            chunks_bytes = f.tell()
+        meta = {
+            "embedder": embedder.name,
+            "dim": embedder.dim,
+            "dtype": dtype,
+            "count": len(chunks),
+            "chunks_bytes": chunks_bytes,
+            "partitions": int(partitions) if offsets is not None else 0,
+            "generation": time.time_ns(),
+        }
+        _write_meta(directory, meta)
+        return meta
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _chunk_line(chunk: Dict[str, Any]) -> bytes:
+    return (json.dumps(chunk) + "\n").encode()
+
+
+def _write_meta(directory: str, meta: Dict[str, Any]) -> None:
+    """Replace meta.json atomically; its ``count`` is what readers trust, not the file lengths."""
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(path + ".tmp", path)
+
+
+@contextmanager
+def index_lock(directory: str) -> Iterator[None]:
+    """Hold an exclusive lock on a company's index, shared by every process that writes it."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_meta(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class IndexHashes:
+    """
+    Content hashes of the chunks committed to an index, kept in step with its meta.json.
+
+    ``refresh`` reads only the chunk lines committed since the previous call,
+    or all of them again once the index was rebuilt (a new ``generation``).
+    Call it under ``index_lock`` so no rebuild is half-written meanwhile.
+    """
+
+    def __init__(self) -> None:
+        self.generation: Optional[int] = None
+        self.count = 0
+        self.offset = 0
+        self.hashes: set = set()
+
+    def refresh(self, directory: str, meta: Optional[Dict[str, Any]]) -> set:
+        if meta is None or meta.get("generation") != self.generation or meta["count"] < self.count:
+            self.generation, self.count, self.offset, self.hashes = None, 0, 0, set()
+        if meta is None:
+            return self.hashes
+        self.generation = meta.get("generation")
+        if meta["count"] > self.count:
+            with open(os.path.join(directory, "chunks.jsonl"), "rb") as f:
+                f.seek(self.offset)
+                for line in islice(f, meta["count"] - self.count):
+                    chunk = json.loads(line)
+                    self.hashes.add(chunk.get("hash") or content_hash(chunk["content"]))
+                    self.offset += len(line)
+            self.count = meta["count"]
+        return self.hashes
+
+
+def index_hashes(directory: str) -> set:
+    """Content hashes of the chunks already in an index (empty when there is none)."""
+    with index_lock(directory):
+        return IndexHashes().refresh(directory, _read_meta(directory))
+
+
+def append_index(
+    directory: str,
+    chunks: Sequence[Dict[str, Any]],
+    vectors: "np.ndarray",
+    embedder: HashingEmbedder,
+    dtype: str = "float32",
+    committed: Optional[IndexHashes] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Append the chunks not yet in a company's index, creating it if needed; returns the ones appended.
+
+    The whole append holds ``index_lock``, and the committed count and hashes
+    are read under it, so workers uploading to the same company neither
+    overwrite each other's rows nor index a passage twice. ``committed``
+    carries the hashes between calls so only new lines are read.
+
+    New rows land after the partitioned ones, where every search scans them.
+    The files are first cut back to the committed ``count``, which drops the
+    leftovers of an append that was interrupted before meta.json was updated.
+    """
+    if np is None:
+        raise RuntimeError("The local retrieval backend requires numpy")
+    committed = committed or IndexHashes()
+    with index_lock(directory):
+        meta = _read_meta(directory)
+        if meta is None:
+            meta = {
+                "embedder": embedder.name,
+                "dim": embedder.dim,
+                "dtype": dtype,
+                "count": 0,
+                "chunks_bytes": 0,
+                "partitions": 0,
+                "generation": time.time_ns(),
+            }
+        elif meta["embedder"] != embedder.name:
+            raise ValueError(f"Index was built with {meta['embedder']}, not {embedder.name}")
+        known = committed.refresh(directory, meta)
+        keep = [i for i, chunk in enumerate(chunks) if (chunk.get("hash") or content_hash(chunk["content"])) not in known]
+        if not keep:
+            return []
+        chunks, vectors = [chunks[i] for i in keep], vectors[keep]
+
+        count, dim = meta["count"], meta["dim"]
+        files = {"chunks.jsonl": meta["chunks_bytes"]}
+        if meta["dtype"] == "int8":
+            rows, scales = _quantize(vectors)
+            files.update({"vectors.i8": count * dim, "scales.f32": count * 4})
+            payloads = {"vectors.i8": rows.tobytes(), "scales.f32": scales.tobytes()}
+        else:
+            files["vectors.f32"] = count * dim * 4
+            payloads = {"vectors.f32": vectors.astype(np.float32).tobytes()}
+        payloads["chunks.jsonl"] = b"".join(_chunk_line(chunk) for chunk in chunks)
+
+        for name, size in files.items():
+            with open(os.path.join(directory, name), "ab") as f:
+                f.truncate(size)
+                f.write(payloads[name])
+                if name == "chunks.jsonl":
+                    meta["chunks_bytes"] = f.tell()
+        meta["count"] = count + len(chunks)
+        _write_meta(directory, meta)
+        committed.refresh(directory, meta)
+        return chunks
+
+
+# --- Local Index ---
+class VectorIndex:
+    """
+    One company's chunks: memory-mapped embeddings plus an in-memory BM25 index.
+
+    Search is brute force over every row, or, for a partitioned index, over the
+    rows of the ``nprobe`` partitions closest to the query. Rows past the last
+    partition (appended after the build) are always scanned.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.dim = self.meta["dim"]
+        self.count = self.meta["count"]
+        self.dtype = self.meta["dtype"]
+        dtype = np.int8 if self.dtype == "int8" else np.float32
+        path = os.path.join(directory, "vectors.i8" if self.dtype == "int8" else "vectors.f32")
+        # An empty file cannot be mapped
+        self.vectors = (
+            np.memmap(path, dtype=dtype, mode="r", shape=(self.count, self.dim))
+            if self.count else np.zeros((0, self.dim), dtype=dtype)
+        )
+        self.scales = (
+            np.fromfile(os.path.join(directory, "scales.f32"), dtype=np.float32, count=self.count)
+            if self.dtype == "int8" else None
+        )
+
+        self.centroids = self.offsets = None
+        if self.meta.get("partitions"):
+            with np.load(os.path.join(directory, "partitions.npz")) as partitions:
+                self.centroids, self.offsets = partitions["centroids"], partitions["offsets"]
+
+        with open(os.path.join(directory, "chunks.jsonl")) as f:
+            self.chunks = [json.loads(line) for line in islice(f, self.count)]
+        self._build_bm25()
+
+    def _build_bm25(self) -> None:
+        """Postings in CSR form: the rows and term frequencies of term ``t`` are at ``_starts[t]:_starts[t + 1]``."""
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths = np.zeros(self.count, dtype=np.float32)
+        for row, chunk in enumerate(self.chunks):
+            words = _tokenize(chunk.get("content", ""))
+            lengths[row] = len(words)
+            term_ids.extend([vocabulary.setdefault(word, len(vocabulary)) for word in words])
+        rows = np.repeat(np.arange(self.count, dtype=np.int64), lengths.astype(np.int64))
+        # One (term, row) pair per occurrence; unique pairs give the term frequencies, sorted by term
+        pairs, tfs = np.unique(np.asarray(term_ids, dtype=np.int64) * max(self.count, 1) + rows, return_counts=True)
+        terms = pairs // max(self.count, 1)
+        self._vocabulary = vocabulary
+        self._rows = pairs % max(self.count, 1)
+        self._tfs = tfs.astype(np.float32)
+        self._starts = np.searchsorted(terms, np.arange(len(vocabulary) + 1))
+        self._lengths = lengths
+        self._avg_length = float(lengths.mean()) if self.count else 0.0
+
+    @property
+    def cells(self) -> int:
+        return self.count * self.dim
+
+    def bm25(self, query: str, k1: float = 1.2, b: float = 0.75) -> "np.ndarray":
+        """BM25 score of every row for ``query``."""
+        scores = np.zeros(self.count, dtype=np.float32)
+        norm = k1 * (1 - b + b * self._lengths / max(self._avg_length, 1e-9))
+        for term in set(_tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, stop = self._starts[term_id], self._starts[term_id + 1]
+            rows, tfs = self._rows[start:stop], self._tfs[start:stop]
+            idf = math.log(1 + (self.count - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (k1 + 1) / (tfs + norm[rows])
+        return scores
+
+    def _score_rows(self, start: int, stop: int, queries: "np.ndarray") -> "np.ndarray":
+        """Cosine scores of rows ``start:stop`` for one query vector, or for the columns of a ``dim x m`` matrix."""
+        scores = np.empty((stop - start,) + queries.shape[1:], dtype=np.float32)
+        for block in range(start, stop, _BLOCK_ROWS):
+            end = min(block + _BLOCK_ROWS, stop)
+            rows = self.vectors[block:end]
+            scores[block - start:end - start] = (rows if self.scales is None else rows.astype(np.float32)) @ queries
+        if self.scales is not None:
+            scale = self.scales[start:stop]
+            scores *= scale if queries.ndim == 1 else scale[:, None]
+        return scores
+
+    def _score_ids(self, ids: "np.ndarray", query: "np.ndarray") -> "np.ndarray":
+        rows = np.asarray(self.vectors[ids], dtype=np.float32)
+        scores = rows @ query
+        return scores * self.scales[ids] if self.scales is not None else scores
+
+    def _spans(self, query: "np.ndarray", nprobe: Optional[int]) -> List[Tuple[int, int]]:
+        if self.offsets is None or not nprobe:
+            return [(0, self.count)]
+        probe = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        spans = [(int(self.offsets[p]), int(self.offsets[p + 1])) for p in probe]
+        spans.append((int(self.offsets[-1]), self.count))
+        return [(start, stop) for start, stop in spans if stop > start]
+
+    def vector_search(self, query: "np.ndarray", k: int, nprobe: Optional[int] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Row ids and cosine scores of the ``k`` nearest rows, best first."""
+        spans = self._spans(query, nprobe)
+        if not spans:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(spans) == 1:
+            start, stop = spans[0]
+            positions, scores = _top_k(None, self._score_rows(start, stop, query), k)
+            return positions + start, scores
+        ids = np.concatenate([np.arange(start, stop) for start, stop in spans])
+        scores = np.concatenate([self._score_rows(start, stop, query) for start, stop in spans])
+        return _top_k(ids, scores, k)
+
+    def vector_search_batch(self, queries: "np.ndarray", k: int, nprobe: Optional[int] = None) -> List[Tuple["np.ndarray", "np.ndarray"]]:
+        """``vector_search`` for each row of ``queries``; brute force reads the matrix once for all of them."""
+        if (self.offsets is not None and nprobe) or not self.count:
+            return [self.vector_search(query, k, nprobe) for query in queries]
+        scores = self._score_rows(0, self.count, np.ascontiguousarray(queries.T))
+        return [_top_k(None, scores[:, column], k) for column in range(len(queries))]
+
+    def _rank(
+        self, query_text: str, query: "np.ndarray", ids: "np.ndarray", vector_scores: "np.ndarray",
+        k: int, hybrid_weight: float, candidates: int,
+    ) -> List[Dict[str, Any]]:
+        if hybrid_weight < 1 and self.count:
+            lexical = self.bm25(query_text)
+            lexical_ids = _top_k(None, lexical, k * candidates)[0]
+            lexical_ids = lexical_ids[lexical[lexical_ids] > 0]
+            extra = np.setdiff1d(lexical_ids, ids, assume_unique=True)
+            ids = np.concatenate([ids, extra])
+            vector_scores = np.concatenate([vector_scores, self._score_ids(extra, query)])
+            combined = hybrid_weight * _normalize(vector_scores) + (1 - hybrid_weight) * _normalize(lexical[ids])
+            ids, scores = _top_k(ids, combined, k)
+        else:
+            ids, scores = ids[:k], vector_scores[:k]
+        return [{**self.chunks[i], "score": round(float(s), 4)} for i, s in zip(ids.tolist(), scores.tolist())]
+
+    def search(
+        self,
+        query_text: str,
+        query: "np.ndarray",
+        k: int,
+        hybrid_weight: float = 1.0,
+        nprobe: Optional[int] = None,
+        candidates: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top ``k`` chunks for a query.
+
+        ``hybrid_weight`` is the share of the cosine score in the final rank;
+        the rest is BM25. Both are min-max normalized over the union of the
+        vector and lexical candidates so neither scale dominates.
+        """
+        depth = k if hybrid_weight >= 1 else k * candidates
+        ids, vector_scores = self.vector_search(query, depth, nprobe)
+        return self._rank(query_text, query, ids, vector_scores, k, hybrid_weight, candidates)
+
+    def search_batch(
+        self,
+        query_texts: Sequence[str],
+        queries: "np.ndarray",
+        k: int,
+        hybrid_weight: float = 1.0,
+        nprobe: Optional[int] = None,
+        candidates: int = 4,
+    ) -> List[List[Dict[str, Any]]]:
+        """``search`` for several queries at once."""
+        depth = k if hybrid_weight >= 1 else k * candidates
+        hits = self.vector_search_batch(queries, depth, nprobe)
+        return [
+            self._rank(text, query, ids, scores, k, hybrid_weight, candidates)
+            for text, query, (ids, scores) in zip(query_texts, queries, hits)
+        ]
+
+
+def _top_k(ids: Optional["np.ndarray"], scores: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """The ``k`` best ids and scores, best first; with ``ids=None`` the ids are the score positions."""
+    if ids is None:
+        ids = np.arange(len(scores))
+        if len(scores) > k:
+            ids = np.argpartition(-scores, k - 1)[:k]
+        scores = scores[ids]
+    elif len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
+def _normalize(scores: "np.ndarray") -> "np.ndarray":
+    if not len(scores):
+        return scores
+    low, high = float(scores.min()), float(scores.max())
+    return (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+
+# --- Backends ---
+class RetrievalBackend:
+    """Answers one document_knowledge search in the ``APIClient.make_request`` result format."""
+
+    name = "base"
+    # Whether concurrent searches are worth holding back briefly to send them together
+    micro_batch = False
+
+    async def search(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def search_batch(self, queries: Sequence[str], auth_tokens: Sequence[str], company_id: int) -> List[Dict[str, Any]]:
+        """One result per query, each searched with its own caller's token; backends that can share work override this."""
+        return list(await asyncio.gather(*[
+            self.search(query, auth_token, company_id) for query, auth_token in zip(queries, auth_tokens)
+        ]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class HttpBackend(RetrievalBackend):
+    """
+    The knowledge-base API at ``KNOWLEDGE_BASE_URL``.
+
+    With ``batch_endpoint`` on, the searches of a batch that share a token go
+    to ``POST /knowledge/search/batch`` in one request authorized by that
+    token. The endpoint is an extension of the API, so it is off by default;
+    if the upstream answers 401/403/404/405/501 it is treated as missing and
+    batches are sent as single searches from then on.
+    """
+
+    name = "http"
+
+    def __init__(self, batch_endpoint: bool = False):
+        self.batch_supported = batch_endpoint
+        self._stats = {"batch_requests": 0, "batch_fallbacks": 0}
+
+    @property
+    def micro_batch(self) -> bool:
+        # Holding searches back only pays off while they can share a request
+        return self.batch_supported
+
+    async def search(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        # Format the query for URL
+        encoded_query = urllib.parse.quote(query)
+        return await APIClient.make_request(
+            f"{KNOWLEDGE_BASE_URL}/knowledge/search?companyId={company_id}&query={encoded_query}",
+            method="GET",
+            auth_token=auth_token
+        )
+
+    async def search_batch(self, queries: Sequence[str], auth_tokens: Sequence[str], company_id: int) -> List[Dict[str, Any]]:
+        by_token: Dict[str, List[int]] = {}
+        for i, auth_token in enumerate(auth_tokens):
+            by_token.setdefault(auth_token, []).append(i)
+        results: List[Dict[str, Any]] = [{}] * len(queries)
+        groups = list(by_token.items())
+        found = await asyncio.gather(*[
+            self._search_group([queries[i] for i in positions], auth_token, company_id) for auth_token, positions in groups
+        ])
+        for (_, positions), group_results in zip(groups, found):
+            for i, result in zip(positions, group_results):
+                results[i] = result
+        return results
+
+    async def _search_group(self, queries: List[str], auth_token: str, company_id: int) -> List[Dict[str, Any]]:
+        """Searches of one caller: one batch request, or single searches without the endpoint."""
+        if len(queries) == 1 or not self.batch_supported:
+            return await super().search_batch(queries, [auth_token] * len(queries), company_id)
+        self._stats["batch_requests"] += 1
+        result = await APIClient.make_request(
+            f"{KNOWLEDGE_BASE_URL}/knowledge/search/batch",
+            method="POST",
+            data={"companyId": company_id, "queries": [{"query": query} for query in queries]},
+            auth_token=auth_token,
+        )
+        items = (result.get("data") or {}).get("results") if result.get("success") else None
+        if not isinstance(items, list) or len(items) != len(queries):
+            if result.get("status_code") in (401, 403, 404, 405, 501):
+                self.batch_supported = False
+                debug_print("Knowledge base does not serve batch searches; sending searches one by one")
+            self._stats["batch_fallbacks"] += 1
+            return await super().search_batch(queries, [auth_token] * len(queries), company_id)
+        return [
+            _create_error_response(str(item["error"]), status_code=item.get("status", 502))
+            if item.get("error") else _create_success_response({"data": item.get("data") or []}, {}, "API call successful")
+            for item in items
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "batch_supported": self.batch_supported}
+
+
+class CompanyAccess:
+    """
+    Which bearer tokens may read which company's knowledge.
+
+    The knowledge-base API enforces tenant isolation through the token, so a
+    successful search there trusts the (token, company) pair for ``ttl``
+    seconds. Knowledge served without asking the API (local indexes, results
+    cached for another caller) requires that trust; a token not seen yet is
+    checked with one probe search. Tokens are kept only as hashes.
+    """
+
+    def __init__(self, http: "HttpBackend", config: Configuration):
+        self.http = http
+        self.enabled = config.kb_verify_access
+        self.probe_query = config.kb_access_probe_query
+        self._trusted = TTLCache(max_entries=100_000, ttl=config.kb_access_ttl, sizeof=lambda value: 1)
+        self._stats = {"probes": 0, "denied": 0}
+
+    @staticmethod
+    def _key(auth_token: str, company_id: int) -> Tuple[int, str]:
+        return company_id, hashlib.sha256(auth_token.encode()).hexdigest()
+
+    def trust(self, auth_token: str, company_id: int) -> None:
+        """Record that the API just answered a search of the company for this token."""
+        if self.enabled:
+            self._trusted.set(self._key(auth_token, company_id), True)
+
+    async def check(self, auth_token: str, company_id: int) -> Optional[Dict[str, Any]]:
+        """``None`` when the token may read the company, otherwise the error response to return."""
+        if not self.enabled:
+            return None
+
+        async def probe() -> Dict[str, Any]:
+            self._stats["probes"] += 1
+            return await self.http.search(self.probe_query, auth_token, company_id)
+
+        # Only acceptance is cached: a refusal or an unreachable API is asked again next time
+        result = await self._trusted.get_or_load(
+            self._key(auth_token, company_id), probe, should_cache=lambda value: value is True or bool(value.get("success")),
+        )
+        if result is True or result.get("success"):
+            return None
+        self._stats["denied"] += 1
+        status = result.get("status_code") or 503
+        message = "Not authorized for this company's knowledge" if status in (401, 403, 404) else "Could not verify access to this company's knowledge"
+        return _create_error_response(message, status_code=status)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "enabled": self.enabled, "trusted": len(self._trusted)}
+
+
+class LocalVectorBackend(RetrievalBackend):
+    """
+    In-process search over per-company indexes under ``root/<company_id>``.
+
+    Indexes are loaded on first use and reloaded when their files change on
+    disk (e.g. another worker ingested an upload); companies without an index
+    are served by ``fallback``. Every caller's token is checked with ``access``
+    first, since the index itself knows nothing about tenants.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str,
+        config: Configuration,
+        fallback: Optional[RetrievalBackend] = None,
+        access: Optional[CompanyAccess] = None,
+    ):
+        self.root = root
+        self.config = config
+        self.fallback = fallback
+        self.access = access
+        self.embedder = create_embedder(config)
+        # Loaded indexes with the meta.json version they were read at
+        self._indexes: Dict[int, Tuple[Optional[Tuple[int, int]], Optional[VectorIndex]]] = {}
+        # In-flight loads with the version of the files they were started for
+        self._loading: Dict[int, Tuple[Optional[Tuple[int, int]], "asyncio.Future[Optional[VectorIndex]]"]] = {}
+        self._stats = {"searches": 0, "fallbacks": 0, "loads": 0, "denied": 0}
+
+    def _version(self, company_id: int) -> Optional[Tuple[int, int]]:
+        """Identity of the company's meta.json, replaced on every build or append; None without an index."""
+        try:
+            meta = os.stat(os.path.join(self.root, str(company_id), "meta.json"))
+        except OSError:
+            return None
+        return meta.st_ino, meta.st_mtime_ns
+
+    def has_index(self, company_id: int) -> bool:
+        """Whether the company has an index on disk (a stat per call, so uploads in other workers show up)."""
+        return self._version(company_id) is not None
+
+    def _load(self, company_id: int) -> Optional[VectorIndex]:
+        if not self.has_index(company_id):
+            return None
+        index = VectorIndex(os.path.join(self.root, str(company_id)))
+        if index.meta.get("embedder") != self.embedder.name:
+            debug_print(f"Index of company {company_id} was built with {index.meta.get('embedder')}, not {self.embedder.name}; ignoring it")
+            return None
+        self._stats["loads"] += 1
+        return index
+
+    async def index(self, company_id: int) -> Optional[VectorIndex]:
+        """
+        The company's index, loaded in a worker thread on first use and again
+        after its files changed. Concurrent searches of the same version share
+        the load; a failed load is dropped, so the next search tries again.
+        """
+        version = self._version(company_id)
+        loaded = self._indexes.get(company_id)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        entry = self._loading.get(company_id)
+        if entry is None or entry[0] != version:
+            # A load started before the files changed would return the old index
+            entry = self._loading[company_id] = (version, asyncio.ensure_future(asyncio.to_thread(self._load, company_id)))
+        try:
+            index = await asyncio.shield(entry[1])
+        except Exception:
+            if self._loading.get(company_id) is entry:
+                del self._loading[company_id]
+            raise
+        # Kept unless the company was reloaded, or a newer version requested, while this load ran
+        if self._loading.get(company_id) is entry:
+            del self._loading[company_id]
+            self._indexes[company_id] = (version, index)
+        return index
+
+    def reload(self, company_id: int) -> None:
+        """Forget a loaded index so the next search reads the files again."""
+        self._indexes.pop(company_id, None)
+        self._loading.pop(company_id, None)
+
+    def _search(self, index: VectorIndex, queries: Sequence[str]) -> List[List[Dict[str, Any]]]:
+        return index.search_batch(
+            queries,
+            self.embedder.embed(queries),
+            k=self.config.kb_local_top_k,
+            hybrid_weight=self.config.kb_hybrid_weight,
+            nprobe=self.config.kb_ivf_nprobe,
+        )
+
+    async def search_documents(self, queries: Sequence[str], company_id: int) -> Optional[List[List[Dict[str, Any]]]]:
+        """Ranked chunks per query, or None without an index; callers must have checked access."""
+        index = await self.index(company_id)
+        if index is None:
+            return None
+        self._stats["searches"] += len(queries)
+        if index.cells * len(queries) > _INLINE_SEARCH_CELLS:
+            return await asyncio.to_thread(self._search, index, list(queries))
+        return self._search(index, list(queries))
+
+    async def search_batch(self, queries: Sequence[str], auth_tokens: Sequence[str], company_id: int) -> List[Dict[str, Any]]:
+        if not self.has_index(company_id):
+            if self.fallback is None:
+                return [_create_error_response(f"No local knowledge index for company {company_id}", status_code=404)] * len(queries)
+            self._stats["fallbacks"] += len(queries)
+            return await self.fallback.search_batch(queries, auth_tokens, company_id)
+        denied: Dict[str, Optional[Dict[str, Any]]] = {}
+        if self.access is not None:
+            for auth_token in set(auth_tokens):
+                denied[auth_token] = await self.access.check(auth_token, company_id)
+        allowed = [i for i, auth_token in enumerate(auth_tokens) if denied.get(auth_token) is None]
+        self._stats["denied"] += len(queries) - len(allowed)
+        found = await self.search_documents([queries[i] for i in allowed], company_id) if allowed else []
+        results: List[Dict[str, Any]] = [denied.get(auth_token) for auth_token in auth_tokens]
+        for i, documents in zip(allowed, found or [[] for _ in allowed]):
+            results[i] = _create_success_response({"data": documents}, {}, "Local search successful")
+        return results
+
+    async def search(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        return (await self.search_batch([query], [auth_token], company_id))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        loaded = [index for _, index in self._indexes.values() if index is not None]
+        return {
+            **self._stats,
+            "root": self.root,
+            "companies": len(loaded),
+            "chunks": sum(index.count for index in loaded),
+            "vector_bytes": sum(index.vectors.nbytes for index in loaded),
+        }
+
+
+class BackendRouter:
+    """
+    Picks how each company is searched.
+
+    A company pinned to ``local`` in ``kb_company_backends``, or every company
+    with ``kb_backend="local"``, is searched only locally. A company with a
+    local index (e.g. built from uploaded documents) and no such setting is
+    searched both ways and gets the merged results, so uploads add to its
+    knowledge base instead of hiding it. Everything else goes to the API.
+    With batching on and an API that serves batch searches, concurrent HTTP
+    searches of one company share a ``search_batch`` call; local searches take
+    well under the batching window and are not held back.
+    """
+
+    def __init__(self, config: Optional[Configuration] = None):
+        self.config = config or Configuration()
+        self.http = HttpBackend(batch_endpoint=self.config.kb_batch_endpoint_enabled)
+        self.access = CompanyAccess(self.http, self.config)
+        self.local: Optional[LocalVectorBackend] = None
+        if np is not None:
+            self.local = LocalVectorBackend(self.config.kb_index_dir, self.config, fallback=self.http, access=self.access)
+        elif self.config.kb_backend == "local" or "local" in self.config.kb_company_backends.values():
+            debug_print("Local retrieval requested but numpy is not installed; using the knowledge-base API")
+        self.batcher = (
+            SearchBatcher(self.config.kb_batch_window, self.config.kb_batch_max_size)
+            if self.config.kb_batching_enabled else None
+        )
+        self._routes = {"http": 0, "local": 0, "merged": 0, "merged_local_only": 0}
+
+    def route(self, company_id: int) -> str:
+        """``"local"``, ``"http"`` or ``"merged"`` (both, for an uploaded index on top of the API)."""
+        if self.local is None:
+            return "http"
+        name = self.config.kb_company_backends.get(company_id, self.config.kb_backend)
+        if name == "local":
+            return "local"
+        if company_id in self.config.kb_company_backends or not self.local.has_index(company_id):
+            return "http"
+        # Without an API to merge with, the uploaded index is all the company has
+        return "merged" if KNOWLEDGE_BASE_URL else "local"
+
+    async def _search_http(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        if self.batcher is not None and self.http.micro_batch:
+            result = await self.batcher.search(self.http, query, auth_token, company_id)
+        else:
+            result = await self.http.search(query, auth_token, company_id)
+        if result.get("success"):
+            self.access.trust(auth_token, company_id)
+        return result
+
+    async def _search_merged(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        remote, local = await asyncio.gather(
+            self._search_http(query, auth_token, company_id),
+            self.local.search_documents([query], company_id),
+        )
+        if local is None:
+            return remote
+        if remote.get("success"):
+            payload = remote.get("data") or {}
+            documents = _merge_documents(payload.get("data") or [], local[0])
+            return {**remote, "data": {**payload, "data": documents}}
+        if remote.get("status_code") in (401, 403):
+            return remote
+        # The API failed otherwise: the uploaded documents still answer for a token trusted earlier
+        if await self.access.check(auth_token, company_id) is not None:
+            return remote
+        self._routes["merged_local_only"] += 1
+        return _create_success_response({"data": local[0]}, {}, "Local search successful")
+
+    async def search(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        route = self.route(company_id)
+        self._routes[route] += 1
+        started = time.perf_counter()
+        if route == "merged":
+            result = await self._search_merged(query, auth_token, company_id)
+        elif route == "local":
+            result = await self.local.search(query, auth_token, company_id)
+        else:
+            result = await self._search_http(query, auth_token, company_id)
+        KB_BACKEND_DURATION.observe(time.perf_counter() - started, backend=route)
+        return result
+
+    async def search_batch(self, queries: Sequence[str], auth_tokens: Sequence[str], company_id: int) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*[
+            self.search(query, auth_token, company_id) for query, auth_token in zip(queries, auth_tokens)
+        ]))
+
+    async def authorize(self, auth_token: str, company_id: int) -> Optional[Dict[str, Any]]:
+        """``None`` when the token may read the company's knowledge, otherwise the error response."""
+        return await self.access.check(auth_token, company_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.config.kb_backend,
+            "companies": {str(company): name for company, name in self.config.kb_company_backends.items()},
+            "routes": dict(self._routes),
+            "http": self.http.stats(),
+            "access": self.access.stats(),
+            "local": self.local.stats() if self.local is not None else None,
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+        }
+
+
+def _merge_documents(remote: List[Dict[str, Any]], local: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Alternate API and local results rank by rank, dropping local chunks the API already returned.
+
+    The two backends score on different scales, so each document's ``score``
+    is replaced by one that follows the merged order (the backend's own is
+    kept as ``source_score``); sorting by score, as packing does, keeps the
+    interleave instead of ranking one backend wholesale above the other.
+    """
+    seen = {doc.get("content") for doc in remote}
+    local = [doc for doc in local if doc.get("content") not in seen]
+    merged: List[Dict[str, Any]] = []
+    for pair in zip(remote, local):
+        merged.extend(pair)
+    shorter = min(len(remote), len(local))
+    merged += remote[shorter:] + local[shorter:]
+    return [
+        {**doc, "score": round(1.0 - rank / len(merged), 4), "source_score": doc.get("score", doc.get("similarity"))}
+        for rank, doc in enumerate(merged)
+    ]
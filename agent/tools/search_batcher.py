@@ -0,0 +1,92 @@
+"""Cross-session micro-batching of knowledge searches per (company, backend)."""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .metrics import KB_BATCH_SIZE, KB_BATCH_WAIT
+from .utils import _create_error_response
+
+
+class _Batch:
+    __slots__ = ("backend", "company_id", "items", "handle")
+
+    def __init__(self, backend: Any, company_id: int):
+        self.backend = backend
+        self.company_id = company_id
+        # (query, auth_token, future, enqueued_at)
+        self.items: List[Tuple[str, str, "asyncio.Future[Dict[str, Any]]", float]] = []
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class SearchBatcher:
+    """
+    Collects searches for the same company and backend for up to ``window``
+    seconds (or ``max_size`` searches) and sends them as one ``search_batch``
+    call; each caller gets its own result back.
+
+    The first search of a batch waits the longest, at most ``window``; later
+    ones wait less. A failed batch call fails every search in it.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self._open: Dict[Tuple[int, str], _Batch] = {}
+        self._sending: Set[asyncio.Task] = set()
+        self._stats = {"searches": 0, "batches": 0, "full_batches": 0, "max_batch": 0, "wait_ms_total": 0.0}
+
+    async def search(self, backend: Any, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        key = (company_id, backend.name)
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = _Batch(backend, company_id)
+            batch.handle = asyncio.get_running_loop().call_later(self.window, self._flush, key, batch)
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append((query, auth_token, future, time.perf_counter()))
+        self._stats["searches"] += 1
+        if len(batch.items) >= self.max_size:
+            self._stats["full_batches"] += 1
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: Tuple[int, str], batch: _Batch) -> None:
+        if self._open.get(key) is batch:
+            del self._open[key]
+        batch.handle.cancel()
+        task = asyncio.create_task(self._send(batch))
+        # Held until done so the task is not garbage-collected mid-flight
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        sent = time.perf_counter()
+        size = len(batch.items)
+        KB_BATCH_SIZE.observe(size, backend=batch.backend.name)
+        for _, _, _, enqueued in batch.items:
+            KB_BATCH_WAIT.observe(sent - enqueued, backend=batch.backend.name)
+            self._stats["wait_ms_total"] += (sent - enqueued) * 1000
+        self._stats["batches"] += 1
+        self._stats["max_batch"] = max(self._stats["max_batch"], size)
+        try:
+            results = await batch.backend.search_batch(
+                [query for query, _, _, _ in batch.items],
+                [token for _, token, _, _ in batch.items],
+                batch.company_id,
+            )
+        except Exception as e:
+            results = [_create_error_response(f"Batched knowledge search failed: {e.__class__.__name__}", status_code=0)] * size
+        for (_, _, future, _), result in zip(batch.items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._stats["batches"]
+        return {
+            **{k: v for k, v in self._stats.items() if k != "wait_ms_total"},
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "avg_batch": round(self._stats["searches"] / batches, 2) if batches else None,
+            "avg_wait_ms": round(self._stats["wait_ms_total"] / self._stats["searches"], 3) if self._stats["searches"] else None,
+            "open": len(self._open),
+        }
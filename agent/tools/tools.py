@@ -1,60 +1,195 @@
 """Streamlined tools for the AI Agent Starter Kit."""
 
+import asyncio
 import json
 import re
-import urllib.parse
-from typing import Dict, Any
+import time
+from itertools import chain, zip_longest
+from typing import Annotated, Dict, Any, List, Optional
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedState
 import httpx # Need to import httpx for APIClient
-from .utils import _create_error_response, APIClient, KNOWLEDGE_BASE_URL, _create_success_response, debug_print
+from .cache import TTLCache
+from .config import Configuration
+from .metrics import KB_CONTEXT_TOKENS, KB_DOCUMENTS, KB_SEARCH_DURATION, log_event
+from .packing import pack_knowledge_context
+from .prefetch import claim_prefetch
+from .retrieval import BackendRouter
+from .utils import _create_error_response, KNOWLEDGE_BASE_URL, _create_success_response, debug_print
+
+
+# --- Knowledge Base Configuration & Result Cache ---
+_tool_config = Configuration()
+knowledge_cache = TTLCache(
+    max_entries=_tool_config.kb_cache_max_entries,
+    ttl=_tool_config.kb_cache_ttl,
+    max_bytes=_tool_config.kb_cache_max_bytes,
+)
+# The knowledge-base API or the local vector index, per company
+retrieval = BackendRouter(_tool_config)
+
+
+def _normalize_query(query: str) -> str:
+    """Normalize a search query so trivially different phrasings share a cache entry."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+# Bumped whenever a company's knowledge changes; derived caches (answers) key on it
+_knowledge_versions: Dict[int, int] = {}
+
+
+def knowledge_version(company_id: int) -> int:
+    return _knowledge_versions.get(company_id, 0)
+
+
+def invalidate_company_knowledge(company_id: int) -> int:
+    """Drop cached knowledge results for a company, e.g. after its knowledge base changed."""
+    _knowledge_versions[company_id] = knowledge_version(company_id) + 1
+    if retrieval.local is not None:
+        retrieval.local.reload(company_id)
+    return knowledge_cache.invalidate(lambda key: key[0] == company_id)
+
+
+async def _search_knowledge(query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+    """Query the knowledge base, serving repeated (company, query) pairs from the cache."""
+    fetched = False
+
+    async def fetch() -> Dict[str, Any]:
+        nonlocal fetched
+        fetched = True
+        return await retrieval.search(query, auth_token, company_id)
+
+    if not _tool_config.kb_cache_enabled:
+        return await fetch()
+
+    # The company id is part of the key so entries are never shared across companies
+    result = await knowledge_cache.get_or_load(
+        (company_id, _normalize_query(query)),
+        fetch,
+        should_cache=lambda result: bool(result.get("success")),
+    )
+    if not fetched:
+        # Found by another caller's search: this token must be allowed to read the company as well
+        denied = await retrieval.authorize(auth_token, company_id)
+        if denied is not None:
+            return denied
+    return result
+
+
+async def _search_with_timeout(
+    query: str, auth_token: str, company_id: int, slots: asyncio.Semaphore, timeout: float
+) -> Dict[str, Any]:
+    """Run one sub-query under the fan-out limit; a slow search becomes an error instead of blocking the rest."""
+    async with slots:
+        try:
+            return await asyncio.wait_for(_search_knowledge(query, auth_token, company_id), timeout)
+        except asyncio.TimeoutError:
+            return _create_error_response(f"Knowledge search timed out after {timeout:g}s", status_code=0)
+
+
+async def _await_prefetched(task: "asyncio.Future[Dict[str, Any]]", timeout: float) -> Dict[str, Any]:
+    """Result of a speculative search started before the tool call, under the same timeout."""
+    try:
+        return await asyncio.wait_for(task, timeout)
+    except asyncio.TimeoutError:
+        return _create_error_response(f"Knowledge search timed out after {timeout:g}s", status_code=0)
+
+
+def _interleave(document_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Merge per-query results rank by rank so every sub-query gets a share of the context budget."""
+    return [doc for doc in chain.from_iterable(zip_longest(*document_lists)) if doc is not None]
 
 
 # --- Tool: Document Knowledge (The only one kept) ---
 @tool
-async def document_knowledge(query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+async def document_knowledge(
+    query: str,
+    auth_token: Annotated[str, InjectedState("auth_token")],
+    company_id: Annotated[int, InjectedState("company_id")],
+    sub_queries: Optional[List[str]] = None,
+    config: RunnableConfig = None,
+) -> Dict[str, Any]:
     """
     Performs a semantic search on the private knowledge base to answer user questions.
     Only use this tool when the answer is not available in the current state.
     
     Args:
         query: A concise, high-quality search query to retrieve relevant documents.
-        auth_token: The user's authentication token.
-        company_id: The user's company ID.
+        auth_token: The user's authentication token (injected from state, hidden from the LLM).
+        company_id: The user's company ID (injected from state, hidden from the LLM).
+        sub_queries: Optional extra queries, one per additional topic when the question covers several.
+            They are searched concurrently with `query` and merged into one context.
+        config: The run configuration (injected; identifies the thread for speculative prefetches).
         
     Returns:
         JSON string with search results and state updates.
     """
-    debug_print("document_knowledge input query:", query)
+    debug_print("document_knowledge input query:", query, sub_queries)
     
-    if not KNOWLEDGE_BASE_URL:
+    if not KNOWLEDGE_BASE_URL and retrieval.route(company_id) == "http":
         return _create_error_response("Knowledge base URL is not configured. Check environment variables.")
-        
-    # Format the query for URL
-    encoded_query = urllib.parse.quote(query)
-    
-    result = await APIClient.make_request(
-        f"{KNOWLEDGE_BASE_URL}/knowledge/search?companyId={company_id}&query={encoded_query}", 
-        method="GET", 
-        auth_token=auth_token
-    )
-    
-    debug_print("document_knowledge api output:", result)
+
+    # Unique queries, original order, capped
+    queries = list(dict.fromkeys(q.strip() for q in [query, *(sub_queries or [])] if q and q.strip()))
+    queries = queries[: _tool_config.kb_max_sub_queries]
+
+    # A search started speculatively on the raw user message stands in for a similar query
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    prefetched = claim_prefetch(thread_id, queries)
+
+    slots = asyncio.Semaphore(_tool_config.kb_fanout_concurrency)
+    timeout = _tool_config.kb_subquery_timeout
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        _await_prefetched(prefetched[1], timeout)
+        if prefetched and i == prefetched[0]
+        else _search_with_timeout(q, auth_token, company_id, slots, timeout)
+        for i, q in enumerate(queries)
+    ])
+    elapsed = time.perf_counter() - started
+    KB_SEARCH_DURATION.observe(elapsed, sub_queries=len(queries))
     
-    if result.get("success"):
-        # Process the result and format it into a cohesive answer string for the LLM
-        documents = result.get("data", {}).get("data", [])
+    debug_print("document_knowledge api output:", results)
+
+    succeeded = [result for result in results if result.get("success")]
+    if succeeded:
+        # Process the results and format them into a cohesive answer string for the LLM
+        documents = _interleave([result.get("data", {}).get("data", []) or [] for result in succeeded])
         
-        # Concatenate snippets into a single context string
-        context = "\n---\n".join([doc.get("content", "") for doc in documents if doc.get("content")])
+        # Dedupe, rank and fit the snippets into the context token budget
+        context, packing = pack_knowledge_context(
+            documents,
+            token_budget=_tool_config.kb_context_token_budget,
+            near_duplicate_threshold=_tool_config.kb_near_duplicate_threshold,
+            shingle_size=_tool_config.kb_shingle_size,
+            model=_tool_config.model,
+        )
+        debug_print("document_knowledge packing:", packing)
+        KB_DOCUMENTS.observe(len(documents))
+        KB_CONTEXT_TOKENS.observe(packing["tokens_kept"])
+        log_event(
+            "kb_search",
+            company_id=company_id,
+            sub_queries=len(queries),
+            failed=len(queries) - len(succeeded),
+            documents=len(documents),
+            context_tokens=packing["tokens_kept"],
+            duration_ms=round(elapsed * 1000, 2),
+        )
         
         # Prepare the response with the context and state update
         state_updates = {"knowledge_base_search_performed": True}
         response_data = {"knowledge_context": context}
+        failed = [q for q, result in zip(queries, results) if not result.get("success")]
+        if failed:
+            response_data["failed_queries"] = failed
         
         return _create_success_response(response_data, state_updates, "Knowledge search complete.")
 
     # Return error on failure
-    return result
+    return results[0]
 
 
 # --- Tool Export ---
@@ -3,23 +3,139 @@
 FastAPI Server for the Stateful OnboardKit Onboarding Agent
 """
 
+import asyncio
+import secrets
+import time
 import uuid
 import json
-from typing import Dict, Any, Optional
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+import zlib
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Iterator, Literal, Optional
+from fastapi import FastAPI, File, Header, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from langchain_core.messages import HumanMessage, AIMessage
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, RemoveMessage, ToolMessage
+from .answer_cache import answer_cache_summary, invalidate_company_answers
+from .batch import ndjson_items, run_batch
+from .cache import TTLCache
+from .concurrency import ConcurrencyLimiter, KeyedLocks, QueueFullError
+from .config import Configuration
+from .fast_path import fast_path_summary
 from .graph import graph
-from .utils import debug_print
+from .ingest import DocumentIngestor
+from .message_store import message_storage_summary
+from .metrics import CHAT_DURATION, CHAT_QUEUE_WAIT, CHAT_TTFB, CHAT_TURNS, log_event, metrics
+from .model_tiers import ROUTER_TAG, model_tier_summary
+from .packing import packing_stats
+from .prefetch import prefetch_summary
+from .prompt_builder import prompt_cache_stats, session_block
+from .prompts import SYSTEM_PROMPT
+from .resilience import resilience
+from .session_store import create_session_store
+from .streams import SessionStream, StreamRegistry, format_event, parse_event_id
+from .tokens import count_tokens, message_text
+from .tools import invalidate_company_knowledge, knowledge_cache, retrieval
+from .utils import APIClient, debug_print, get_llm_with_tools, llm_limiter
 
 
 # ===============================================
 # ====================setup======================
 # ===============================================
-app = FastAPI(title="OnboardKit Onboarding Agent API", version="4.1.0")
+config = Configuration()
+session_store = create_session_store(config)
+# Recent events of each session's chat turns, replayable after a dropped connection to this worker
+chat_streams = StreamRegistry(max_events=config.stream_buffer_events, retention=config.stream_retention)
+
+
+def _knowledge_changed(company_id: int) -> None:
+    """Newly indexed documents retire the company's cached searches and answers."""
+    invalidate_company_knowledge(company_id)
+    invalidate_company_answers(company_id)
+
+
+ingestor = DocumentIngestor(config, on_indexed=_knowledge_changed)
+
+
+async def _drop_checkpoints(session_id: str, reason: str) -> None:
+    """Evicts the session's checkpoints and replay buffer together with its auth data and cached state."""
+    chat_streams.discard(session_id)
+    adelete_thread = getattr(graph.checkpointer, "adelete_thread", None)
+    if adelete_thread is not None:
+        await adelete_thread(session_id)
+    debug_print(f"Session {session_id} evicted ({reason})")
+
+
+session_store.add_eviction_listener(_drop_checkpoints)
+
+# Turns of one session run one at a time (in this process, hence sticky routing by session id with
+# several workers, see create_session_store); graph runs across sessions are capped
+session_locks = KeyedLocks(max_waiters=config.session_max_queued_turns)
+run_limiter = ConcurrencyLimiter(
+    "chat",
+    max_concurrent=config.chat_max_concurrent_runs,
+    max_queue=config.chat_max_queue,
+    queue_timeout=config.chat_queue_timeout,
+)
+
+# Scrape-time gauges over the shared resources
+metrics.gauge("onboardkit_sessions", "Sessions held by this worker").set_function(lambda: session_store.stats()["sessions"])
+metrics.gauge("onboardkit_chat_active_runs", "Graph runs executing").set_function(lambda: run_limiter.stats()["active"])
+metrics.gauge("onboardkit_chat_waiting_runs", "Chat turns waiting for a run slot").set_function(lambda: run_limiter.stats()["waiting"])
+metrics.gauge("onboardkit_http_in_use", "Pooled upstream HTTP requests in flight").set_function(lambda: APIClient.pool_stats()["in_use"])
+
+
+# Startup warmup progress, reported by /ready
+readiness: Dict[str, Any] = {"ready": False, "error": None, "steps_ms": {}}
+
+
+async def _warm_up() -> None:
+    """Pays the one-off costs of the first chat turn (imports, client setup, tokenizer) before traffic arrives."""
+    steps = {
+        # Imports the OpenAI client stack on first use
+        "llm": lambda: get_llm_with_tools(config),
+        "llm_router": lambda: get_llm_with_tools(config, "router"),
+        # Loads the tokenizer and caches the token count of the static prompt prefix
+        "prompt": lambda: count_tokens(SYSTEM_PROMPT, config.model) + count_tokens(session_block({}), config.model),
+        # Walks the compiled nodes and edges once, surfacing wiring errors before the first turn
+        "graph": lambda: graph.get_graph(),
+    }
+    started = time.perf_counter()
+    try:
+        step_started = time.perf_counter()
+        await APIClient.open(config)
+        readiness["steps_ms"]["http_pool"] = round((time.perf_counter() - step_started) * 1000, 1)
+        for name, step in steps.items():
+            step_started = time.perf_counter()
+            # In a thread so the event loop keeps answering probes meanwhile
+            await asyncio.to_thread(step)
+            readiness["steps_ms"][name] = round((time.perf_counter() - step_started) * 1000, 1)
+    except Exception as e:
+        readiness["error"] = f"{e.__class__.__name__}: {e}"
+        debug_print("Warmup failed:", readiness["error"])
+        log_event("warmup_failed", error=readiness["error"])
+        return
+    readiness["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    readiness["ready"] = True
+    log_event("warmup", **readiness["steps_ms"], total_ms=readiness["total_ms"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warms up in the background so the port opens at once; releases shared resources on shutdown."""
+    warmup = asyncio.create_task(_warm_up())
+    sweeper = asyncio.create_task(session_store.run_sweeper(config.session_sweep_interval))
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        sweeper.cancel()
+        await chat_streams.shutdown()
+        await APIClient.close()
+
+
+app = FastAPI(title="OnboardKit Onboarding Agent API", version="4.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,8 +144,6 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-session_auth_data = {}
-sessions: Dict[str, Dict[str, Any]] = {}
 
 
 # ===============================================
@@ -51,6 +165,139 @@ class SessionCreateResponse(BaseModel):
     session_id: str
 
 
+# ===============================================
+# ====================helpers====================
+# ===============================================
+# Session fields the client may see (never credentials or internal bookkeeping)
+_PUBLIC_STATE_KEYS = ("full_name", "first_name", "last_name", "email", "company_name", "welcome_message", "last_error")
+
+# Serialized messages, memoized per message so polls do not re-serialize unchanged history
+_message_views = TTLCache(max_entries=50_000, ttl=3600.0, sizeof=lambda view: len(view["content"]) + 128)
+
+
+def _is_visible(msg: Any) -> bool:
+    """User and assistant messages with text; tool results and tool-call requests stay internal."""
+    if isinstance(msg, HumanMessage):
+        return True
+    return isinstance(msg, AIMessage) and bool(msg.content) and not msg.tool_calls
+
+
+def _message_view(msg: Any) -> Dict[str, Any]:
+    key = (msg.id, msg.type)
+    found, view = _message_views.get(key)
+    if found:
+        return view
+    view = {
+        "id": msg.id,
+        "role": "user" if isinstance(msg, HumanMessage) else "assistant",
+        "content": msg.content if isinstance(msg.content, str) else message_text(msg),
+    }
+    # The pending user message of a running turn has no id until the graph stores it
+    if msg.id:
+        _message_views.set(key, view)
+    return view
+
+
+def _thread_config(session_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": session_id, "session_id": session_id}}
+
+
+async def _load_state(session_id: str) -> Optional[Dict[str, Any]]:
+    """Returns the cached session state, falling back to the latest checkpoint (e.g. written by another worker)."""
+    state = await session_store.get_state(session_id)
+    if state is None:
+        snapshot = await graph.aget_state(_thread_config(session_id))
+        if snapshot and snapshot.values:
+            state = snapshot.values
+            await session_store.set_state(session_id, state)
+    return state
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    A streaming response that may start while the request body is still being
+    read. Unlike ``StreamingResponse`` on ASGI < 2.4 servers, it does not read
+    the request channel to watch for disconnects, which would steal body chunks;
+    the body consumer notices a disconnect instead.
+    """
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+class _RunPermit:
+    """The session lock and run slot held for one chat turn; release is idempotent."""
+
+    def __init__(self, session_id: str, queue_wait: float):
+        self.session_id = session_id
+        self.queue_wait = queue_wait
+        self.started = time.perf_counter()
+        self._released = False
+
+    @property
+    def execution_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def timings(self) -> Dict[str, float]:
+        return {
+            "queue_wait_ms": round(self.queue_wait * 1000, 1),
+            "execution_ms": round(self.execution_seconds * 1000, 1),
+        }
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        run_limiter.release(self.execution_seconds)
+        session_locks.release(self.session_id)
+
+
+async def _admit(session_id: str) -> _RunPermit:
+    """Serializes turns per session and takes a global run slot, or fails fast with a 429."""
+    try:
+        session_wait = await session_locks.acquire(session_id)
+    except QueueFullError as e:
+        CHAT_TURNS.inc(outcome="rejected")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    try:
+        run_wait = await run_limiter.acquire()
+    except QueueFullError as e:
+        session_locks.release(session_id)
+        CHAT_TURNS.inc(outcome="rejected")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except BaseException:
+        session_locks.release(session_id)
+        raise
+    CHAT_QUEUE_WAIT.observe(session_wait + run_wait)
+    return _RunPermit(session_id, session_wait + run_wait)
+
+
+def _bearer_token(authorization: Optional[str]) -> str:
+    return authorization[7:] if authorization and authorization.lower().startswith("bearer ") else ""
+
+
+async def _require_company_access(authorization: Optional[str], company_id: int, session_token: Optional[str] = None) -> str:
+    """
+    The caller's bearer token once it may change ``company_id``'s knowledge
+    (and, for a session endpoint, is the session's token); 401/403 otherwise.
+    """
+    token = _bearer_token(authorization)
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    if session_token is not None and not secrets.compare_digest(token.encode(), session_token.encode()):
+        raise HTTPException(status_code=403, detail="Token does not belong to this session")
+    denied = await retrieval.authorize(token, company_id)
+    if denied is not None:
+        status = denied.get("status_code")
+        raise HTTPException(status_code=status if status in (401, 403, 503) else 403, detail=denied["error"])
+    return token
+
+
 # ===============================================
 # ====================api========================
 # ===============================================
@@ -61,100 +308,435 @@ async def create_session(auth_data: SessionCreateRequest):
     """
     session_id = str(uuid.uuid4())
     # Store auth data for this session
-    session_auth_data[session_id] = auth_data
+    await session_store.create(session_id, auth_data.model_dump())
     return SessionCreateResponse(session_id=session_id)
 
+@app.get("/ready", response_model=Dict[str, Any])
+async def get_ready():
+    """
+    Readiness probe: 200 once the startup warmup has finished, 503 (with progress) until then.
+    """
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/stats", response_model=Dict[str, Any])
+async def get_stats():
+    """
+    Returns runtime statistics for shared resources (connection pool usage, caches).
+    """
+    return {
+        "http_pool": APIClient.pool_stats(),
+        "knowledge_cache": knowledge_cache.stats(),
+        "retrieval": retrieval.stats(),
+        "ingestion": ingestor.stats(),
+        "answer_cache": answer_cache_summary(),
+        "fast_path": fast_path_summary(),
+        "sessions": session_store.stats(),
+        "prompt_cache": prompt_cache_stats(),
+        "model_tiers": {"enabled": config.model_tiers_enabled, **model_tier_summary()},
+        "knowledge_packing": dict(packing_stats),
+        "knowledge_prefetch": prefetch_summary(),
+        "message_storage": message_storage_summary(graph.checkpointer),
+        "streams": chat_streams.stats(),
+        "admission": {"chat": run_limiter.stats(), "llm": llm_limiter.stats(), "sessions": session_locks.stats()},
+        "upstreams": resilience.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Returns hot-path metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/knowledge/{company_id}/invalidate")
+async def invalidate_knowledge(company_id: int, authorization: Optional[str] = Header(default=None)):
+    """
+    Drops cached knowledge search results and answers for a company after its knowledge base changed.
+
+    Requires a bearer token the knowledge-base API accepts for the company.
+    """
+    await _require_company_access(authorization, company_id)
+    ingestor.forget(company_id)
+    return {
+        "company_id": company_id,
+        "invalidated": invalidate_company_knowledge(company_id),
+        "answers_invalidated": invalidate_company_answers(company_id),
+    }
+
 @app.get("/chat/{session_id}", response_model=Dict[str, Any])
-async def get_chat_history(session_id: str):
+async def get_chat_history(
+    session_id: str,
+    after: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    if_none_match: Optional[str] = Header(default=None),
+):
     """
-    Retrieves the chat history for a given session.
+    Retrieves a page of the user-visible chat history for a given session.
+
+    Without ``after`` the latest ``limit`` messages are returned; pass the
+    returned ``next_cursor`` as ``after`` to poll for newer messages only.
+    Tool messages, tool-call requests and internal state are left out, and an
+    unchanged page answers ``If-None-Match`` with 304.
     """
-    if session_id not in sessions:
+    state = await _load_state(session_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Filter out ToolMessages from the history as they are not for the end user
-    messages = [
-        msg.model_dump() 
-        for msg in sessions[session_id].get("messages", []) 
-        if not isinstance(msg, AIMessage) or not getattr(msg, "tool_calls", None)
-    ]
 
-    return {"messages": messages, "state": sessions[session_id]}
+    visible = [msg for msg in state.get("messages", []) if _is_visible(msg)]
+    session = {k: state.get(k) for k in _PUBLIC_STATE_KEYS}
+    last_id = visible[-1].id if visible else ""
+    etag = '"{:08x}"'.format(zlib.crc32(
+        json.dumps([len(visible), last_id, after, limit, session], default=str).encode()
+    ))
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    reset = False
+    if after is None:
+        page = visible[-limit:]
+    else:
+        position = next((i for i, msg in enumerate(visible) if msg.id == after), None)
+        if position is None:
+            # The cursor message was compacted away; start over from the latest page
+            reset, page = True, visible[-limit:]
+        else:
+            page = visible[position + 1: position + 1 + limit]
+    has_more = bool(page) and page[-1].id != last_id
+
+    body = {
+        "messages": [_message_view(msg) for msg in page],
+        "next_cursor": page[-1].id if page else after,
+        "has_more": has_more,
+        "reset": reset,
+        "session": session,
+    }
+    return JSONResponse(body, headers={"ETag": etag})
+
+# Nodes whose message updates are internal bookkeeping, not output for the client
+_SILENT_NODES = {"compact_history"}
+
+
+def _ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event) + "\n"
+
+
+def _node_events(node: str, update: Dict[str, Any], tokens_streamed: bool) -> Iterator[Dict[str, Any]]:
+    """Translates a single node update into stream events."""
+    if node in _SILENT_NODES:
+        return
+    for msg in update.get("messages", []) or []:
+        if isinstance(msg, ToolMessage):
+            yield {
+                "type": "tool_end",
+                "tool": msg.name,
+                "tool_call_id": msg.tool_call_id,
+                "status": getattr(msg, "status", "success"),
+            }
+        elif isinstance(msg, AIMessage):
+            # Tokens were already sent while generating; only whole messages that were
+            # never streamed (legacy mode, error replies) are emitted in full here.
+            if msg.content and not tokens_streamed:
+                yield {"type": "stream", "content": msg.content}
+            for call in msg.tool_calls or []:
+                yield {
+                    "type": "tool_start",
+                    "tool": call["name"],
+                    "tool_call_id": call.get("id"),
+                    # Never echo credentials back to the client
+                    "args": {k: v for k, v in (call.get("args") or {}).items() if k != "auth_token"},
+                }
+
+
+def _wants_sse(request: Request) -> bool:
+    return "text/event-stream" in request.headers.get("accept", "")
+
+
+def _follow_response(session_id: str, after: int, request: Request, resume: bool = False, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Streams the session's events after ``after`` (replayed, then live) as NDJSON or SSE."""
+    sse = _wants_sse(request)
+
+    async def events():
+        async for event_id, event in chat_streams.follow(session_id, after, resume):
+            yield format_event(event_id, event, sse)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", **(headers or {})},
+    )
+
+
+@app.post("/chat/batch")
+async def batch_chat(
+    request: Request,
+    concurrency: Optional[int] = Query(default=None, ge=1),
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Runs an NDJSON stream of ``{"company_id", "question"}`` items through the agent.
+
+    Items run on a bounded worker pool with ephemeral sessions that are never
+    persisted, each in a run slot shared with chat turns; results stream back
+    as NDJSON in completion order with latency and token stats, followed by a
+    summary record. The upload is parsed as it arrives, so results start
+    before it ends. The bearer token is used for knowledge-base searches
+    unless an item carries its own ``auth_token``.
+    """
+    workers = min(concurrency or config.batch_max_concurrency, config.batch_max_concurrency)
+    auth_token = _bearer_token(authorization)
+    uploaded = disconnected = False
+
+    async def chunks():
+        nonlocal uploaded, disconnected
+        try:
+            async for chunk in request.stream():
+                yield chunk
+        except ClientDisconnect:
+            disconnected = True
+            return
+        uploaded = True
+
+    async def results():
+        async for record in run_batch(ndjson_items(chunks()), workers, auth_token, limiter=run_limiter):
+            yield _ndjson(record)
+            # Only once the upload is read: checking earlier would swallow a body chunk
+            if disconnected or (uploaded and await request.is_disconnected()):
+                debug_print("Batch client disconnected; stopping the batch")
+                return
+
+    return _DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def _reset_failed_turn(session_id: str, error_message: str) -> None:
+    """
+    Rolls a failed turn back to the user's message plus the error, in the checkpoint itself:
+    the next turn, on any worker, must not resume a half-done step (e.g. a tool call without
+    its result). The cached session state is refreshed from the result.
+    """
+    run_config = _thread_config(session_id)
+    try:
+        snapshot = await graph.aget_state(run_config)
+        messages = (snapshot.values or {}).get("messages", []) if snapshot else []
+        last_human = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=-1)
+        await graph.aupdate_state(run_config, {
+            "messages": [*(RemoveMessage(id=message.id) for message in messages[last_human + 1:]), AIMessage(content=error_message)],
+            "last_error": error_message,
+        }, as_node="react_agent")
+        snapshot = await graph.aget_state(run_config)
+        await session_store.set_state(session_id, snapshot.values)
+    except Exception as e:
+        debug_print(f"Could not reset the failed turn: {type(e).__name__}: {e}")
+
+
+async def _run_turn(
+    session_id: str, stream: SessionStream, graph_input: Dict[str, Any], stream_mode: str, permit: _RunPermit
+) -> None:
+    """
+    Runs one chat turn to completion and publishes its events to the session's stream.
+
+    Detached from the request: a dropped connection does not stop the run, the
+    client reconnects and replays what it missed instead.
+    """
+    first_event = True
+
+    def publish(event: Dict[str, Any]) -> None:
+        nonlocal first_event
+        if first_event:
+            CHAT_TTFB.observe(permit.execution_seconds)
+            first_event = False
+        stream.publish(event)
+
+    run_config = _thread_config(session_id)
+    # "updates" drives tool events, "values" keeps the session state current and
+    # "messages" yields LLM tokens as they are generated.
+    modes = ["updates", "values"] + (["messages"] if stream_mode == "tokens" else [])
+    tokens_streamed = False
+    outcome = "cancelled"
+    try:
+        async for mode, chunk in graph.astream(graph_input, config=run_config, stream_mode=modes):
+            if mode == "messages":
+                message, metadata = chunk
+                # Router-tier tokens are held back: an escalated decision is discarded, and a kept
+                # one reaches the client whole with the node update below
+                if (
+                    isinstance(message, AIMessageChunk)
+                    and message.content
+                    and metadata.get("langgraph_node") == "react_agent"
+                    and ROUTER_TAG not in (metadata.get("tags") or ())
+                ):
+                    tokens_streamed = True
+                    publish({"type": "token", "content": message.content})
+
+            elif mode == "updates":
+                for node, update in chunk.items():
+                    for event in _node_events(node, update or {}, tokens_streamed):
+                        publish(event)
+                    tokens_streamed = False
+
+            elif mode == "values":
+                # Full state after each step; replaces the per-chunk message diffing
+                await session_store.set_state(session_id, chunk)
+
+        # After the run is complete, send a final status
+        outcome = "complete"
+        publish({"type": "status", "status": "complete", **permit.timings()})
+
+    except Exception as e:
+        debug_print(f"Graph execution error: {type(e).__name__}: {e}")
+        outcome = "error"
+        error_message = f"An error occurred during processing: {str(e)}"
+        publish({"type": "error", "message": error_message, **permit.timings()})
+
+        await _reset_failed_turn(session_id, error_message)
+    finally:
+        chat_streams.close(session_id, stream)
+        CHAT_DURATION.observe(permit.execution_seconds, outcome=outcome)
+        CHAT_TURNS.inc(outcome=outcome)
+        log_event("chat_turn", session_id=session_id, outcome=outcome, stream_mode=stream_mode, **permit.timings())
+        permit.release()
+
 
 @app.post("/chat/{session_id}")
-async def stream_chat(session_id: str, user_input: str):
+async def stream_chat(
+    session_id: str,
+    user_input: str,
+    request: Request,
+    stream_mode: Literal["tokens", "nodes"] = "tokens",
+    last_event_id: Optional[str] = Header(default=None),
+):
     """
-    Handles a user message and streams the AI response.
+    Handles a user message and streams the AI response as NDJSON (or SSE with ``Accept: text/event-stream``).
+
+    With ``stream_mode=tokens`` (default) LLM tokens are sent as ``token`` events while
+    they are generated; ``stream_mode=nodes`` sends each completed AI message as one
+    ``stream`` event. Both modes emit ``tool_start``/``tool_end`` events around tool calls.
+    Every event carries an ``id``; the turn keeps running if the connection drops, and
+    ``GET /chat/{session_id}/stream`` (or this request resent with ``Last-Event-ID``)
+    replays the missed events instead of running the turn again. A ``Last-Event-ID``
+    at or past the end of a finished turn starts a new turn with ``user_input``.
     """
-    if session_id not in session_auth_data:
+    auth_data = await session_store.get_auth(session_id)
+    if auth_data is None:
         raise HTTPException(status_code=404, detail="Session not found. Please create a new session.")
 
-    # Initialize session state if it doesn't exist
-    if session_id not in sessions:
-        auth_data = session_auth_data[session_id]
-        # Initialize state from auth data
-        initial_state = {
-            "auth_token": auth_data.auth_token,
-            "user_id": auth_data.user_id,
-            "company_id": auth_data.company_id,
-            "email": auth_data.email,
-            "first_name": auth_data.first_name,
-            "last_name": auth_data.last_name,
-            "full_name": auth_data.full_name,
-            "company_name": auth_data.company_name,
-            "init": True,
-            "welcome_message": False,
-        }
-        sessions[session_id] = graph.get_initial_state(initial_state)
+    # A retry after a dropped connection resumes the stream instead of sending the message twice;
+    # once the client has seen every event of a finished turn, the message is a new turn
+    resume_after = parse_event_id(last_event_id)
+    stream = chat_streams.get(session_id)
+    if resume_after is not None and stream is not None and stream.has_pending(resume_after):
+        return _follow_response(session_id, resume_after, request, resume=True)
+
+    # Wait for earlier turns of this session and for a free run slot (429 when saturated)
+    permit = await _admit(session_id)
+    try:
+        # Initialize session state if it doesn't exist
+        user_message = HumanMessage(content=user_input)
+        state = await _load_state(session_id)
+        if state is None:
+            # Initialize state from auth data
+            graph_input = {
+                "auth_token": auth_data["auth_token"],
+                "user_id": auth_data["user_id"],
+                "company_id": auth_data["company_id"],
+                "email": auth_data["email"],
+                "first_name": auth_data["first_name"],
+                "last_name": auth_data["last_name"],
+                "full_name": auth_data["full_name"],
+                "company_name": auth_data["company_name"],
+                "init": True,
+                "welcome_message": False,
+                "messages": [user_message],
+            }
+            state = graph_input
+        else:
+            # The checkpointer holds the history, so only the new message is sent
+            graph_input = {"messages": [user_message]}
+            state = {**state, "messages": [*state.get("messages", []), user_message]}
+        await session_store.set_state(session_id, state)
+    except BaseException:
+        permit.release()
+        raise
+    stream = chat_streams.open(session_id)
+    after = stream.last_id
+    # Kept on the stream so the run of an evicted session can be cancelled
+    stream.task = asyncio.create_task(_run_turn(session_id, stream, graph_input, stream_mode, permit))
+
+    return _follow_response(
+        session_id, after, request,
+        headers={"X-Queue-Wait-Ms": str(permit.timings()["queue_wait_ms"])},
+    )
+
+
+@app.get("/chat/{session_id}/stream")
+async def resume_chat_stream(
+    session_id: str,
+    request: Request,
+    after: Optional[int] = Query(default=None, ge=0),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """
+    Replays the session's events after ``after`` (or the ``Last-Event-ID`` header) and follows
+    the running turn live until it ends, without running anything again.
+
+    A ``gap`` event means older events were no longer buffered; reload the history
+    with ``GET /chat/{session_id}`` in that case.
+    """
+    if await session_store.get_auth(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please create a new session.")
+    if chat_streams.get(session_id) is None:
+        raise HTTPException(status_code=404, detail="No recent chat turn to resume.")
+    start = after if after is not None else parse_event_id(last_event_id)
+    return _follow_response(session_id, start or 0, request, resume=True)
+
 
-    # Prepend HumanMessage
-    sessions[session_id]["messages"].append(HumanMessage(content=user_input))
-    
-    # The actual execution happens here
-    async def chat_stream_generator(session_state):
-        try:
-            # We use an aiosession for langgraph streaming
-            async for s in graph.astream(session_state, config={"configurable": {"session_id": session_id}}):
-                final_state = s.get("__end__", s)
-                
-                # Check for new LLM response message
-                if "messages" in final_state and final_state["messages"]:
-                    new_messages = [
-                        msg for msg in final_state["messages"] 
-                        if not isinstance(msg, HumanMessage)
-                        and (msg not in session_state.get("messages", []))
-                    ]
-                    
-                    if new_messages:
-                        # Only stream the content of the new AI message (the last one)
-                        last_ai_message = new_messages[-1]
-                        if hasattr(last_ai_message, "content") and last_ai_message.content:
-                            # Stream the message content
-                            yield json.dumps({"type": "stream", "content": last_ai_message.content}) + "\n"
-                            
-                    # Update the session state with the latest state from the graph
-                    sessions[session_id] = final_state
-                
-                # Update session state with the latest state
-                sessions[session_id].update(final_state)
-
-            # After the stream is complete, update the session and send a final status
-            yield json.dumps({"type": "status", "status": "complete"}) + "\n"
-
-        except Exception as e:
-            debug_print(f"Graph execution error: {type(e).__name__}: {e}")
-            error_message = f"An error occurred during processing: {str(e)}"
-            yield json.dumps({"type": "error", "message": error_message}) + "\n"
-            
-            # Reset messages to the last user message and the error to allow retries
-            sessions[session_id]["messages"] = sessions[session_id]["messages"][:-1] + [AIMessage(content=error_message)]
-            sessions[session_id]["last_error"] = error_message
-
-    return StreamingResponse(chat_stream_generator(sessions[session_id]), media_type="application/x-ndjson")
-
-
-# Removed the /upload/{session_id} endpoint as all file processing tools are deleted.
 @app.post("/upload/{session_id}")
-async def upload_file(session_id: str, file: UploadFile):
-    """File upload is not supported in this minimal starter kit."""
-    raise HTTPException(status_code=400, detail="File upload is not supported in this starter kit.")
\ No newline at end of file
+async def upload_file(session_id: str, file: UploadFile, authorization: Optional[str] = Header(default=None)):
+    """
+    Ingests a plain-text document into the session's company knowledge index and streams NDJSON progress.
+
+    Requires the session's token as bearer token, accepted by the knowledge-base API
+    for the session's company. The upload is read in blocks and split into overlapping
+    chunks; chunks already in the index (by content hash) are skipped and the rest are
+    embedded and appended in batches, so ``document_knowledge`` finds them as soon as the
+    job completes. Events: one ``job``, a ``progress`` per batch and a final ``done``
+    with the status and throughput.
+    """
+    auth_data = await session_store.get_auth(session_id)
+    if auth_data is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please create a new session.")
+    if retrieval.local is None:
+        raise HTTPException(status_code=501, detail="Document ingestion requires numpy for the local index.")
+    company_id = auth_data["company_id"] or 0
+    await _require_company_access(authorization, company_id, session_token=auth_data["auth_token"])
+
+    job = ingestor.create_job(company_id, file.filename or "upload")
+    # The upload stays readable while the response streams: Starlette closes it afterwards
+
+    async def progress():
+        async for event in ingestor.run(job, file):
+            yield _ndjson(event)
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+@app.get("/upload/{session_id}/jobs", response_model=Dict[str, Any])
+async def list_upload_jobs(session_id: str):
+    """
+    Lists the recent ingestion jobs of the session's company, newest first.
+    """
+    auth_data = await session_store.get_auth(session_id)
+    if auth_data is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please create a new session.")
+    return {"jobs": ingestor.company_jobs(auth_data["company_id"] or 0)}
+
+
+@app.get("/upload/{session_id}/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_upload_job(session_id: str, job_id: str):
+    """
+    Returns the progress of one ingestion job of the session's company.
+    """
+    auth_data = await session_store.get_auth(session_id)
+    job = ingestor.jobs.get(job_id)
+    if auth_data is None or job is None or job.company_id != (auth_data["company_id"] or 0):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.view()
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""Bounded session storage for the OnboardKit FastAPI server."""
+
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .cache import approx_size
+from .config import Configuration
+from .utils import debug_print
+
+
+EvictionListener = Callable[[str, str], Awaitable[None]]
+
+
+class SessionStore(ABC):
+    """
+    Interface for session auth data and cached graph state.
+
+    Implementations own the eviction policy. Every eviction is broadcast to the
+    registered listeners (e.g. to drop the session's checkpoints), so auth data,
+    cached state and checkpoints always leave memory together.
+    """
+
+    def __init__(self):
+        self._listeners: List[EvictionListener] = []
+        self._evictions: Dict[str, int] = {"idle": 0, "lru": 0, "memory": 0, "deleted": 0}
+
+    def add_eviction_listener(self, listener: EvictionListener) -> None:
+        """Register ``listener(session_id, reason)`` to be awaited on every eviction."""
+        self._listeners.append(listener)
+
+    @abstractmethod
+    async def create(self, session_id: str, auth: Dict[str, Any]) -> None:
+        """Register a new session with its auth data."""
+
+    @abstractmethod
+    async def get_auth(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the session's auth data, or None if unknown or evicted."""
+
+    @abstractmethod
+    async def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached graph state, or None if the session has not chatted yet."""
+
+    @abstractmethod
+    async def set_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        """Replace the cached graph state."""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Remove a session explicitly."""
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Evict expired sessions; returns the number evicted."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Session counts, byte accounting and eviction metrics."""
+
+    async def run_sweeper(self, interval: float) -> None:
+        """Background task that periodically evicts idle sessions."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self.sweep()
+                if evicted:
+                    debug_print(f"Session sweeper evicted {evicted} session(s)")
+            except Exception as e:
+                debug_print(f"Session sweeper error: {type(e).__name__}: {e}")
+
+    async def _notify(self, session_id: str, reason: str) -> None:
+        self._evictions[reason] = self._evictions.get(reason, 0) + 1
+        for listener in self._listeners:
+            try:
+                await listener(session_id, reason)
+            except Exception as e:
+                debug_print(f"Session eviction listener failed: {type(e).__name__}: {e}")
+
+
+class _SessionRecord:
+    __slots__ = ("auth", "state", "auth_bytes", "state_bytes", "message_sizes", "last_access")
+
+    def __init__(self, auth: Dict[str, Any], now: float):
+        self.auth = auth
+        self.state: Optional[Dict[str, Any]] = None
+        self.auth_bytes = approx_size(auth)
+        self.state_bytes = 0
+        # Size of each message of ``state`` by object id; valid while ``state`` keeps the messages alive
+        self.message_sizes: Dict[int, int] = {}
+        self.last_access = now
+
+    @property
+    def size(self) -> int:
+        return self.auth_bytes + self.state_bytes
+
+    def measure(self, state: Dict[str, Any]) -> int:
+        """
+        Size of ``state``, measuring only the messages the current state does not
+        already hold; a step usually adds a message or two to a long history.
+        """
+        messages = state.get("messages") or []
+        known = self.message_sizes
+        self.message_sizes = {id(message): known.get(id(message)) or approx_size(message) for message in messages}
+        rest = approx_size({key: value for key, value in state.items() if key != "messages"})
+        return rest + sys.getsizeof(messages) + sum(self.message_sizes.values())
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store with idle TTL, a session cap and a global memory budget.
+
+    Records are kept in LRU order; whenever a cap is exceeded the least recently
+    used sessions are evicted. State size is updated on every ``set_state``,
+    measuring only the messages that are new since the previous state.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = 3600.0,
+        max_sessions: int = 10000,
+        max_bytes: int = 512 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._records: "OrderedDict[str, _SessionRecord]" = OrderedDict()
+        self._bytes = 0
+
+    async def create(self, session_id: str, auth: Dict[str, Any]) -> None:
+        if session_id in self._records:
+            self._drop(session_id)
+        record = _SessionRecord(auth, self._clock())
+        self._records[session_id] = record
+        self._bytes += record.size
+        await self._enforce_limits(keep=session_id)
+
+    async def get_auth(self, session_id: str) -> Optional[Dict[str, Any]]:
+        record = await self._touch(session_id)
+        return record.auth if record else None
+
+    async def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        record = await self._touch(session_id)
+        return record.state if record else None
+
+    async def set_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        record = await self._touch(session_id)
+        if record is None:
+            return
+        self._bytes -= record.state_bytes
+        # Measured while record.state still holds the previous messages, so their ids are not reused yet
+        record.state_bytes = record.measure(state)
+        record.state = state
+        self._bytes += record.state_bytes
+        await self._enforce_limits(keep=session_id)
+
+    async def delete(self, session_id: str) -> bool:
+        if session_id not in self._records:
+            return False
+        self._drop(session_id)
+        await self._notify(session_id, "deleted")
+        return True
+
+    async def sweep(self) -> int:
+        deadline = self._clock() - self.idle_ttl
+        # Records are in access order, so expired ones are at the front
+        expired = []
+        for session_id, record in self._records.items():
+            if record.last_access > deadline:
+                break
+            expired.append(session_id)
+        for session_id in expired:
+            self._drop(session_id)
+            await self._notify(session_id, "idle")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [record.size for record in self._records.values()]
+        return {
+            "sessions": len(sizes),
+            "bytes": self._bytes,
+            "max_session_bytes": max(sizes) if sizes else 0,
+            "avg_session_bytes": int(self._bytes / len(sizes)) if sizes else 0,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "idle_ttl": self.idle_ttl,
+            "evictions": dict(self._evictions),
+        }
+
+    async def _touch(self, session_id: str) -> Optional[_SessionRecord]:
+        record = self._records.get(session_id)
+        if record is None:
+            return None
+        now = self._clock()
+        if now - record.last_access > self.idle_ttl:
+            self._drop(session_id)
+            await self._notify(session_id, "idle")
+            return None
+        record.last_access = now
+        self._records.move_to_end(session_id)
+        return record
+
+    async def _enforce_limits(self, keep: str) -> None:
+        while len(self._records) > self.max_sessions or self._bytes > self.max_bytes:
+            session_id = next(iter(self._records))
+            if session_id == keep:
+                break
+            reason = "lru" if len(self._records) > self.max_sessions else "memory"
+            self._drop(session_id)
+            await self._notify(session_id, reason)
+
+    def _drop(self, session_id: str) -> None:
+        record = self._records.pop(session_id)
+        self._bytes -= record.size
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session auth data shared by every worker through a SQLite file.
+
+    Graph state is not cached here: it lives in the checkpointer, so any worker
+    can serve any session. Idle sessions are evicted by wall-clock TTL and the
+    oldest sessions beyond ``max_sessions`` are evicted on sweep.
+    """
+
+    def __init__(self, path: str, idle_ttl: float = 3600.0, max_sessions: int = 10000):
+        super().__init__()
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, auth TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        self._lock = threading.Lock()
+
+    def _run(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def create(self, session_id: str, auth: Dict[str, Any]) -> None:
+        await asyncio.to_thread(
+            self._run,
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, json.dumps(auth), time.time()),
+        )
+
+    async def get_auth(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._run,
+            "UPDATE sessions SET last_access = ? WHERE session_id = ? AND last_access > ? RETURNING auth",
+            (time.time(), session_id, time.time() - self.idle_ttl),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    async def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def set_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        return None
+
+    async def delete(self, session_id: str) -> bool:
+        rows = await asyncio.to_thread(
+            self._run, "DELETE FROM sessions WHERE session_id = ? RETURNING session_id", (session_id,)
+        )
+        if rows:
+            await self._notify(session_id, "deleted")
+        return bool(rows)
+
+    async def sweep(self) -> int:
+        expired = await asyncio.to_thread(
+            self._run,
+            "DELETE FROM sessions WHERE last_access <= ? RETURNING session_id",
+            (time.time() - self.idle_ttl,),
+        )
+        overflow = await asyncio.to_thread(
+            self._run,
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?) RETURNING session_id",
+            (self.max_sessions,),
+        )
+        for (session_id,) in expired:
+            await self._notify(session_id, "idle")
+        for (session_id,) in overflow:
+            await self._notify(session_id, "lru")
+        return len(expired) + len(overflow)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {
+            "sessions": count,
+            "max_sessions": self.max_sessions,
+            "idle_ttl": self.idle_ttl,
+            "path": self.path,
+            "evictions": dict(self._evictions),
+        }
+
+
+def create_session_store(config: Optional[Configuration] = None) -> SessionStore:
+    """
+    Build the session store matching the configured checkpointer.
+
+    The sqlite store lets any worker resume any session, but the server still
+    serializes a session's turns and buffers its stream events per process:
+    with several workers, requests must be routed by session id (sticky
+    sessions), or concurrent turns of one session fork its history and
+    Last-Event-ID resumes fail on the other workers.
+    """
+    config = config or Configuration()
+    if config.checkpointer == "sqlite":
+        return SQLiteSessionStore(
+            config.checkpoint_path,
+            idle_ttl=config.session_idle_ttl,
+            max_sessions=config.session_max_sessions,
+        )
+    return InMemorySessionStore(
+        idle_ttl=config.session_idle_ttl,
+        max_sessions=config.session_max_sessions,
+        max_bytes=config.session_max_bytes,
+    )
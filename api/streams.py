@@ -0,0 +1,155 @@
+"""Per-session replay buffers that let chat clients reconnect to a running (or finished) turn."""
+
+import asyncio
+import json
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+Event = Tuple[int, Dict[str, Any]]
+
+
+class SessionStream:
+    """
+    The recent chat events of one session, with monotonic ids across turns.
+
+    Events go into a bounded ring buffer; followers replay what they missed
+    from it and then wait for live events until the running turn finishes.
+    """
+
+    def __init__(self, max_events: int):
+        self._events: Deque[Event] = deque(maxlen=max_events)
+        self._changed = asyncio.Event()
+        self.last_id = 0
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+        self._expiry: Optional[asyncio.TimerHandle] = None
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        self.last_id += 1
+        self._events.append((self.last_id, event))
+        self._wake()
+        return self.last_id
+
+    def start(self) -> None:
+        self.running = True
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+    def finish(self, retention: float, expire: Callable[[], None]) -> None:
+        self.running = False
+        self.task = None
+        self._expiry = asyncio.get_running_loop().call_later(retention, expire)
+        self._wake()
+
+    def cancel(self) -> None:
+        if self._expiry is not None:
+            self._expiry.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+    def has_pending(self, after: int) -> bool:
+        """Whether a client that saw events up to ``after`` still has something to resume."""
+        return self.running or after < self.last_id
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _after(self, after: int) -> list:
+        first = self._events[0][0] if self._events else self.last_id + 1
+        return list(islice(self._events, max(0, after + 1 - first), None))
+
+    async def follow(self, after: int) -> AsyncIterator[Event]:
+        """Events with an id above ``after``: buffered ones first, then live ones until the turn ends."""
+        first = self._events[0][0] if self._events else self.last_id + 1
+        if after + 1 < first:
+            # Older events fell out of the buffer; the client should reload the history
+            yield first - 1, {"type": "gap", "from_id": after + 1, "to_id": first - 1}
+        while True:
+            changed = self._changed
+            for event_id, event in self._after(after):
+                yield event_id, event
+                after = event_id
+            if not self.running:
+                return
+            await changed.wait()
+
+
+class StreamRegistry:
+    """Replay buffers of all sessions; a buffer is dropped ``retention`` seconds after its last turn ends."""
+
+    def __init__(self, max_events: int = 2048, retention: float = 300.0):
+        self.max_events = max_events
+        self.retention = retention
+        self._streams: Dict[str, SessionStream] = {}
+        self._stats = {"runs": 0, "follows": 0, "resumes": 0, "gaps": 0}
+
+    def get(self, session_id: str) -> Optional[SessionStream]:
+        return self._streams.get(session_id)
+
+    def open(self, session_id: str) -> SessionStream:
+        """The session's stream, marked as running a new turn."""
+        stream = self._streams.get(session_id)
+        if stream is None:
+            stream = self._streams[session_id] = SessionStream(self.max_events)
+        stream.start()
+        self._stats["runs"] += 1
+        return stream
+
+    def close(self, session_id: str, stream: SessionStream) -> None:
+        """The turn has ended; its events stay around for late reconnects."""
+        stream.finish(self.retention, lambda: self._expire(session_id, stream))
+
+    def _expire(self, session_id: str, stream: SessionStream) -> None:
+        if self._streams.get(session_id) is stream and not stream.running:
+            del self._streams[session_id]
+
+    def discard(self, session_id: str) -> None:
+        """Drop a session's buffer now (session evicted); a running turn is cancelled."""
+        stream = self._streams.pop(session_id, None)
+        if stream is not None:
+            stream.cancel()
+
+    async def follow(self, session_id: str, after: int, resume: bool = False) -> AsyncIterator[Event]:
+        stream = self._streams.get(session_id)
+        if stream is None:
+            return
+        self._stats["resumes" if resume else "follows"] += 1
+        async for event_id, event in stream.follow(after):
+            if event.get("type") == "gap":
+                self._stats["gaps"] += 1
+            yield event_id, event
+
+    async def shutdown(self) -> None:
+        tasks = [stream.task for stream in self._streams.values() if stream.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "sessions": len(self._streams),
+            "running": sum(1 for stream in self._streams.values() if stream.running),
+            "buffered_events": sum(len(stream) for stream in self._streams.values()),
+            "max_events": self.max_events,
+            "retention": self.retention,
+        }
+
+
+def format_event(event_id: int, event: Dict[str, Any], sse: bool) -> str:
+    """One NDJSON line, or one SSE message whose ``id`` doubles as the Last-Event-ID."""
+    if sse:
+        return f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps({"id": event_id, **event}) + "\n"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    if value is None or not value.strip().isdigit():
+        return None
+    return int(value.strip())
@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+# Add the src directory to Python path
+src_path = os.path.join(os.path.dirname(__file__), 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+from react_agent.batch import ndjson_items, run_batch
+from react_agent.config import Configuration
+from react_agent.utils import APIClient
+
+
+# ===============================================
+# ====================setup======================
+# ===============================================
+load_dotenv()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run an NDJSON file of {company_id, question} items through the agent graph."
+    )
+    parser.add_argument("input", help="NDJSON input file ('-' reads stdin)")
+    parser.add_argument("--output", default="-", help="NDJSON results file ('-' writes stdout)")
+    parser.add_argument("--concurrency", type=int, default=Configuration().batch_max_concurrency)
+    parser.add_argument("--auth-token", default=os.environ.get("STARTERKIT_AUTH_TOKEN", ""),
+                        help="Knowledge-base token for items without their own auth_token")
+    return parser.parse_args()
+
+
+# ===============================================
+# ====================runner=====================
+# ===============================================
+async def read_lines(path):
+    source = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        for line in source:
+            yield line
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+
+async def run(args):
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    await APIClient.open()
+    try:
+        async for record in run_batch(ndjson_items(read_lines(args.input)), args.concurrency, args.auth_token):
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()
+            if record.get("type") == "summary":
+                print(json.dumps(record), file=sys.stderr)
+    finally:
+        await APIClient.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
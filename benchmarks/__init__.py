@@ -0,0 +1 @@
+"""Offline load-test and benchmark suite for the OnboardKit agent API."""
@@ -0,0 +1,211 @@
+"""
+Cold-start benchmark.
+
+Measures how long the agent API takes to import, to accept connections, to
+report ready and to answer its first chat turn, each from a fresh process
+against the fake LLM and knowledge base. Writes a JSON report.
+
+    python -m benchmarks.cold_start --runs 5 --output benchmarks/results/cold_start.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .loadgen import _chat_turn, percentile
+from .run import ROOT, _free_port, _git_revision, _start, _wait_ready
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def measure_import(module: str, app_dir: str) -> Dict[str, Any]:
+    """Cumulative import time of ``module`` and its heaviest direct imports, via ``python -X importtime``."""
+    env = {**os.environ, "PYTHONPATH": app_dir}
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    wall = time.perf_counter() - started
+
+    entries = []
+    for line in output.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(2)), len(match.group(3))))
+    # Children are listed before their parent, one indent level (two spaces) deeper
+    position = next((i for i, entry in enumerate(entries) if entry[0] == module and entry[2] == 0), None)
+    total = entries[position][1] if position is not None else None
+    direct = []
+    for name, cumulative, indent in reversed(entries[:position or 0]):
+        if indent == 0:
+            break
+        if indent == 2:
+            direct.append((name, cumulative))
+    direct.sort(key=lambda e: -e[1])
+    return {
+        "import_ms": round(total / 1000, 1) if total is not None else None,
+        "process_wall_ms": round(wall * 1000, 1),
+        "heaviest": [{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, us in direct[:8]],
+    }
+
+
+async def _poll(client: httpx.AsyncClient, path: str, started: float, timeout: float) -> Optional[float]:
+    """Seconds from ``started`` until ``path`` answers 200; None when the route does not exist."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            response = await client.get(path)
+            if response.status_code == 200:
+                return time.perf_counter() - started
+            if response.status_code == 404:
+                return None
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"{path} not ready within {timeout:g}s")
+        # Coarse enough not to slow down the warmup it is waiting for
+        await asyncio.sleep(0.05)
+
+
+async def _session(client: httpx.AsyncClient) -> str:
+    response = await client.post("/session", json={
+        "auth_token": "cold-start-token", "user_id": 1, "email": "user1@example.com",
+        "full_name": "Bench User", "company_id": 1, "company_name": "Bench Co",
+    })
+    response.raise_for_status()
+    return response.json()["session_id"]
+
+
+async def measure_start(app: str, app_dir: str, env: Dict[str, str], question: str, timeout: float) -> Dict[str, Any]:
+    """Start one API process and time it up to the end of its first and second chat turn."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = _start(app, port, env, app_dir)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            listening = await _poll(client, "/stats", started, timeout)
+            ready = await _poll(client, "/ready", started, timeout)
+            first = await _chat_turn(client, await _session(client), question, "tokens")
+            first_done = time.perf_counter() - started
+            second = await _chat_turn(client, await _session(client), question, "tokens")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    errors = [turn.error for turn in (first, second) if turn.error or turn.status != 200]
+    return {
+        "listening_s": round(listening, 3),
+        # Without a readiness probe the server counts as ready once it accepts connections
+        "ready_s": round(ready if ready is not None else listening, 3),
+        "first_turn_s": round(first.total, 3),
+        "first_response_s": round(first_done, 3),
+        "second_turn_s": round(second.total, 3),
+        "errors": errors,
+    }
+
+
+def _median(values: List[float]) -> Optional[float]:
+    return round(percentile(values, 50), 3) if values else None
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    llm_port, kb_port = _free_port(), _free_port()
+    fake_env = {
+        **os.environ,
+        "FAKE_LLM_TTFT_MS": str(args.llm_ttft_ms),
+        "FAKE_LLM_TOKEN_MS": str(args.llm_token_ms),
+        "FAKE_KB_LATENCY_MS": str(args.kb_latency_ms),
+    }
+    api_env = {
+        **os.environ,
+        "PYTHONUNBUFFERED": "1",
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_BASE": f"http://127.0.0.1:{llm_port}/v1",
+        "STARTERKIT_KNOWLEDGE_BASE_URL": f"http://127.0.0.1:{kb_port}",
+    }
+    module = args.app.split(":")[0]
+    imports = [measure_import(module, args.app_dir) for _ in range(args.runs)]
+
+    fakes = [_start("benchmarks.fake_llm:app", llm_port, fake_env, ROOT), _start("benchmarks.fake_kb:app", kb_port, fake_env, ROOT)]
+    try:
+        await _wait_ready(f"http://127.0.0.1:{llm_port}/docs")
+        await _wait_ready(f"http://127.0.0.1:{kb_port}/docs")
+        starts = [await measure_start(args.app, args.app_dir, api_env, args.question, args.timeout) for _ in range(args.runs)]
+    finally:
+        for process in fakes:
+            process.terminate()
+        for process in fakes:
+            process.wait(timeout=10)
+
+    summary = {
+        "import_ms": _median([run["import_ms"] for run in imports if run["import_ms"] is not None]),
+        **{key: _median([run[key] for run in starts]) for key in
+           ("listening_s", "ready_s", "first_turn_s", "first_response_s", "second_turn_s")},
+    }
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": vars(args),
+        },
+        "median": summary,
+        "heaviest_imports": imports[0]["heaviest"],
+        "imports": imports,
+        "starts": starts,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Import time and time to first request of the agent API.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument("--question", default="What is the policy for booking holiday leave?")
+    parser.add_argument("--llm-ttft-ms", type=float, default=150.0)
+    parser.add_argument("--llm-token-ms", type=float, default=10.0)
+    parser.add_argument("--kb-latency-ms", type=float, default=40.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--app", default="react_agent.fastapi_server:app", help="ASGI import string of the agent API")
+    parser.add_argument("--app-dir", default=os.path.join(ROOT, "src"), help="Directory the API package is imported from")
+    parser.add_argument("--output", default=None, help="JSON report path (default: print only)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(benchmark(args))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    median = report["median"]
+    print(f"import                 {median['import_ms']} ms")
+    print(f"accepting connections  {median['listening_s']} s")
+    print(f"ready                  {median['ready_s']} s")
+    print(f"first turn             {median['first_turn_s']} s (done {median['first_response_s']} s after start)")
+    print(f"second turn            {median['second_turn_s']} s")
+    for entry in report["heaviest_imports"]:
+        print(f"  {entry['cumulative_ms']:>8} ms  {entry['module']}")
+    errors = [error for run in report["starts"] for error in run["errors"]]
+    if errors:
+        print(f"errors: {errors[:3]}")
+
+
+if __name__ == "__main__":
+    main()
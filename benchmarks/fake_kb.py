@@ -0,0 +1,65 @@
+"""Local fake of the knowledge base `/knowledge/search` API (and its batch variant) with configurable latency."""
+
+import asyncio
+import hashlib
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from pydantic import BaseModel
+
+app = FastAPI(title="Fake Knowledge Base")
+
+LATENCY_MS = float(os.getenv("FAKE_KB_LATENCY_MS", "40"))
+JITTER_MS = float(os.getenv("FAKE_KB_JITTER_MS", "10"))
+DOCS_PER_QUERY = int(os.getenv("FAKE_KB_DOCS", "5"))
+DOC_WORDS = int(os.getenv("FAKE_KB_DOC_WORDS", "120"))
+# Set to FALSE to exercise the agent's fallback to single searches
+BATCH_ENABLED = os.getenv("FAKE_KB_BATCH", "TRUE") == "TRUE"
+BATCH_ITEM_MS = float(os.getenv("FAKE_KB_BATCH_ITEM_MS", "1"))
+
+_VOCABULARY = (
+    "onboarding benefits payroll policy holiday laptop access badge manager team handbook security "
+    "training expenses travel pension insurance equipment schedule office remote leave request portal"
+).split()
+
+
+def _document(company_id: int, query: str, rank: int) -> dict:
+    """Deterministic pseudo-document so repeated queries return identical content."""
+    seed = int(hashlib.sha1(f"{company_id}:{query}:{rank}".encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    words = [rng.choice(_VOCABULARY) for _ in range(DOC_WORDS)]
+    return {
+        "id": f"doc-{company_id}-{seed % 10000}",
+        "content": f"{query.capitalize()}: " + " ".join(words) + ".",
+        "score": round(1.0 - rank * 0.1, 3),
+    }
+
+
+class BatchSearchRequest(BaseModel):
+    companyId: int
+    queries: List[Dict[str, Any]]  # {"query": ...}
+
+
+@app.get("/knowledge/search")
+async def search(companyId: int, query: str):
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+    return {"data": [_document(companyId, query, rank) for rank in range(DOCS_PER_QUERY)]}
+
+
+@app.post("/knowledge/search/batch")
+async def search_batch(request: BatchSearchRequest, authorization: Optional[str] = Header(default=None)):
+    """One round trip for many queries of one caller, authorized like a single search."""
+    if not BATCH_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    latency = LATENCY_MS + BATCH_ITEM_MS * len(request.queries) + random.uniform(-JITTER_MS, JITTER_MS)
+    await asyncio.sleep(max(0.0, latency) / 1000)
+    return {"results": [
+        {"data": [_document(request.companyId, item.get("query", ""), rank) for rank in range(DOCS_PER_QUERY)]}
+        if item.get("query") else {"error": "query is required", "status": 400}
+        for item in request.queries
+    ]}
+
@@ -0,0 +1,143 @@
+"""
+Local OpenAI-compatible fake of `/v1/chat/completions` with configurable latency.
+
+Questions are answered with a `document_knowledge` tool call first; once a
+tool result is in the conversation (or for small talk) it streams a text
+answer token by token. Latency is shaped by time-to-first-token and a
+per-token delay so server-side streaming overhead can be measured; models
+listed in FAKE_LLM_FAST_MODELS run FAKE_LLM_FAST_FACTOR times as long, and
+answers are cut at the request's max_tokens.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake OpenAI")
+
+TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", "150"))
+TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "10"))
+ANSWER_TOKENS = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "60"))
+FAST_MODELS = set(os.getenv("FAKE_LLM_FAST_MODELS", "gpt-4o-mini,gpt-3.5-turbo").split(","))
+FAST_FACTOR = float(os.getenv("FAKE_LLM_FAST_FACTOR", "0.4"))
+
+_QUESTION_WORDS = ("what", "how", "when", "where", "who", "which", "why", "can", "do", "does", "is", "are")
+_FILLER = (
+    "Based on the company handbook , new hires receive their laptop on day one and "
+    "should complete the security training within the first week ."
+).split()
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _plan(messages: List[Dict[str, Any]], tools: List[Dict[str, Any]], max_tokens: Any) -> Dict[str, Any]:
+    """Decide between a tool call and a text answer from the conversation tail."""
+    conversation = [m for m in messages if m.get("role") != "system"]
+    last = conversation[-1] if conversation else {}
+    if last.get("role") == "user" and tools:
+        text = _text(last.get("content")).strip()
+        if text.endswith("?") or text.lower().startswith(_QUESTION_WORDS):
+            return {"tool": tools[0]["function"]["name"], "query": text.rstrip("?")}
+    answer = [_FILLER[i % len(_FILLER)] for i in range(ANSWER_TOKENS)]
+    if max_tokens and len(answer) > int(max_tokens):
+        return {"answer": answer[: int(max_tokens)], "finish_reason": "length"}
+    return {"answer": answer}
+
+
+def _usage(messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, int]:
+    prompt_tokens = sum(len(_text(m.get("content")).split()) + 4 for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Any = None) -> str:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def _tool_call(plan: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": plan["tool"], "arguments": json.dumps({"query": plan["query"]})},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    messages = body.get("messages", [])
+    fast = model in FAST_MODELS
+    ttft_ms, token_ms = (TTFT_MS * FAST_FACTOR, TOKEN_MS * FAST_FACTOR) if fast else (TTFT_MS, TOKEN_MS)
+    plan = _plan(messages, body.get("tools") or [], body.get("max_completion_tokens") or body.get("max_tokens"))
+    finish = plan.get("finish_reason", "stop")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+    if not body.get("stream"):
+        await asyncio.sleep((ttft_ms + token_ms * len(plan.get("answer", []))) / 1000)
+        if "tool" in plan:
+            message = {"role": "assistant", "content": None, "tool_calls": [_tool_call(plan)]}
+            finish_reason, completion_tokens = "tool_calls", 12
+        else:
+            message = {"role": "assistant", "content": " ".join(plan["answer"])}
+            finish_reason, completion_tokens = finish, len(plan["answer"])
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": _usage(messages, completion_tokens),
+        })
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        await asyncio.sleep(ttft_ms / 1000)
+        if "tool" in plan:
+            call = _tool_call(plan)
+            yield _chunk(completion_id, model, {"role": "assistant", "content": None, "tool_calls": [{"index": 0, **call}]})
+            yield _chunk(completion_id, model, {}, "tool_calls")
+            completion_tokens = 12
+        else:
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for i, word in enumerate(plan["answer"]):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield _chunk(completion_id, model, {"content": word if i == 0 else f" {word}"})
+            yield _chunk(completion_id, model, {}, finish)
+            completion_tokens = len(plan["answer"])
+        if include_usage:
+            usage = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": _usage(messages, completion_tokens),
+            }
+            yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,174 @@
+"""Load generator: virtual users drive `/session` and `/chat` with multi-turn scripts."""
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Multi-turn conversations mixing small talk, knowledge questions and follow-ups
+SCRIPTS: List[List[str]] = [
+    ["Hi there!", "What is the policy for booking holiday leave?", "How many days do I get in my first year?", "Thanks, that helps."],
+    ["Hello", "When do I get my laptop?", "Who do I ask about building access?", "Great, thank you"],
+    ["What benefits does the company offer?", "How does the pension scheme work?", "ok"],
+    ["Hey", "Where can I find the employee handbook?", "Which security training do I need to finish in week one?", "And how do I submit travel expenses?", "Thanks!"],
+    ["Good morning", "How do I set up payroll details?", "cheers"],
+]
+
+
+@dataclass
+class TurnResult:
+    """Client-side timings of one chat turn."""
+
+    status: int
+    ttfb: Optional[float] = None
+    ttft: Optional[float] = None
+    total: float = 0.0
+    events: int = 0
+    tokens: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadResults:
+    turns: List[TurnResult] = field(default_factory=list)
+    sessions_created: int = 0
+    session_errors: int = 0
+    started: float = 0.0
+    finished: float = 0.0
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def _latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+        **{f"p{p}_ms": round(percentile(values, p) * 1000, 2) if values else None for p in (50, 95, 99)},
+        "max_ms": round(max(values) * 1000, 2) if values else None,
+    }
+
+
+async def _chat_turn(client: httpx.AsyncClient, session_id: str, text: str, stream_mode: str) -> TurnResult:
+    started = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST", f"/chat/{session_id}", params={"user_input": text, "stream_mode": stream_mode}
+        ) as response:
+            result = TurnResult(status=response.status_code)
+            if response.status_code != 200:
+                await response.aread()
+                result.error = response.text[:200]
+                result.total = time.perf_counter() - started
+                return result
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                now = time.perf_counter() - started
+                if result.ttfb is None:
+                    result.ttfb = now
+                event = json.loads(line)
+                result.events += 1
+                if event.get("type") in ("token", "stream"):
+                    result.tokens += 1
+                    if result.ttft is None:
+                        result.ttft = now
+                elif event.get("type") == "error":
+                    result.error = event.get("message", "")[:200]
+    except httpx.HTTPError as e:
+        result = TurnResult(status=0, error=f"{type(e).__name__}: {e}")
+    result.total = time.perf_counter() - started
+    return result
+
+
+async def _virtual_user(
+    client: httpx.AsyncClient,
+    queue: "asyncio.Queue[List[str]]",
+    results: LoadResults,
+    think_time: float,
+    stream_mode: str,
+    companies: int,
+) -> None:
+    while True:
+        try:
+            script = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        user_id = random.randint(1, 1_000_000)
+        response = await client.post("/session", json={
+            "auth_token": f"bench-token-{user_id}",
+            "user_id": user_id,
+            "email": f"user{user_id}@example.com",
+            "full_name": "Bench User",
+            "company_id": random.randint(1, companies),
+            "company_name": "Bench Co",
+        })
+        if response.status_code != 200:
+            results.session_errors += 1
+            continue
+        results.sessions_created += 1
+        session_id = response.json()["session_id"]
+        for text in script:
+            results.turns.append(await _chat_turn(client, session_id, text, stream_mode))
+            if think_time:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * think_time)
+
+
+async def run_load(
+    base_url: str,
+    sessions: int,
+    concurrency: int,
+    think_time: float = 0.0,
+    stream_mode: str = "tokens",
+    companies: int = 3,
+    timeout: float = 120.0,
+) -> LoadResults:
+    """Run ``sessions`` scripted conversations with ``concurrency`` virtual users."""
+    queue: "asyncio.Queue[List[str]]" = asyncio.Queue()
+    for i in range(sessions):
+        queue.put_nowait(SCRIPTS[i % len(SCRIPTS)])
+
+    results = LoadResults()
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        results.started = time.perf_counter()
+        await asyncio.gather(*[
+            _virtual_user(client, queue, results, think_time, stream_mode, companies)
+            for _ in range(concurrency)
+        ])
+        results.finished = time.perf_counter()
+    return results
+
+
+def summarize(results: LoadResults) -> Dict[str, Any]:
+    """Throughput and latency distribution of a load run."""
+    duration = results.finished - results.started
+    ok = [turn for turn in results.turns if turn.status == 200 and not turn.error]
+    status_counts: Dict[str, int] = {}
+    for turn in results.turns:
+        status_counts[str(turn.status)] = status_counts.get(str(turn.status), 0) + 1
+    return {
+        "duration_s": round(duration, 3),
+        "sessions": results.sessions_created,
+        "session_errors": results.session_errors,
+        "turns": len(results.turns),
+        "turns_ok": len(ok),
+        "turn_errors": len(results.turns) - len(ok),
+        "status_counts": status_counts,
+        "throughput_turns_per_s": round(len(ok) / duration, 3) if duration else 0.0,
+        "throughput_tokens_per_s": round(sum(turn.tokens for turn in ok) / duration, 3) if duration else 0.0,
+        "ttfb": _latency_summary([turn.ttfb for turn in ok if turn.ttfb is not None]),
+        "ttft": _latency_summary([turn.ttft for turn in ok if turn.ttft is not None]),
+        "total": _latency_summary([turn.total for turn in ok]),
+        "sample_errors": [turn.error for turn in results.turns if turn.error][:5],
+    }
@@ -0,0 +1,193 @@
+"""
+Local retrieval benchmark.
+
+Builds local vector indexes over a synthetic corpus and compares every mode
+(float32/int8, brute force/partitioned, vector/hybrid) against exact float32
+brute force: recall@k of the exact top k, how often the chunk a query was
+drawn from is returned, and per-query latency. Writes a JSON report.
+
+    python -m benchmarks.retrieval --chunks 50000 --queries 500 --output benchmarks/results/retrieval.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .loadgen import percentile
+from .run import ROOT, _git_revision
+
+_GENERAL = (
+    "the a to of and for in on with your our when how what is are be can please request team "
+    "company employee new first day week month process form manager approval contact details"
+).split()
+
+
+def _corpus(chunks: int, topics: int, words: int, seed: int) -> List[Dict[str, Any]]:
+    """Chunks drawn mostly from one of ``topics`` private vocabularies, the rest from shared words."""
+    rng = random.Random(seed)
+    vocabularies = [[f"t{topic}w{i}" for i in range(40)] for topic in range(topics)]
+    corpus = []
+    for i in range(chunks):
+        vocabulary = vocabularies[rng.randrange(topics)]
+        text = [rng.choice(vocabulary) if rng.random() < 0.6 else rng.choice(_GENERAL) for _ in range(words)]
+        corpus.append({"id": f"chunk-{i}", "content": " ".join(text)})
+    return corpus
+
+
+def _queries(corpus: List[Dict[str, Any]], count: int, words: int, seed: int) -> List[tuple]:
+    """(source row, query) pairs: a few consecutive words of a random chunk."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        row = rng.randrange(len(corpus))
+        text = corpus[row]["content"].split()
+        start = rng.randrange(max(1, len(text) - words))
+        queries.append((row, " ".join(text[start:start + words])))
+    return queries
+
+
+def _measure(index: Any, embedded: np.ndarray, queries: List[tuple], exact: List[set], ids: List[str],
+             k: int, hybrid_weight: float, nprobe: Optional[int]) -> Dict[str, Any]:
+    latencies, recalls, hits = [], [], 0
+    for (row, text), vector, truth in zip(queries, embedded, exact):
+        started = time.perf_counter()
+        results = index.search(text, vector, k, hybrid_weight=hybrid_weight, nprobe=nprobe)
+        latencies.append(time.perf_counter() - started)
+        returned = {doc["id"] for doc in results}
+        recalls.append(len(returned & truth) / len(truth))
+        hits += ids[row] in returned
+    return {
+        "recall_at_k": round(sum(recalls) / len(recalls), 4),
+        "source_hit_rate": round(hits / len(queries), 4),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    # The API package is imported flat from --app-dir, like the server benchmarks start it
+    sys.path.insert(0, args.app_dir)
+    retrieval = __import__(f"{args.package}.retrieval", fromlist=["retrieval"])
+
+    corpus = _corpus(args.chunks, args.topics, args.chunk_words, args.seed)
+    queries = _queries(corpus, args.queries, args.query_words, args.seed)
+    embedder = retrieval.HashingEmbedder(args.dim)
+    started = time.perf_counter()
+    vectors = embedder.embed([chunk["content"] for chunk in corpus])
+    embed_s = time.perf_counter() - started
+    embedded = embedder.embed([text for _, text in queries])
+    partitions = args.partitions or max(2, int(args.chunks ** 0.5))
+
+    modes = [
+        ("float32 brute force", "float32", 0, None, 1.0),
+        ("int8 brute force", "int8", 0, None, 1.0),
+        *[(f"float32 partitioned nprobe={n}", "float32", partitions, n, 1.0) for n in args.nprobe],
+        *[(f"int8 partitioned nprobe={n}", "int8", partitions, n, 1.0) for n in args.nprobe],
+        (f"float32 brute force hybrid w={args.hybrid_weight:g}", "float32", 0, None, args.hybrid_weight),
+        (f"int8 partitioned nprobe={args.nprobe[-1]} hybrid w={args.hybrid_weight:g}", "int8", partitions, args.nprobe[-1], args.hybrid_weight),
+    ]
+    results, indexes, exact = [], {}, None
+    with tempfile.TemporaryDirectory() as root:
+        for name, dtype, parts, nprobe, weight in modes:
+            key = (dtype, parts)
+            if key not in indexes:
+                directory = os.path.join(root, f"{dtype}-{parts}")
+                started = time.perf_counter()
+                retrieval.build_index(directory, corpus, embedder, dtype=dtype, partitions=parts, vectors=vectors)
+                build_s = time.perf_counter() - started
+                indexes[key] = (retrieval.VectorIndex(directory), build_s)
+            index, build_s = indexes[key]
+            if exact is None:
+                # Ground truth: exact float32 cosine top k over every row
+                exact = [{doc["id"] for doc in index.search(text, vector, args.k)} for (_, text), vector in zip(queries, embedded)]
+            results.append({
+                "mode": name,
+                "batch": 1,
+                "build_s": round(build_s, 2),
+                "vector_bytes": int(index.vectors.nbytes),
+                **_measure(index, embedded, queries, exact, [chunk["id"] for chunk in corpus], args.k, weight, nprobe),
+            })
+        # Brute force over several queries at once reads the matrix once per batch
+        for dtype in ("float32", "int8"):
+            index, build_s = indexes[(dtype, 0)]
+            latencies = []
+            for start in range(0, len(queries) - args.batch + 1, args.batch):
+                texts = [text for _, text in queries[start:start + args.batch]]
+                began = time.perf_counter()
+                index.search_batch(texts, embedded[start:start + args.batch], args.k)
+                latencies.append((time.perf_counter() - began) / args.batch)
+            results.append({
+                "mode": f"{dtype} brute force batch={args.batch}",
+                "batch": args.batch,
+                "build_s": round(build_s, 2),
+                "vector_bytes": int(index.vectors.nbytes),
+                "recall_at_k": None,
+                "source_hit_rate": None,
+                # Per query: batch time divided by the batch size
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            })
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "parameters": vars(args),
+        },
+        "embed_chunks_s": round(embed_s, 2),
+        "partitions": partitions,
+        "modes": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall and latency of the local retrieval backend against brute force.")
+    parser.add_argument("--chunks", type=int, default=50000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=200, help="Topic vocabularies the corpus is drawn from")
+    parser.add_argument("--chunk-words", type=int, default=60)
+    parser.add_argument("--query-words", type=int, default=6)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--partitions", type=int, default=0, help="Partitions of the partitioned modes (default: sqrt(chunks))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--batch", type=int, default=16, help="Queries per batch in the batched brute-force modes")
+    parser.add_argument("--hybrid-weight", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--package", default="react_agent", help="Package the retrieval module is imported from")
+    parser.add_argument("--app-dir", default=os.path.join(ROOT, "src"), help="Directory the API package is imported from")
+    parser.add_argument("--output", default=None, help="JSON report path (default: print only)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = benchmark(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    print(f"{args.chunks} chunks, {report['partitions']} partitions, embedded in {report['embed_chunks_s']} s")
+    print(f"{'mode':<44} {'recall@k':>8} {'source':>7} {'p50 ms':>8} {'p95 ms':>8} {'MB':>7}")
+    for mode in report["modes"]:
+        print(f"{mode['mode']:<44} {str(mode['recall_at_k'] or '-'):>8} {str(mode['source_hit_rate'] or '-'):>7} "
+              f"{mode['p50_ms']:>8} {mode['p95_ms']:>8} {mode['vector_bytes'] / 2**20:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Offline benchmark runner.
+
+Starts the fake LLM, the fake knowledge base and the agent API as local
+processes, drives the API with the load generator and writes a JSON report
+(client-side latency, throughput, server RSS and the server's /stats) so runs
+can be compared across commits.
+
+    python -m benchmarks.run --sessions 50 --concurrency 10 --output benchmarks/results/run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .loadgen import run_load, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start(app: str, port: int, env: Dict[str, str], app_dir: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--app-dir", app_dir, "--log-level", "warning", "--no-access-log"],
+        env=env,
+        cwd=ROOT,
+    )
+
+
+async def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up within {timeout:g}s")
+                await asyncio.sleep(0.1)
+
+
+async def _sample_rss(pid: int, samples: List[int], interval: float = 0.2) -> None:
+    while True:
+        rss = _rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    llm_port, kb_port, api_port = _free_port(), _free_port(), _free_port()
+    base_env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    fake_env = {
+        **base_env,
+        "FAKE_LLM_TTFT_MS": str(args.llm_ttft_ms),
+        "FAKE_LLM_TOKEN_MS": str(args.llm_token_ms),
+        "FAKE_LLM_ANSWER_TOKENS": str(args.llm_answer_tokens),
+        "FAKE_KB_LATENCY_MS": str(args.kb_latency_ms),
+        "FAKE_KB_BATCH": "FALSE" if args.no_kb_batch_endpoint else "TRUE",
+        "FAKE_LLM_FAST_FACTOR": str(args.llm_fast_factor),
+    }
+    api_env = {
+        **base_env,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_BASE": f"http://127.0.0.1:{llm_port}/v1",
+        "STARTERKIT_KNOWLEDGE_BASE_URL": f"http://127.0.0.1:{kb_port}",
+        "ONBOARDKIT_KB_BATCHING": "TRUE" if args.kb_batching else "FALSE",
+        "ONBOARDKIT_KB_BATCH_ENDPOINT": "TRUE" if args.kb_batching else "FALSE",
+        "ONBOARDKIT_MODEL_TIERS": "TRUE" if args.model_tiers else "FALSE",
+        "ONBOARDKIT_FAST_PATH": "TRUE" if args.fast_path else "FALSE",
+    }
+
+    processes = [
+        _start("benchmarks.fake_llm:app", llm_port, fake_env, ROOT),
+        _start("benchmarks.fake_kb:app", kb_port, fake_env, ROOT),
+    ]
+    api = _start(args.app, api_port, api_env, args.app_dir)
+    processes.append(api)
+    base_url = f"http://127.0.0.1:{api_port}"
+    try:
+        await _wait_ready(f"http://127.0.0.1:{llm_port}/docs")
+        await _wait_ready(f"http://127.0.0.1:{kb_port}/docs")
+        await _wait_ready(f"{base_url}/stats", timeout=60.0)
+
+        if args.warmup:
+            await run_load(base_url, sessions=args.warmup, concurrency=min(args.warmup, args.concurrency))
+        rss_baseline = _rss_bytes(api.pid)
+
+        samples: List[int] = []
+        sampler = asyncio.create_task(_sample_rss(api.pid, samples))
+        try:
+            results = await run_load(
+                base_url,
+                sessions=args.sessions,
+                concurrency=args.concurrency,
+                think_time=args.think_time,
+                stream_mode=args.stream_mode,
+                companies=args.companies,
+            )
+        finally:
+            sampler.cancel()
+        rss_end = _rss_bytes(api.pid)
+
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            server_stats = (await client.get("/stats")).json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    active_sessions = (server_stats.get("sessions") or {}).get("sessions") or 0
+    storage = server_stats.get("message_storage") or {}
+    checkpoint_bytes = storage.get("checkpoint_bytes")
+    memory = {
+        "rss_baseline_bytes": rss_baseline,
+        "rss_end_bytes": rss_end,
+        "rss_peak_bytes": max(samples) if samples else None,
+        "active_sessions": active_sessions,
+        "rss_per_active_session_bytes": (
+            int((rss_end - rss_baseline) / active_sessions)
+            if rss_end is not None and rss_baseline is not None and active_sessions else None
+        ),
+        # Serialized checkpoints and the live state cached per session; tool payloads are shared
+        "compact_storage": storage.get("compact"),
+        "checkpoint_bytes_per_session": int(checkpoint_bytes / active_sessions) if checkpoint_bytes and active_sessions else None,
+        "state_bytes_per_session": (server_stats.get("sessions") or {}).get("avg_session_bytes"),
+        "tool_payload_bytes": (storage.get("tool_payloads") or {}).get("bytes"),
+    }
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": vars(args),
+        },
+        "load": summarize(results),
+        "memory": memory,
+        "server_stats": server_stats,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test against fake LLM and knowledge-base servers.")
+    parser.add_argument("--sessions", type=int, default=50, help="Scripted conversations to run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--warmup", type=int, default=2, help="Conversations to run before measuring")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between turns in seconds")
+    parser.add_argument("--stream-mode", choices=["tokens", "nodes"], default="tokens")
+    parser.add_argument("--llm-ttft-ms", type=float, default=150.0)
+    parser.add_argument("--llm-token-ms", type=float, default=10.0)
+    parser.add_argument("--llm-answer-tokens", type=int, default=60)
+    parser.add_argument("--llm-fast-factor", type=float, default=0.4, help="Latency of the small models relative to the others")
+    parser.add_argument("--model-tiers", action="store_true", help="Route the first call of a turn to the small router model")
+    parser.add_argument("--fast-path", action="store_true", help="Answer small talk and plain onboarding questions without the first LLM call")
+    parser.add_argument("--kb-latency-ms", type=float, default=40.0)
+    parser.add_argument("--companies", type=int, default=3, help="Companies the sessions are spread over")
+    parser.add_argument("--kb-batching", action="store_true", help="Micro-batch concurrent knowledge searches per company")
+    parser.add_argument("--no-kb-batch-endpoint", action="store_true", help="Fake KB answers 404 on the batch endpoint")
+    parser.add_argument("--app", default="react_agent.fastapi_server:app", help="ASGI import string of the agent API")
+    parser.add_argument("--app-dir", default=os.path.join(ROOT, "src"), help="Directory the API package is imported from")
+    parser.add_argument("--output", default=None, help="JSON report path (default: benchmarks/results/<revision>-<time>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(benchmark(args))
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results",
+        f"{report['meta']['git_revision'] or 'local'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    load = report["load"]
+    print(f"turns ok {load['turns_ok']}/{load['turns']}  throughput {load['throughput_turns_per_s']} turns/s")
+    for name in ("ttfb", "ttft", "total"):
+        print(f"{name:>5}: p50 {load[name]['p50_ms']} ms  p95 {load[name]['p95_ms']} ms  p99 {load[name]['p99_ms']} ms")
+    memory = report["memory"]
+    print(f"RSS per active session: {memory['rss_per_active_session_bytes']} bytes")
+    print(f"per session: checkpoints {memory['checkpoint_bytes_per_session']} bytes, "
+          f"cached state {memory['state_bytes_per_session']} bytes (tool payload store {memory['tool_payload_bytes']} bytes)")
+    tiers = report["server_stats"].get("model_tiers") or {}
+    for role in ("router", "answer"):
+        tier = tiers.get(role)
+        if tier and tier["calls"]:
+            print(f"{role:>6} tier {tier['models']}: {tier['calls']} calls, avg {tier['avg_ms']} ms, "
+                  f"tokens {tier['prompt_tokens']} prompt / {tier['completion_tokens']} completion")
+    if tiers.get("escalated"):
+        print(f"escalated router decisions: {tiers['escalated']} (rate {tiers['escalation_rate']})")
+    batching = (report["server_stats"].get("retrieval") or {}).get("batching")
+    if batching:
+        print(f"kb batching: {batching['searches']} searches in {batching['batches']} batches "
+              f"(avg {batching['avg_batch']}, max {batching['max_batch']}), avg wait {batching['avg_wait_ms']} ms")
+    print(f"report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,8 @@ reload = False
 host = "0.0.0.0"
 port = int(os.environ.get("PORT", 8300))
 is_development = os.environ.get("DEVELOPMENT_SERVER",False) == "TRUE"
+# Several workers need a shared checkpointer (ONBOARDKIT_CHECKPOINTER=sqlite)
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
 
 
 # ===============================================
@@ -26,17 +28,21 @@ is_development = os.environ.get("DEVELOPMENT_SERVER",False) == "TRUE"
 # ===============================================
 def main():
     try:
-
+        target, use_reload, worker_count = app, reload, workers
         if is_development:
-            app = "react_agent.fastapi_server:app"
-            reload = True        
+            target = "react_agent.fastapi_server:app"
+            use_reload, worker_count = True, None
+        elif workers > 1:
+            # uvicorn can only spawn workers from an import string
+            target = "react_agent.fastapi_server:app"
         uvicorn.run(
-            app,
+            target,
             host=host,
             port=port,
             log_level="info",
             access_log=True,
-            reload=reload
+            reload=use_reload,
+            workers=worker_count
         )
 
     except Exception as e:
@@ -0,0 +1,105 @@
+"""
+Test setup: the modules import each other as one flat ``react_agent`` package
+(the layout the API is deployed and benchmarked with, see ``--app-dir``), so
+the package is assembled into a temporary directory before the tests import it.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SOURCES = ("agent", "agent/tools", "agent/prompts", "api", "models", "utils")
+
+# No test talks to a real provider or knowledge base
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("STARTERKIT_KNOWLEDGE_BASE_URL", "http://kb.test")
+
+
+def _build_package() -> str:
+    app_dir = tempfile.mkdtemp(prefix="onboardkit-tests-")
+    atexit.register(shutil.rmtree, app_dir, True)
+    package = os.path.join(app_dir, "react_agent")
+    os.makedirs(package)
+    for source in _SOURCES:
+        directory = os.path.join(ROOT, source)
+        for name in os.listdir(directory):
+            if name.endswith(".py") and name != "studio_graph.py":
+                shutil.copy(os.path.join(directory, name), package)
+    open(os.path.join(package, "__init__.py"), "w").close()
+    return app_dir
+
+
+sys.path.insert(0, _build_package())
+
+
+@pytest.fixture
+def scripted_llm(monkeypatch):
+    """
+    Replace the chat model with scripted replies per role ("router"/"answer");
+    returns the list of roles the models were created for, in order.
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    from react_agent import utils
+    from react_agent.config import Configuration
+
+    class ScriptedModel(BaseChatModel):
+        """Streams a fixed reply word by word; tool binding is a no-op."""
+
+        reply: str
+
+        @property
+        def _llm_type(self) -> str:
+            return "scripted"
+
+        def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedModel":
+            return self
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            for i, word in enumerate(self.reply.split()):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+
+    calls: List[str] = []
+    replies: Dict[str, str] = {}
+
+    def create_llm(self, role: str = "answer"):
+        calls.append(role)
+        return ScriptedModel(reply=replies.get(role, "Scripted answer"))
+
+    def script(**by_role: str) -> List[str]:
+        replies.update(by_role)
+        return calls
+
+    monkeypatch.setattr(Configuration, "create_llm", create_llm)
+    monkeypatch.setattr(utils, "_bound_llms", {})
+    return script
+
+
+@pytest.fixture
+def without_fast_path(monkeypatch):
+    """Send every message to the LLM, as with ONBOARDKIT_FAST_PATH=FALSE."""
+    from react_agent import fast_path
+    from react_agent.config import Configuration
+
+    monkeypatch.setattr(fast_path, "_config", Configuration(fast_path_enabled=False))
+
+
+
+@pytest.fixture
+def session_payload() -> Dict[str, Any]:
+    """Body of ``POST /session`` for a test user."""
+    return {
+        "auth_token": "t", "user_id": 1, "email": "ada@example.com", "full_name": "Ada Lovelace",
+        "company_id": 7, "company_name": "Acme",
+    }
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Dict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from react_agent import answer_cache
+from react_agent.config import Configuration
+from react_agent.retrieval import HttpBackend
+from react_agent.utils import _create_error_response, _create_success_response
+
+QUESTION = "What is the holiday policy?"
+
+
+def _state(auth_token: str, company_id: int) -> Dict[str, Any]:
+    return {"auth_token": auth_token, "company_id": company_id, "messages": [HumanMessage(content=QUESTION)]}
+
+
+def test_cached_answers_are_served_only_to_tokens_of_the_company(monkeypatch):
+    async def search(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        if auth_token != f"token-{company_id}":
+            return _create_error_response("HTTP 403: Forbidden", status_code=403)
+        return _create_success_response({"data": []}, {}, "Search successful")
+
+    monkeypatch.setattr(HttpBackend, "search", search)
+    monkeypatch.setattr(answer_cache, "_config", Configuration(answer_cache_enabled=True))
+    answer_cache.answer_cache.clear()
+    # Session A of company 7 got this answer stored
+    answer_cache.answer_cache.set(answer_cache.cache_key(_state("token-7", 7)), {
+        "content": "Company 7 gets 30 days.", "llm_calls": 2, "cost_ms": 900.0,
+    })
+
+    async def main():
+        return (
+            await answer_cache.answer_cache_lookup(_state("token-7", 7)),
+            await answer_cache.answer_cache_lookup(_state("token-8", 7)),
+            await answer_cache.answer_cache_lookup(_state("token-8", 8)),
+        )
+
+    owner, other_token, other_company = asyncio.run(main())
+    assert isinstance(owner["messages"][-1], AIMessage) and owner["messages"][-1].content == "Company 7 gets 30 days."
+    for result in (other_token, other_company):
+        assert "messages" not in result and result["answer_cache_key"]
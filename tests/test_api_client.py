@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+
+from react_agent.config import Configuration
+from react_agent.utils import APIClient
+
+
+async def _with_transport(config: Configuration, handler) -> None:
+    """Open the shared pool, then swap in a mock transport with the same limits."""
+    await APIClient.open(config)
+    await APIClient._client.aclose()
+    APIClient._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_requests_share_one_client_and_respect_the_per_host_limit():
+    in_flight, peak, clients = [0], [0], set()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return httpx.Response(200, json={"ok": True})
+
+    async def main():
+        await _with_transport(Configuration(http_max_connections_per_host=2), handler)
+        try:
+            async def one():
+                clients.add(id(await APIClient.open()))
+                return await APIClient.make_request("http://kb.test/knowledge/search?query=x", auth_token="t")
+
+            results = await asyncio.gather(*[one() for _ in range(8)])
+        finally:
+            await APIClient.close()
+        return results
+
+    results = asyncio.run(main())
+    assert all(result["success"] and result["data"] == {"ok": True} for result in results)
+    assert len(clients) == 1
+    assert peak[0] == 2
+    assert APIClient.pool_stats()["in_use"] == 0
+
+
+def test_requests_queued_for_a_busy_host_do_not_block_other_hosts():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "slow.test":
+            await asyncio.sleep(0.3)
+        return httpx.Response(200, json={"ok": True})
+
+    async def main():
+        await _with_transport(Configuration(http_max_connections=2, http_max_connections_per_host=1), handler)
+        try:
+            slow = [asyncio.ensure_future(APIClient.make_request("http://slow.test/search")) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            started = asyncio.get_running_loop().time()
+            fast = await APIClient.make_request("http://fast.test/search")
+            elapsed = asyncio.get_running_loop().time() - started
+            await asyncio.gather(*slow)
+        finally:
+            await APIClient.close()
+        return fast, elapsed
+
+    fast, elapsed = asyncio.run(main())
+    assert fast["success"] and elapsed < 0.2
+
+
+def test_http_errors_become_error_responses():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"] == "Bearer secret"
+        return httpx.Response(404, json={"message": "no such company"})
+
+    async def main():
+        await _with_transport(Configuration(), handler)
+        try:
+            return await APIClient.make_request("http://kb.test/knowledge/search", auth_token="secret")
+        finally:
+            await APIClient.close()
+
+    result = asyncio.run(main())
+    assert result["success"] is False
+    assert result["status_code"] == 404
+    assert "no such company" in result["message"]
@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import httpx
+
+
+def test_batch_upload_is_streamed_and_every_item_takes_a_run_slot(scripted_llm, without_fast_path):
+    scripted_llm(answer="Batch answer")
+    from react_agent import fastapi_server
+
+    items = [{"id": i, "company_id": 7, "question": f"question {i}"} for i in range(3)]
+
+    async def upload():
+        for item in items:
+            yield (json.dumps(item) + "\n").encode()
+            await asyncio.sleep(0)
+        yield b"not json\n"
+
+    async def main():
+        admitted = fastapi_server.run_limiter.stats()["admitted"]
+        transport = httpx.ASGITransport(app=fastapi_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            response = await client.post("/chat/batch", content=upload(), headers={"Authorization": "Bearer t"})
+        records = [json.loads(line) for line in response.text.splitlines() if line]
+        return records, fastapi_server.run_limiter.stats()["admitted"] - admitted
+
+    records, admitted = asyncio.run(main())
+    results = sorted((r for r in records if r["type"] == "result"), key=lambda r: r["index"])
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "error"]
+    assert all(r["answer"] == "Batch answer" for r in results[:3])
+    assert records[-1]["type"] == "summary" and records[-1]["items"] == 4
+    assert admitted == 4
@@ -0,0 +1,28 @@
+from react_agent import fast_path
+from react_agent.config import Configuration
+from react_agent.fast_path import classify_message
+
+
+def test_fast_path_is_off_by_default():
+    assert not Configuration().fast_path_enabled
+
+
+def test_only_questions_about_onboarding_topics_skip_the_llm():
+    assert classify_message("What is the holiday policy?", first_turn=True) == "knowledge"
+    assert classify_message("Who do I ask for building access?", first_turn=True) == "knowledge"
+    assert classify_message("Which training courses are mandatory?", first_turn=True) == "knowledge"
+    # About the conversation, not the knowledge base
+    assert classify_message("Could you rephrase your last answer?", first_turn=False) == "llm"
+    assert classify_message("Can you explain that again?", first_turn=False) == "llm"
+    # No topic the knowledge base covers
+    assert classify_message("What's the weather like today?", first_turn=True) == "llm"
+
+
+def test_a_confident_classifier_vote_counts_as_knowledge_intent(monkeypatch):
+    question = "Which meetups should new starters join?"
+    assert classify_message(question, first_turn=True) == "llm"
+    monkeypatch.setattr(fast_path, "_config", Configuration(fast_path_classifier=True, fast_path_classifier_threshold=0.5))
+    monkeypatch.setattr(fast_path, "_classify", lambda text: ("knowledge", 0.9))
+    assert classify_message(question, first_turn=True) == "knowledge"
+    monkeypatch.setattr(fast_path, "_classify", lambda text: ("knowledge", 0.3))
+    assert classify_message(question, first_turn=True) == "llm"
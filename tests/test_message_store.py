@@ -0,0 +1,41 @@
+import asyncio
+
+from langchain_core.messages import ToolMessage
+
+from react_agent import message_store
+from react_agent.checkpoint import SQLiteCheckpointSaver
+from react_agent.message_store import PAYLOAD_REF_KEY, offload_tool_payloads, rehydrate_message, tool_payloads
+
+
+def test_payloads_offloaded_by_one_worker_are_rehydrated_by_another(tmp_path, monkeypatch):
+    path = str(tmp_path / "checkpoints.db")
+    content = "Laptops are handed out on the first day. " * 100
+    message = ToolMessage(content=content, tool_call_id="1", name="document_knowledge")
+
+    async def offload():
+        monkeypatch.setattr(message_store, "_payload_store", SQLiteCheckpointSaver(path, payload_ttl=3600))
+        return (await offload_tool_payloads([message]))[0]
+
+    stored = asyncio.run(offload())
+    assert PAYLOAD_REF_KEY in stored.additional_kwargs and len(stored.content) < len(content)
+
+    # Another worker: its own payload cache is empty, the database is shared
+    tool_payloads.clear()
+    other = SQLiteCheckpointSaver(path, payload_ttl=3600)
+    monkeypatch.setattr(message_store, "_payload_store", other)
+
+    async def rehydrate_while_writing():
+        # A write transaction in progress does not hold up payload reads or the size report
+        with other._db_lock:
+            return await asyncio.wait_for(rehydrate_message(stored), 5), other.stored_bytes()
+
+    rehydrated, stored_bytes = asyncio.run(rehydrate_while_writing())
+    assert rehydrated.content == content and stored_bytes > 0
+
+
+def test_without_a_durable_store_a_lost_payload_becomes_a_stub(monkeypatch):
+    monkeypatch.setattr(message_store, "_payload_store", None)
+    message = ToolMessage(content="x" * 4096, tool_call_id="1", name="document_knowledge")
+    stored = asyncio.run(offload_tool_payloads([message]))[0]
+    tool_payloads.clear()
+    assert asyncio.run(rehydrate_message(stored)).content == "[tool result of document_knowledge no longer available]"
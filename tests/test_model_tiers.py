@@ -0,0 +1,73 @@
+import asyncio
+import json
+from typing import Dict, List
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from react_agent import graph, model_tiers
+from react_agent.config import Configuration
+from react_agent.model_tiers import router_confidence, select_role
+
+TIERS = Configuration(model_tiers_enabled=True)
+
+
+def _use_tiers(monkeypatch, scripted_llm, replies: Dict[str, str]) -> List[str]:
+    """Enable tiers with scripted models per role; returns the roles in call order."""
+    monkeypatch.setattr(graph, "_config", TIERS)
+    monkeypatch.setattr(model_tiers, "_config", TIERS)
+    return scripted_llm(**replies)
+
+
+def test_select_role_follows_the_tier_config():
+    state = {"messages": [HumanMessage(content="hi")]}
+    assert select_role(state, Configuration(model_tiers_enabled=False)) == "answer"
+    assert select_role(state, TIERS) == "router"
+    after_tools = {"messages": [HumanMessage(content="hi"), ToolMessage(content="{}", tool_call_id="1")]}
+    assert select_role(after_tools, TIERS) == "answer"
+
+
+def test_router_confidence():
+    search = AIMessage(content="", tool_calls=[{"name": "document_knowledge", "args": {"query": "laptop"}, "id": "1"}])
+    assert router_confidence(search) == (1.0, "search")
+    empty_search = AIMessage(content="", tool_calls=[{"name": "document_knowledge", "args": {"query": " "}, "id": "1"}])
+    assert router_confidence(empty_search)[1] == "bad_search"
+    truncated = AIMessage(content="The laptop", response_metadata={"finish_reason": "length"})
+    assert router_confidence(truncated) == (0.0, "truncated")
+    # Final answers belong to the answer tier
+    assert router_confidence(AIMessage(content="You get a laptop on day one."))[0] == 0.0
+
+
+def test_router_search_is_kept_without_an_answer_call(monkeypatch):
+    search = AIMessage(content="", tool_calls=[{"name": "document_knowledge", "args": {"query": "laptop"}, "id": "1"}])
+    roles: List[str] = []
+
+    async def generate(state, config=None, role="answer"):
+        roles.append(role)
+        return {"messages": [search], "last_error": ""}
+
+    monkeypatch.setattr(graph, "_config", TIERS)
+    monkeypatch.setattr(model_tiers, "_config", TIERS)
+    monkeypatch.setattr(graph, "generate_llm_response", generate)
+    result = asyncio.run(graph.react_agent({"messages": [HumanMessage(content="When do I get my laptop?")]}, {}))
+    assert roles == ["router"]
+    assert result["messages"][-1] is search
+
+
+def test_escalated_router_tokens_never_reach_the_client(monkeypatch, scripted_llm, without_fast_path, session_payload):
+    calls = _use_tiers(monkeypatch, scripted_llm, {"router": "Router draft answer", "answer": "Strong final answer"})
+    from react_agent import fastapi_server
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            session = (await client.post("/session", json=session_payload)).json()["session_id"]
+            response = await client.post(f"/chat/{session}", params={"user_input": "tell me something nice"})
+            return [json.loads(line) for line in response.text.splitlines() if line]
+
+    events = asyncio.run(main())
+    streamed = "".join(e["content"] for e in events if e["type"] in ("token", "stream"))
+    assert streamed == "Strong final answer"
+    assert calls == ["router", "answer"]
+    assert events[-1]["type"] == "status"
+    assert model_tiers.tier_stats["escalated"].get("answer", 0) >= 1
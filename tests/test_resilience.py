@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from react_agent.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, PartialOutputError, TokenBucket, Upstream, classify_llm_error,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _upstream(clock: _Clock, threshold: int = 1, attempts: int = 3) -> Upstream:
+    return Upstream(
+        "llm:test",
+        TokenBucket(100, 100, 1),
+        CircuitBreaker(threshold, reset_timeout=10, clock=clock),
+        max_attempts=attempts,
+        base_delay=0.001,
+        max_delay=0.001,
+    )
+
+
+async def _timeout(remaining: float):
+    raise TimeoutError()
+
+
+async def _ok(remaining: float):
+    return "ok"
+
+
+def test_breaker_opens_then_a_successful_probe_closes_it():
+    clock = _Clock()
+    upstream = _upstream(clock)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await upstream.call(_timeout, classify_llm_error, 5)
+        assert upstream.breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await upstream.call(_ok, classify_llm_error, 5)
+        clock.now = 20
+        assert await upstream.call(_ok, classify_llm_error, 5) == "ok"
+
+    asyncio.run(main())
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_does_not_wedge_the_breaker_half_open():
+    clock = _Clock()
+    upstream = _upstream(clock)
+
+    async def hang(remaining: float):
+        await asyncio.sleep(10)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await upstream.call(_timeout, classify_llm_error, 5)
+        clock.now = 20
+        probe = asyncio.create_task(upstream.call(hang, classify_llm_error, 50))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert upstream.breaker.state == CircuitBreaker.HALF_OPEN
+        # The next call is let through as the new probe
+        assert await upstream.call(_ok, classify_llm_error, 5) == "ok"
+
+    asyncio.run(main())
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limit_deadline_does_not_take_the_probe_slot():
+    clock = _Clock()
+    upstream = _upstream(clock)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await upstream.call(_timeout, classify_llm_error, 5)
+        clock.now = 20
+        upstream.bucket.tokens = 0
+        upstream.bucket.rate = 0.01
+        with pytest.raises(DeadlineExceededError):
+            await upstream.call(_ok, classify_llm_error, 1)
+        upstream.bucket.tokens = 10
+        assert await upstream.call(_ok, classify_llm_error, 5) == "ok"
+
+    asyncio.run(main())
+
+
+def test_partial_output_is_not_retried_but_counts_as_a_failure():
+    clock = _Clock()
+    upstream = _upstream(clock, threshold=1, attempts=4)
+    attempts = []
+
+    async def partial(remaining: float):
+        attempts.append(remaining)
+        try:
+            raise TimeoutError()
+        except TimeoutError as e:
+            raise PartialOutputError("stream broke") from e
+
+    async def main():
+        with pytest.raises(PartialOutputError):
+            await upstream.call(partial, classify_llm_error, 5)
+
+    asyncio.run(main())
+    assert len(attempts) == 1
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    assert upstream.counters["retries"] == 0
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from react_agent.config import Configuration
+from react_agent.retrieval import BackendRouter, HttpBackend, append_index, build_index, create_embedder, index_hashes
+from react_agent.utils import _create_error_response, _create_success_response
+
+COMPANY = 7
+REMOTE_DOC = {"id": "remote-1", "content": "Payroll runs on the 25th of each month."}
+
+
+def _build(root: str, company_id: int, contents: List[str]) -> None:
+    config = Configuration()
+    chunks = [{"id": f"local-{i}", "content": content} for i, content in enumerate(contents)]
+    build_index(os.path.join(root, str(company_id)), chunks, create_embedder(config))
+
+
+@pytest.fixture
+def knowledge_api(monkeypatch):
+    """
+    Stand-in for the knowledge-base API: token "good" may read every company,
+    any other token gets 403. Returns the searches it received.
+    """
+    searches: List[Dict[str, Any]] = []
+
+    async def search(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        searches.append({"query": query, "auth_token": auth_token, "company_id": company_id})
+        if auth_token != "good":
+            return _create_error_response("HTTP 403: Forbidden", status_code=403)
+        return _create_success_response({"data": [REMOTE_DOC]}, {}, "Search successful")
+
+    monkeypatch.setattr(HttpBackend, "search", search)
+    return searches
+
+
+def _router(root: str, **settings: Any) -> BackendRouter:
+    return BackendRouter(Configuration(kb_index_dir=root, kb_batching_enabled=False, **settings))
+
+
+def test_local_search_requires_a_token_the_api_accepts(tmp_path, knowledge_api):
+    _build(str(tmp_path), COMPANY, ["Laptops are handed out on the first day."])
+    router = _router(str(tmp_path), kb_backend="local")
+
+    async def main():
+        denied = await router.search("laptop", "stolen", COMPANY)
+        first = await router.search("laptop", "good", COMPANY)
+        second = await router.search("first day", "good", COMPANY)
+        return denied, first, second
+
+    denied, first, second = asyncio.run(main())
+    assert not denied["success"] and denied["status_code"] == 403
+    assert first["success"] and first["data"]["data"][0]["id"] == "local-0"
+    assert second["success"]
+    # One probe per token; the accepted token is trusted for the following searches
+    assert [search["auth_token"] for search in knowledge_api] == ["stolen", "good"]
+
+
+def test_index_changes_by_another_worker_are_picked_up(tmp_path, knowledge_api):
+    root = str(tmp_path)
+    router = _router(root, kb_backend="local", kb_verify_access=False)
+    assert not router.local.has_index(COMPANY)
+    _build(root, COMPANY, ["Laptops are handed out on the first day."])
+    assert router.local.has_index(COMPANY)
+
+    async def search() -> List[str]:
+        result = await router.search("parking garage", "good", COMPANY)
+        return [doc["content"] for doc in result["data"]["data"]]
+
+    assert "parking" not in " ".join(asyncio.run(search()))
+    # Rebuilt from outside this process, without calling reload()
+    _build(root, COMPANY, ["The parking garage is under building B."])
+    assert asyncio.run(search())[0] == "The parking garage is under building B."
+
+
+def test_a_failed_index_load_is_retried_and_a_stale_load_not_reused(tmp_path, monkeypatch):
+    import threading
+
+    root = str(tmp_path)
+    _build(root, COMPANY, ["Laptops are handed out on the first day."])
+    local = _router(root, kb_backend="local", kb_verify_access=False).local
+    load = type(local)._load
+    failures = [OSError("meta.json vanished mid-read")]
+    release = threading.Event()
+
+    def flaky_load(self, company_id):
+        if failures:
+            raise failures.pop()
+        index = load(self, company_id)
+        # Held until the files were rebuilt, so the first load returns the old version
+        release.wait(5)
+        return index
+
+    monkeypatch.setattr(type(local), "_load", flaky_load)
+
+    async def main():
+        with pytest.raises(OSError):
+            await local.index(COMPANY)
+        stale = asyncio.ensure_future(local.index(COMPANY))
+        await asyncio.sleep(0.05)
+        _build(root, COMPANY, ["The parking garage is under building B."])
+        release.set()
+        fresh = await local.index(COMPANY)
+        await stale
+        return fresh
+
+    fresh = asyncio.run(main())
+    with open(os.path.join(root, str(COMPANY), "meta.json")) as f:
+        assert fresh.meta["generation"] == json.load(f)["generation"]
+
+
+def test_cached_results_are_not_served_to_a_token_the_api_refused(monkeypatch, knowledge_api):
+    from react_agent import tools
+
+    monkeypatch.setattr(tools, "retrieval", BackendRouter(Configuration(kb_batching_enabled=False)))
+    tools.knowledge_cache.clear()
+
+    async def main():
+        owner = await tools._search_knowledge("payroll date", "good", COMPANY)
+        other = await tools._search_knowledge("Payroll date?", "stolen", COMPANY)
+        return owner, other
+
+    owner, other = asyncio.run(main())
+    assert owner["success"] and owner["data"]["data"] == [REMOTE_DOC]
+    assert not other["success"] and other["status_code"] == 403
+
+
+def test_uploaded_index_is_merged_with_the_api_unless_pinned(tmp_path, knowledge_api):
+    root = str(tmp_path)
+    _build(root, COMPANY, ["Laptops are handed out on the first day."])
+    _build(root, 8, ["Laptops are handed out on the first day."])
+    router = _router(root, kb_company_backends={8: "local"})
+    assert router.route(COMPANY) == "merged"
+    assert router.route(8) == "local"
+    assert router.route(9) == "http"
+
+    async def main():
+        merged = await router.search("laptop payroll", "good", COMPANY)
+        pinned = await router.search("laptop payroll", "good", 8)
+        refused = await router.search("laptop payroll", "stolen", COMPANY)
+        return merged, pinned, refused
+
+    merged, pinned, refused = asyncio.run(main())
+    assert [doc["id"] for doc in merged["data"]["data"]] == ["remote-1", "local-0"]
+    assert [doc["id"] for doc in pinned["data"]["data"]] == ["local-0"]
+    assert refused["status_code"] == 403
+    assert router.stats()["routes"] == {"http": 0, "local": 1, "merged": 2, "merged_local_only": 0}
+
+
+def test_packing_keeps_the_interleave_when_one_backend_scores_higher():
+    from react_agent.packing import pack_knowledge_context
+    from react_agent.retrieval import _merge_documents
+
+    remote = [
+        {"id": "remote-1", "content": "Payroll runs on the 25th of each month.", "score": 0.91},
+        {"id": "remote-2", "content": "Expenses are filed in the travel portal.", "score": 0.88},
+    ]
+    local = [
+        {"id": "local-0", "content": "Laptops are handed out on the first day.", "score": 0.31},
+        {"id": "local-1", "content": "The parking garage is under building B.", "score": 0.22},
+    ]
+    context, _ = pack_knowledge_context(_merge_documents(remote, local), token_budget=1000)
+    order = [part.split("]")[0].lstrip("[") for part in context.split("\n---\n")]
+    assert order == ["remote-1", "local-0", "remote-2", "local-1"]
+
+
+def test_merged_search_keeps_answering_from_uploads_when_the_api_fails(tmp_path, monkeypatch, knowledge_api):
+    _build(str(tmp_path), COMPANY, ["Laptops are handed out on the first day."])
+    router = _router(str(tmp_path))
+
+    async def unavailable(self, query: str, auth_token: str, company_id: int) -> Dict[str, Any]:
+        return _create_error_response("HTTP 503: Service Unavailable", status_code=503)
+
+    async def main():
+        await router.search("laptop", "good", COMPANY)
+        monkeypatch.setattr(HttpBackend, "search", unavailable)
+        trusted = await router.search("laptop", "good", COMPANY)
+        unknown = await router.search("laptop", "new-token", COMPANY)
+        return trusted, unknown
+
+    trusted, unknown = asyncio.run(main())
+    assert [doc["id"] for doc in trusted["data"]["data"]] == ["local-0"]
+    assert not unknown["success"] and unknown["status_code"] == 503
+
+
+def test_upload_and_invalidate_require_a_token_for_the_company(tmp_path, monkeypatch, knowledge_api, session_payload):
+    import httpx
+
+    from react_agent import fastapi_server
+
+    monkeypatch.setattr(fastapi_server, "retrieval", _router(str(tmp_path)))
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            session = (await client.post("/session", json={**session_payload, "auth_token": "good"})).json()["session_id"]
+            files = {"file": ("handbook.txt", b"Laptops are handed out on the first day.")}
+            return [
+                (await client.post(f"/upload/{session}", files=files)).status_code,
+                (await client.post(f"/upload/{session}", files=files, headers={"Authorization": "Bearer stolen"})).status_code,
+                (await client.post(f"/knowledge/{COMPANY}/invalidate")).status_code,
+                (await client.post(f"/knowledge/{COMPANY}/invalidate", headers={"Authorization": "Bearer stolen"})).status_code,
+                (await client.post(f"/knowledge/{COMPANY}/invalidate", headers={"Authorization": "Bearer good"})).status_code,
+            ]
+
+    assert asyncio.run(main()) == [401, 403, 401, 403, 200]
+
+
+class _Upload:
+    def __init__(self, text: str):
+        self.data = text.encode()
+
+    async def read(self, size: int) -> bytes:
+        data, self.data = self.data[:size], self.data[size:]
+        return data
+
+
+def test_workers_appending_to_one_company_do_not_duplicate_or_lose_chunks(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from react_agent.ingest import DocumentIngestor
+
+    config = Configuration(kb_index_dir=str(tmp_path), ingest_chunk_words=4, ingest_overlap_words=0)
+    first, second = DocumentIngestor(config), DocumentIngestor(config)
+
+    async def upload(ingestor: DocumentIngestor, text: str) -> Dict[str, Any]:
+        job = ingestor.create_job(COMPANY, "handbook.txt")
+        events = [event async for event in ingestor.run(job, _Upload(text))]
+        return events[-1]
+
+    handbook = "Laptops arrive on day one. Payroll runs monthly."
+    asyncio.run(upload(first, handbook))
+    # The second worker indexes only the new passage, the first sees it despite its cached hashes
+    added = asyncio.run(upload(second, handbook + " Parking is garage B."))
+    again = asyncio.run(upload(first, "Parking is garage B."))
+    assert (added["chunks_indexed"], added["chunks_skipped"]) == (1, 2)
+    assert (again["chunks_indexed"], again["chunks_skipped"]) == (0, 1)
+
+    # Concurrent appends of overlapping batches commit every passage once
+    directory = os.path.join(str(tmp_path), "8")
+    embedder = create_embedder(config)
+    batches = [[{"id": str(n), "content": f"passage {n}"} for n in range(start, start + 20)] for start in range(0, 60, 10)]
+    with ThreadPoolExecutor(len(batches)) as pool:
+        list(pool.map(lambda chunks: append_index(directory, chunks, embedder.embed([c["content"] for c in chunks]), embedder), batches))
+    with open(os.path.join(directory, "meta.json")) as f:
+        assert json.load(f)["count"] == 70
+    assert len(index_hashes(directory)) == 70
+
+
+def _record_requests(status: int = 200):
+    """Mock knowledge-base transport answering every request; returns (handler, seen requests)."""
+    import httpx
+
+    seen: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.url.path.endswith("/batch"):
+            if status != 200:
+                return httpx.Response(status, json={"detail": "no"})
+            queries = json.loads(request.content)["queries"]
+            return httpx.Response(200, json={"results": [{"data": [{"content": q["query"]}]} for q in queries]})
+        return httpx.Response(200, json={"data": [{"content": request.url.params["query"]}]})
+
+    return handler, seen
+
+
+def _run_with_transport(handler, coroutine_fn):
+    import httpx
+
+    from react_agent.utils import APIClient
+
+    async def main():
+        await APIClient.open(Configuration())
+        await APIClient._client.aclose()
+        APIClient._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await coroutine_fn()
+        finally:
+            await APIClient.close()
+
+    return asyncio.run(main())
+
+
+def test_batch_endpoint_is_off_unless_configured():
+    handler, seen = _record_requests()
+    backend = HttpBackend()
+    assert not backend.micro_batch
+    results = _run_with_transport(handler, lambda: backend.search_batch(["a", "b"], ["t1", "t1"], COMPANY))
+    assert [r["data"]["data"][0]["content"] for r in results] == ["a", "b"]
+    assert [request.method for request in seen] == ["GET", "GET"]
+
+
+def test_batches_are_sent_per_token_with_its_authorization_header():
+    handler, seen = _record_requests()
+    backend = HttpBackend(batch_endpoint=True)
+    results = _run_with_transport(handler, lambda: backend.search_batch(["a", "b", "c"], ["t1", "t2", "t1"], COMPANY))
+    assert [r["data"]["data"][0]["content"] for r in results] == ["a", "b", "c"]
+    batch = [request for request in seen if request.method == "POST"]
+    assert len(batch) == 1 and batch[0].headers["Authorization"] == "Bearer t1"
+    assert "t1" not in batch[0].content.decode()
+    single = [request for request in seen if request.method == "GET"]
+    assert [request.headers["Authorization"] for request in single] == ["Bearer t2"]
+
+
+def test_a_refused_batch_request_falls_back_to_single_searches():
+    handler, seen = _record_requests(status=403)
+    backend = HttpBackend(batch_endpoint=True)
+    results = _run_with_transport(handler, lambda: backend.search_batch(["a", "b"], ["t1", "t1"], COMPANY))
+    assert all(r["success"] for r in results)
+    assert not backend.batch_supported and not backend.micro_batch
+    assert [request.method for request in seen] == ["POST", "GET", "GET"]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+
+from react_agent import cache, session_store as session_store_module
+from react_agent.config import Configuration
+from react_agent.session_store import InMemorySessionStore
+
+
+def test_set_state_measures_only_new_messages(monkeypatch):
+    measured = []
+
+    def approx_size(obj, _seen=None):
+        if isinstance(obj, (HumanMessage, AIMessage)):
+            measured.append(obj.content)
+        return cache.approx_size(obj, _seen)
+
+    monkeypatch.setattr(session_store_module, "approx_size", approx_size)
+    store = InMemorySessionStore()
+    history = [HumanMessage(content="q1"), AIMessage(content="a1")]
+
+    async def main():
+        await store.create("s", {"auth_token": "t"})
+        await store.set_state("s", {"messages": list(history), "company_id": 7})
+        history.append(HumanMessage(content="q2"))
+        await store.set_state("s", {"messages": list(history), "company_id": 7})
+        history.append(AIMessage(content="a2"))
+        await store.set_state("s", {"messages": list(history), "company_id": 7})
+
+    asyncio.run(main())
+    assert measured == ["q1", "a1", "q2", "a2"]
+    assert store.stats()["bytes"] > cache.approx_size({"auth_token": "t"})
+
+
+def test_a_failed_turn_is_rolled_back_in_the_checkpoint(monkeypatch, scripted_llm, session_payload):
+    scripted_llm(answer="Recovered answer")
+    from react_agent import fast_path, fastapi_server, graph
+
+    class BrokenTools:
+        async def ainvoke(self, state, config):
+            raise RuntimeError("tool crashed")
+
+    # The fast path turns the question into a tool call, which then fails
+    monkeypatch.setattr(fast_path, "_config", Configuration(fast_path_enabled=True))
+    monkeypatch.setattr(graph, "tool_node", BrokenTools())
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            session = (await client.post("/session", json=session_payload)).json()["session_id"]
+            failed = await client.post(f"/chat/{session}", params={"user_input": "What is the holiday policy?"})
+            checkpoint = (await graph.graph.aget_state(fastapi_server._thread_config(session))).values
+            monkeypatch.setattr(fast_path, "_config", Configuration(fast_path_enabled=False))
+            retried = await client.post(f"/chat/{session}", params={"user_input": "Tell me about holidays please"})
+            return [json.loads(line) for line in failed.text.splitlines() if line], checkpoint, [
+                json.loads(line) for line in retried.text.splitlines() if line
+            ]
+
+    events, checkpoint, retried = asyncio.run(main())
+    assert events[-1]["type"] == "error"
+    messages = checkpoint["messages"]
+    assert isinstance(messages[-2], HumanMessage) and messages[-2].content == "What is the holiday policy?"
+    assert isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls
+    assert checkpoint["last_error"].startswith("An error occurred")
+    assert "".join(e["content"] for e in retried if e["type"] == "token") == "Recovered answer"
@@ -0,0 +1,81 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import httpx
+
+from react_agent.streams import SessionStream, StreamRegistry
+
+
+def test_follow_replays_after_the_id_and_reports_gaps():
+    async def main():
+        stream = SessionStream(max_events=3)
+        stream.start()
+        for i in range(5):
+            stream.publish({"type": "token", "content": str(i)})
+        stream.running = False
+        replay = [event async for event in stream.follow(3)]
+        gap = [event async for event in stream.follow(0)]
+        return replay, gap
+
+    replay, gap = asyncio.run(main())
+    assert replay == [(4, {"type": "token", "content": "3"}), (5, {"type": "token", "content": "4"})]
+    assert gap[0] == (2, {"type": "gap", "from_id": 1, "to_id": 2})
+    assert [event_id for event_id, _ in gap[1:]] == [3, 4, 5]
+
+
+def test_follow_waits_for_live_events_until_the_turn_ends():
+    async def main():
+        registry = StreamRegistry(max_events=16, retention=60)
+        stream = registry.open("s")
+        received = []
+
+        async def follow():
+            async for event_id, event in registry.follow("s", 0):
+                received.append(event["content"])
+
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0)
+        stream.publish({"content": "a"})
+        await asyncio.sleep(0)
+        stream.publish({"content": "b"})
+        registry.close("s", stream)
+        await asyncio.wait_for(follower, 1)
+        return received, stream
+
+    received, stream = asyncio.run(main())
+    assert received == ["a", "b"]
+    assert not stream.has_pending(2)
+    assert stream.has_pending(1)
+
+
+async def _chat(client: httpx.AsyncClient, session: str, text: str, last_event_id: str = None) -> List[Dict[str, Any]]:
+    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+    response = await client.post(f"/chat/{session}", params={"user_input": text}, headers=headers)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_last_event_id_resumes_only_unseen_events(scripted_llm, without_fast_path, session_payload):
+    scripted_llm(answer="Hello from the agent")
+    from react_agent import fastapi_server
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            session = (await client.post("/session", json=session_payload)).json()["session_id"]
+            first = await _chat(client, session, "tell me something")
+            # The connection dropped after the first event: the retry replays the rest, nothing runs again
+            resumed = await _chat(client, session, "tell me something", last_event_id=str(first[0]["id"]))
+            # Everything of the finished turn was seen: the next message is a new turn, not an empty resume
+            second = await _chat(client, session, "and something else", last_event_id=str(first[-1]["id"]))
+            replayed = await client.get(f"/chat/{session}/stream", params={"after": first[-1]["id"]})
+            return first, resumed, second, [json.loads(line) for line in replayed.text.splitlines() if line]
+
+    first, resumed, second, replayed = asyncio.run(main())
+    assert first[-1]["type"] == "status"
+    assert resumed == first[1:]
+    assert second and second[0]["id"] > first[-1]["id"]
+    assert "".join(e["content"] for e in second if e["type"] == "token") == "Hello from the agent"
+    assert second[-1]["type"] == "status"
+    assert replayed == second
@@ -0,0 +1,32 @@
+from react_agent import tokens
+
+
+class _Encoding:
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, text, disallowed_special=()):
+        self.encoded += 1
+        return text.split()
+
+
+def test_counts_are_cached_by_digest_not_by_text(monkeypatch):
+    encoding = _Encoding()
+    monkeypatch.setattr(tokens, "_encoding", lambda model: encoding)
+    monkeypatch.setattr(tokens, "_counts", type(tokens._counts)())
+    text = "word " * 10_000
+
+    assert tokens.count_tokens(text) == 10_000
+    assert tokens.count_tokens(text) == 10_000
+    assert encoding.encoded == 1
+    (digest, model), = tokens._counts
+    assert isinstance(digest, bytes) and len(digest) == 16 and model == "gpt-4o"
+
+
+def test_the_count_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", lambda model: _Encoding())
+    monkeypatch.setattr(tokens, "_counts", type(tokens._counts)())
+    monkeypatch.setattr(tokens, "_COUNT_CACHE_SIZE", 3)
+    for i in range(5):
+        tokens.count_tokens(f"text {i}")
+    assert len(tokens._counts) == 3
@@ -0,0 +1,139 @@
+"""Admission control primitives for the OnboardKit agent starter kit."""
+
+import asyncio
+import math
+import time
+from typing import Any, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a limiter cannot admit a caller; carries a Retry-After hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent executions with a bounded FIFO wait queue.
+
+    Callers beyond ``max_concurrent`` wait; once ``max_queue`` callers are
+    already waiting, new callers are rejected immediately with QueueFullError
+    so overload turns into fast 429s instead of everyone timing out together.
+    Queue wait and execution time are tracked separately.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._active = 0
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "queue_wait_seconds": 0.0,
+            "max_queue_wait_seconds": 0.0,
+            "execution_seconds": 0.0,
+            "completed": 0,
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the average execution time."""
+        completed = self._stats["completed"]
+        average = self._stats["execution_seconds"] / completed if completed else 1.0
+        return max(1, math.ceil(average * (self._waiting + 1) / self.max_concurrent))
+
+    async def acquire(self) -> float:
+        """Wait for a slot and return the time spent queued, or raise QueueFullError."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise QueueFullError(f"{self.name} queue is full", self.retry_after())
+
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["timed_out"] += 1
+            raise QueueFullError(f"{self.name} queue wait timed out", self.retry_after())
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - started
+        self._active += 1
+        self._stats["admitted"] += 1
+        self._stats["queue_wait_seconds"] += waited
+        self._stats["max_queue_wait_seconds"] = max(self._stats["max_queue_wait_seconds"], waited)
+        return waited
+
+    def release(self, execution_seconds: float = 0.0) -> None:
+        self._active -= 1
+        self._stats["completed"] += 1
+        self._stats["execution_seconds"] += execution_seconds
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        admitted = self._stats["admitted"]
+        completed = self._stats["completed"]
+        return {
+            **self._stats,
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_queue_wait_seconds": self._stats["queue_wait_seconds"] / admitted if admitted else 0.0,
+            "avg_execution_seconds": self._stats["execution_seconds"] / completed if completed else 0.0,
+        }
+
+
+class KeyedLocks:
+    """Per-key FIFO locks (e.g. one per session) that are dropped once nobody holds or awaits them."""
+
+    def __init__(self, max_waiters: int):
+        self.max_waiters = max_waiters
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+        self._rejected = 0
+
+    async def acquire(self, key: str) -> float:
+        """Acquire the lock for ``key``; returns the wait time or raises QueueFullError."""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        # Users = the holder plus everyone queued behind it
+        if lock.locked() and self._users.get(key, 0) > self.max_waiters:
+            self._rejected += 1
+            raise QueueFullError(f"Too many queued turns for session {key}", 1)
+
+        self._users[key] = self._users.get(key, 0) + 1
+        started = time.perf_counter()
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget(key)
+            raise
+        return time.perf_counter() - started
+
+    def release(self, key: str) -> None:
+        self._locks[key].release()
+        self._forget(key)
+
+    def _forget(self, key: str) -> None:
+        self._users[key] -= 1
+        if not self._users[key]:
+            del self._users[key]
+            del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "locked_sessions": sum(1 for lock in self._locks.values() if lock.locked()),
+            "queued_turns": sum(self._users.values()) - sum(1 for lock in self._locks.values() if lock.locked()),
+            "rejected": self._rejected,
+        }
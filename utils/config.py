@@ -1,12 +1,20 @@
 """Configuration for the OnboardKit onboarding agent."""
 
-from typing import Optional
+import os
+from typing import Dict, Literal, Optional, Tuple
 from pydantic import BaseModel, Field, validator
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _company_backends_from_env() -> Dict[int, str]:
+    """Parse ``ONBOARDKIT_KB_COMPANY_BACKENDS``, e.g. ``12=local,40=http``."""
+    pairs = (item.split("=", 1) for item in os.getenv("ONBOARDKIT_KB_COMPANY_BACKENDS", "").split(",") if "=" in item)
+    return {int(company.strip()): backend.strip() for company, backend in pairs}
+
+
 class Configuration(BaseModel):
     """Pydantic configuration for the onboarding agent."""
     
@@ -15,11 +23,197 @@ class Configuration(BaseModel):
     max_tokens: int = Field(default=1500, ge=1, le=4000, description="Maximum tokens to generate")
     llm_timeout: float = Field(default=45.0, gt=0, description="LLM timeout in seconds")
     
-    @validator('model')
+    # Model Tiers (router: the first call of a turn, which picks the search; answer: everything after)
+    model_tiers_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_MODEL_TIERS", "FALSE") == "TRUE",
+        description="Use the router tier for the first LLM call of a turn instead of the answer tier",
+    )
+    router_model: str = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_ROUTER_MODEL", "gpt-4o-mini"),
+        description="Model that decides whether and what to search",
+    )
+    router_max_tokens: int = Field(default=300, ge=1, le=4000, description="Maximum tokens the router tier may generate")
+    router_timeout: float = Field(default=15.0, gt=0, description="Router tier LLM timeout in seconds")
+    answer_model: Optional[str] = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_ANSWER_MODEL") or None,
+        description="Model that writes the answers (defaults to model)",
+    )
+    answer_max_tokens: Optional[int] = Field(default=None, ge=1, le=4000, description="Answer tier max tokens (defaults to max_tokens)")
+    answer_timeout: Optional[float] = Field(default=None, gt=0, description="Answer tier timeout in seconds (defaults to llm_timeout)")
+    router_escalation_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_ROUTER_ESCALATION", "TRUE") == "TRUE",
+        description="Also repeat router searches below router_min_confidence with the answer tier (direct answers always are)",
+    )
+    router_min_confidence: float = Field(default=0.5, ge=0, le=1, description="Router decisions scoring lower are escalated")
+    
+    # History Compaction
+    history_token_budget: int = Field(default=6000, ge=1, description="Token budget for the conversation history sent to the LLM")
+    history_keep_turns: int = Field(default=3, ge=0, description="Most recent turns that are always kept verbatim")
+    history_summary_token_budget: int = Field(default=600, ge=1, description="Token budget for the rolling summary of folded turns")
+    
+    # HTTP Connection Pool (shared by APIClient)
+    http_max_connections: int = Field(default=100, ge=1, description="Maximum open connections across all hosts")
+    http_max_keepalive_connections: int = Field(default=20, ge=0, description="Maximum idle keep-alive connections kept in the pool")
+    http_max_connections_per_host: int = Field(default=50, ge=1, description="Maximum concurrent requests to a single host")
+    http_keepalive_expiry: float = Field(default=30.0, gt=0, description="Seconds an idle keep-alive connection is kept open")
+    http_connect_timeout: float = Field(default=5.0, gt=0, description="Connection establishment timeout in seconds")
+    http2: bool = Field(default=False, description="Negotiate HTTP/2 when the optional h2 package is installed")
+    
+    # Knowledge Base Result Cache
+    kb_cache_enabled: bool = Field(default=True, description="Cache document_knowledge results per company and query")
+    kb_cache_ttl: float = Field(default=300.0, gt=0, description="Seconds a cached knowledge search result stays valid")
+    kb_cache_max_entries: int = Field(default=1024, ge=1, description="Maximum cached knowledge search results")
+    kb_cache_max_bytes: int = Field(default=32 * 1024 * 1024, ge=1, description="Approximate memory cap for cached results in bytes")
+    
+    # Knowledge Search Fan-out
+    kb_max_sub_queries: int = Field(default=5, ge=1, description="Maximum queries searched per document_knowledge call")
+    kb_fanout_concurrency: int = Field(default=4, ge=1, description="Concurrent knowledge searches per document_knowledge call")
+    kb_subquery_timeout: float = Field(default=8.0, gt=0, description="Timeout in seconds for each knowledge sub-query")
+    
+    # Retrieval Backend
+    kb_backend: Literal["http", "local"] = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_KB_BACKEND", "http"),
+        description="Default search backend: the knowledge-base API or the in-process vector index",
+    )
+    kb_company_backends: Dict[int, Literal["http", "local"]] = Field(
+        default_factory=_company_backends_from_env,
+        description="Per-company backend overrides of kb_backend; companies with a local index and no override search both",
+    )
+    kb_index_dir: str = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_KB_INDEX_DIR", "onboardkit_index"),
+        description="Directory holding one local vector index per company id",
+    )
+    kb_embedding_dim: int = Field(default=256, ge=8, description="Dimensions of the hashing embedder used by local indexes")
+    kb_vector_dtype: Literal["float32", "int8"] = Field(default="float32", description="Storage type of new local index vectors; int8 takes a quarter of the memory")
+    kb_ivf_min_chunks: int = Field(default=20000, ge=1, description="Local indexes with at least this many chunks are built partitioned")
+    kb_ivf_nprobe: int = Field(default=16, ge=1, description="Partitions scanned per query in a partitioned local index")
+    kb_hybrid_weight: float = Field(default=0.7, ge=0, le=1, description="Share of the vector score in local ranking; the rest is BM25")
+    kb_local_top_k: int = Field(default=5, ge=1, description="Chunks returned per local search")
+    kb_verify_access: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_KB_VERIFY_ACCESS", "TRUE") == "TRUE",
+        description="Serve local or cached knowledge only to tokens the knowledge-base API accepted for the company",
+    )
+    kb_access_ttl: float = Field(default=300.0, gt=0, description="Seconds a token stays trusted for a company after the API accepted it")
+    kb_access_probe_query: str = Field(default="onboarding", description="Search sent to the API to check a token it has not seen yet")
+    
+    # Document Ingestion
+    ingest_read_bytes: int = Field(default=64 * 1024, ge=1024, description="Bytes read from an upload at a time")
+    ingest_chunk_words: int = Field(default=200, ge=1, description="Words per indexed chunk")
+    ingest_overlap_words: int = Field(default=40, ge=0, description="Words shared by consecutive chunks so passages are not cut apart")
+    ingest_embed_batch: int = Field(default=64, ge=1, description="Chunks embedded and appended to the index per batch")
+    ingest_max_jobs: int = Field(default=200, ge=1, description="Ingestion jobs remembered for the jobs endpoint")
+    
+    # Knowledge Search Micro-Batching
+    kb_batching_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_KB_BATCHING", "FALSE") == "TRUE",
+        description="Send concurrent searches of one company as a single batched backend call",
+    )
+    kb_batch_window: float = Field(default=0.005, gt=0, description="Seconds the first search of a batch waits for others to join")
+    kb_batch_max_size: int = Field(default=32, ge=1, description="Searches that send a batch before its window ends")
+    kb_batch_endpoint_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_KB_BATCH_ENDPOINT", "FALSE") == "TRUE",
+        description="The knowledge-base API serves POST /knowledge/search/batch; without it searches are not batched",
+    )
+    
+    # Speculative Knowledge Prefetch
+    kb_prefetch_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_KB_PREFETCH", "FALSE") == "TRUE",
+        description="Search the knowledge base for the user message while the first LLM call of a turn runs",
+    )
+    kb_prefetch_similarity: float = Field(default=0.5, gt=0, le=1, description="Term Jaccard similarity the tool query needs to reuse the prefetch")
+    kb_prefetch_min_terms: int = Field(default=2, ge=1, description="Content words a message needs before it is prefetched")
+    
+    # Knowledge Context Packing
+    kb_context_token_budget: int = Field(default=2000, ge=1, description="Token budget for the knowledge context returned to the LLM")
+    kb_near_duplicate_threshold: float = Field(default=0.8, gt=0, le=1, description="Shingle Jaccard similarity above which chunks count as duplicates")
+    kb_shingle_size: int = Field(default=5, ge=1, description="Words per shingle for near-duplicate detection")
+    
+    # Fast-Path Router
+    fast_path_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_FAST_PATH", "FALSE") == "TRUE",
+        description="Answer greetings and acknowledgements from templates and send plain questions straight to the tools",
+    )
+    fast_path_classifier: bool = Field(default=False, description="Consult the small local classifier when no rule matches")
+    fast_path_classifier_threshold: float = Field(default=0.75, gt=0, le=1, description="Classifier confidence needed to take a fast-path route")
+    
+    # Answer Cache
+    answer_cache_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_ANSWER_CACHE", "FALSE") == "TRUE",
+        description="Serve repeated knowledge questions from stored answers without calling the LLM",
+    )
+    answer_cache_ttl: float = Field(default=900.0, gt=0, description="Seconds a stored answer stays valid")
+    answer_cache_max_entries: int = Field(default=2048, ge=1, description="Maximum stored answers")
+    answer_cache_max_bytes: int = Field(default=16 * 1024 * 1024, ge=1, description="Approximate memory cap for stored answers in bytes")
+    
+    # Session Store
+    session_idle_ttl: float = Field(default=3600.0, gt=0, description="Seconds of inactivity before a session is evicted")
+    session_max_sessions: int = Field(default=10000, ge=1, description="Maximum sessions kept per worker")
+    session_max_bytes: int = Field(default=512 * 1024 * 1024, ge=1, description="Approximate memory budget for all sessions in bytes")
+    session_sweep_interval: float = Field(default=60.0, gt=0, description="Seconds between background sweeps for idle sessions")
+    
+    # Compact Message Storage
+    compact_storage_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_COMPACT_STORAGE", "TRUE") == "TRUE",
+        description="Store checkpointed messages in a compact binary format and keep bulky tool results out of the history",
+    )
+    tool_payload_offload_min_bytes: int = Field(default=1024, ge=1, description="Tool results at least this long are moved out of the history")
+    tool_payload_max_entries: int = Field(default=20000, ge=1, description="Maximum tool results held in the payload store")
+    tool_payload_max_bytes: int = Field(default=64 * 1024 * 1024, ge=1, description="Memory cap for the in-process payload cache in bytes; evicted results are read back from the SQLite checkpointer, or reach the LLM as a stub with the memory one")
+    
+    # Admission Control
+    chat_max_concurrent_runs: int = Field(default=32, ge=1, description="Graph executions allowed to run at once per worker")
+    chat_max_queue: int = Field(default=64, ge=0, description="Chat requests allowed to wait for a run slot before 429s")
+    chat_queue_timeout: float = Field(default=10.0, gt=0, description="Seconds a chat request may wait for a run slot")
+    session_max_queued_turns: int = Field(default=2, ge=0, description="Turns allowed to wait behind a running turn of the same session")
+    llm_max_concurrent: int = Field(default=32, ge=1, description="LLM calls allowed in flight at once per worker")
+    llm_max_queue: int = Field(default=128, ge=0, description="LLM calls allowed to wait for a slot")
+    llm_queue_timeout: float = Field(default=30.0, gt=0, description="Seconds an LLM call may wait for a slot")
+    batch_max_concurrency: int = Field(default=8, ge=1, description="Workers per /chat/batch request")
+    
+    # Resumable Chat Streams
+    stream_buffer_events: int = Field(default=2048, ge=1, description="Recent chat events kept per session for reconnecting clients")
+    stream_retention: float = Field(default=300.0, gt=0, description="Seconds a finished turn's events stay replayable")
+    
+    # Upstream Resilience (LLM provider and knowledge base)
+    resilience_enabled: bool = Field(default=True, description="Rate limit, retry and circuit-break LLM and API calls")
+    llm_rate_limit_rps: float = Field(default=20.0, gt=0, description="Requests per second allowed per model")
+    llm_rate_limit_burst: float = Field(default=40.0, ge=1, description="Burst size of the per-model rate limit")
+    http_rate_limit_rps: float = Field(default=100.0, gt=0, description="Requests per second allowed per upstream host")
+    http_rate_limit_burst: float = Field(default=200.0, ge=1, description="Burst size of the per-host rate limit")
+    retry_max_attempts: int = Field(default=4, ge=1, description="Attempts per call including the first")
+    retry_base_delay: float = Field(default=0.25, gt=0, description="Base delay in seconds for exponential backoff")
+    retry_max_delay: float = Field(default=8.0, gt=0, description="Maximum backoff delay in seconds")
+    breaker_failure_threshold: int = Field(default=5, ge=1, description="Consecutive failures that open a circuit breaker")
+    breaker_reset_timeout: float = Field(default=30.0, gt=0, description="Seconds an open breaker fails fast before probing")
+    
+    # Checkpoint Persistence
+    checkpointer: Literal["memory", "sqlite"] = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_CHECKPOINTER", "memory"),
+        description="Checkpoint backend; 'sqlite' lets several workers share sessions through one file",
+    )
+    checkpoint_path: str = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_CHECKPOINT_PATH", "onboardkit_checkpoints.db"),
+        description="SQLite database file for checkpoints and sessions",
+    )
+    checkpoint_flush_interval: float = Field(default=0.005, ge=0, description="Seconds to gather checkpoint writes into one transaction")
+    checkpoint_max_batch: int = Field(default=64, ge=1, description="Flush a checkpoint batch early once it holds this many writes")
+    checkpoint_keep_last: int = Field(default=20, ge=0, description="Checkpoints kept per thread (0 keeps full history)")
+    
+    # Observability
+    metrics_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_METRICS", "TRUE") == "TRUE",
+        description="Record hot-path metrics and expose them on /metrics",
+    )
+    json_logs_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ONBOARDKIT_JSON_LOGS", "FALSE") == "TRUE",
+        description="Emit structured JSON events (LLM calls, tool searches, chat turns) to stdout",
+    )
+    
+    @validator('model', 'router_model', 'answer_model')
     def validate_model(cls, v):
         """Validate that the model is supported."""
-        supported_models = ["gpt-4o", "gpt-4", "gpt-3.5-turbo"]
-        if v not in supported_models:
+        supported_models = ["gpt-4o", "gpt-4o-mini", "gpt-4", "gpt-3.5-turbo"]
+        if v is not None and v not in supported_models:
             raise ValueError(f"Model must be one of {supported_models}")
         return v
     
@@ -44,14 +238,31 @@ class Configuration(BaseModel):
         """Create a Configuration instance from a RunnableConfig object."""
         return cls()
 
-    def create_llm(self):
-        """Create an LLM instance with the configured parameters."""
+    def llm_settings(self, role: str = "answer") -> Tuple[str, int, float]:
+        """Model, max_tokens and timeout of a role ("router" or "answer"); one tier for both when tiers are off."""
+        if not self.model_tiers_enabled:
+            return self.model, self.max_tokens, self.llm_timeout
+        if role == "router":
+            return self.router_model, self.router_max_tokens, self.router_timeout
+        return (
+            self.answer_model or self.model,
+            self.answer_max_tokens or self.max_tokens,
+            self.answer_timeout or self.llm_timeout,
+        )
+
+    def create_llm(self, role: str = "answer"):
+        """Create an LLM instance with the configured parameters of a role."""
         from langchain_openai import ChatOpenAI
         
+        model, max_tokens, timeout = self.llm_settings(role)
         return ChatOpenAI(
-            model=self.model,
-            max_tokens=self.max_tokens,
-            timeout=self.llm_timeout
+            model=model,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            # Retries are handled by the shared resilience layer when it is enabled
+            max_retries=0 if self.resilience_enabled else 2,
+            # Report token usage on streamed responses too
+            stream_usage=True
         )
     
     class Config:
@@ -0,0 +1,261 @@
+"""In-process metrics (Prometheus text format) and structured JSON events for the hot path."""
+
+import bisect
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from .config import Configuration
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM completions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Keys whose values never reach logs or metric labels
+SENSITIVE_KEYS = frozenset({"auth_token", "authorization", "api_key", "password"})
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [*key, extra] if extra else list(key)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[Tuple[str, LabelKey, Optional[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str):
+        super().__init__(registry, name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not self._registry.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}_total", key, None, value
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set explicitly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str):
+        super().__init__(registry, name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        if not self._registry.enabled:
+            return
+        self._values[_label_key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                yield self.name, (), None, float(self._function())
+            except Exception:
+                return
+            return
+        for key, value in list(self._values.items()):
+            yield self.name, key, None, value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, buckets: Iterable[float]):
+        super().__init__(registry, name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelKey, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not self._registry.enabled:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, **labels: Any) -> Dict[str, float]:
+        """Count and sum for one label set (for tests and /stats)."""
+        series = self._series.get(_label_key(labels))
+        return {"count": series[2], "sum": series[1]} if series else {"count": 0, "sum": 0.0}
+
+    def samples(self):
+        for key, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key, ("le", _format_value(bound)), cumulative
+            yield f"{self.name}_sum", key, None, total
+            yield f"{self.name}_count", key, None, count
+
+
+class MetricsRegistry:
+    """Named metrics created on first use; disabled registries make every update a no-op."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, documentation: str, *args) -> Any:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(self, name, documentation, *args)
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get(Counter, name, documentation)
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._get(Gauge, name, documentation)
+
+    def histogram(self, name: str, documentation: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, buckets)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# --- Redaction ---
+def redact(value: Any, depth: int = 4) -> Any:
+    """Copy of ``value`` with credentials masked in nested dicts and lists."""
+    if depth <= 0:
+        return value
+    if isinstance(value, dict):
+        return {
+            k: "***" if isinstance(k, str) and k.lower() in SENSITIVE_KEYS else redact(v, depth - 1)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(v, depth - 1) for v in value]
+    if type(value) is tuple:
+        return tuple(redact(v, depth - 1) for v in value)
+    return value
+
+
+def _redact_processor(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    return redact(event_dict)
+
+
+# --- Registry & Structured Logging ---
+_config = Configuration()
+metrics = MetricsRegistry(enabled=_config.metrics_enabled)
+
+structlog.configure(
+    processors=[
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
+        _redact_processor,
+        structlog.processors.JSONRenderer(),
+    ],
+    logger_factory=structlog.PrintLoggerFactory(),
+    cache_logger_on_first_use=True,
+)
+_logger = structlog.get_logger("onboardkit")
+json_logs_enabled = _config.json_logs_enabled
+
+
+def log_event(event: str, **fields: Any) -> None:
+    """Emit one structured JSON event; a single flag check when JSON logging is off."""
+    if json_logs_enabled:
+        _logger.info(event, **fields)
+
+
+# --- Hot-Path Metrics ---
+NODE_DURATION = metrics.histogram("onboardkit_node_duration_seconds", "Graph node execution time")
+NODE_ERRORS = metrics.counter("onboardkit_node_errors", "Graph node executions that raised")
+ROUTE_DECISIONS = metrics.counter("onboardkit_route_decisions", "Routing decisions taken after the agent node")
+
+LLM_TTFT = metrics.histogram("onboardkit_llm_ttft_seconds", "Time from LLM request to the first streamed chunk")
+LLM_DURATION = metrics.histogram("onboardkit_llm_duration_seconds", "Total LLM call time including retries")
+LLM_PROMPT_TOKENS = metrics.histogram("onboardkit_llm_prompt_tokens", "Prompt tokens per LLM call", TOKEN_BUCKETS)
+LLM_COMPLETION_TOKENS = metrics.histogram("onboardkit_llm_completion_tokens", "Completion tokens per LLM call", TOKEN_BUCKETS)
+LLM_ERRORS = metrics.counter("onboardkit_llm_errors", "Failed LLM calls by exception type")
+
+HTTP_DURATION = metrics.histogram("onboardkit_http_request_duration_seconds", "Upstream HTTP request time including retries")
+HTTP_RESPONSE_BYTES = metrics.histogram("onboardkit_http_response_bytes", "Upstream HTTP response body size", BYTE_BUCKETS)
+HTTP_ERRORS = metrics.counter("onboardkit_http_errors", "Failed upstream HTTP requests by status")
+
+KB_SEARCH_DURATION = metrics.histogram("onboardkit_kb_search_duration_seconds", "document_knowledge search time across sub-queries")
+KB_DOCUMENTS = metrics.histogram("onboardkit_kb_documents", "Documents returned per document_knowledge call", (0, 1, 2, 5, 10, 20, 50, 100))
+KB_CONTEXT_TOKENS = metrics.histogram("onboardkit_kb_context_tokens", "Packed knowledge context size", TOKEN_BUCKETS)
+KB_BACKEND_DURATION = metrics.histogram(
+    "onboardkit_kb_backend_search_seconds", "Single knowledge search time per retrieval backend",
+    (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+KB_BATCH_SIZE = metrics.histogram("onboardkit_kb_batch_size", "Searches per micro-batched backend call", (1, 2, 4, 8, 16, 32, 64, 128))
+KB_BATCH_WAIT = metrics.histogram(
+    "onboardkit_kb_batch_wait_seconds", "Time a search waited for its micro-batch to be sent",
+    (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1),
+)
+
+ANSWER_CACHE_LOOKUPS = metrics.counter("onboardkit_answer_cache_lookups", "Answer-cache lookups by result")
+
+CHAT_TTFB = metrics.histogram("onboardkit_chat_first_event_seconds", "Time from admission to the first streamed chat event")
+CHAT_DURATION = metrics.histogram("onboardkit_chat_duration_seconds", "Chat turn execution time")
+CHAT_QUEUE_WAIT = metrics.histogram("onboardkit_chat_queue_wait_seconds", "Time a chat turn waited for admission")
+CHAT_TURNS = metrics.counter("onboardkit_chat_turns", "Chat turns by outcome")
+
@@ -0,0 +1,299 @@
+"""Rate limiting, retries and circuit breaking for upstream calls (LLM provider, knowledge base)."""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import Configuration
+
+# (retryable, retry_after seconds, throttled) for a finished attempt
+Verdict = Tuple[bool, Optional[float], bool]
+
+RETRYABLE_STATUS = {408, 500, 502, 503, 504}
+_TRANSIENT_ERRORS = ("APITimeoutError", "APIConnectionError", "TimeoutError", "ConnectError", "ReadTimeout")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when waiting for a rate-limit token or a retry would overrun the deadline."""
+
+
+class PartialOutputError(Exception):
+    """
+    An attempt failed after part of its output already reached the caller (e.g.
+    streamed tokens); it counts as a failure but is never retried. The original
+    error is the ``__cause__``.
+    """
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate adapts to upstream throttling (AIMD).
+
+    A 429 halves the rate and, when the upstream sent Retry-After, blocks every
+    caller until then; each success recovers a small step towards ``max_rate``.
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, clock: Callable[[], float] = time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = burst
+        self.blocked_until = 0.0
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, deadline: float) -> None:
+        while True:
+            now = self._clock()
+            self._refill(now)
+            wait = max(self.blocked_until - now, 0.0)
+            if not wait and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = wait or (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise DeadlineExceededError("Rate limit wait would exceed the deadline")
+            await asyncio.sleep(wait)
+
+    def on_throttle(self, retry_after: Optional[float]) -> None:
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, self._clock() + retry_after)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe through after ``reset_timeout``."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._clock = clock
+
+    def before_call(self) -> None:
+        if self.state == self.OPEN:
+            if self._clock() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Circuit breaker is open")
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                raise CircuitOpenError("Circuit breaker is half-open and a probe is in flight")
+            self._probing = True
+
+    def abort_probe(self) -> None:
+        """The attempt let through by ``before_call`` ended without a verdict (e.g. cancelled); free the probe slot."""
+        self._probing = False
+
+    def on_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+            self._probing = False
+
+
+class Upstream:
+    """Rate limit, retry policy and circuit breaker for one upstream (a model or a host)."""
+
+    def __init__(self, name: str, bucket: TokenBucket, breaker: CircuitBreaker, max_attempts: int, base_delay: float, max_delay: float):
+        self.name = name
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "throttled": 0, "failures": 0, "short_circuited": 0, "gave_up": 0}
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after
+        # Full jitter: uniform over the exponential window
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def call(
+        self,
+        attempt_fn: Callable[[float], Awaitable[Any]],
+        classify: Callable[[Any, Optional[BaseException]], Verdict],
+        deadline_seconds: float,
+    ) -> Any:
+        """
+        Run ``attempt_fn(remaining_seconds)`` until it succeeds, is not retryable,
+        runs out of attempts or would overrun the deadline.
+        """
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + deadline_seconds
+        attempt = 0
+        while True:
+            # The token comes first: a deadline error while waiting must not strand a half-open probe
+            await self.bucket.acquire(deadline)
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.counters["short_circuited"] += 1
+                raise
+
+            attempt += 1
+            self.counters["attempts"] += 1
+            result, error = None, None
+            try:
+                result = await attempt_fn(max(deadline - time.monotonic(), 0.001))
+            except Exception as e:
+                error = e
+            except BaseException:
+                # Cancelled: no verdict on the upstream, but the next call may probe again
+                self.breaker.abort_probe()
+                raise
+            retryable, retry_after, throttled = classify(result, error)
+
+            if retryable and isinstance(error, PartialOutputError):
+                self.counters["failures"] += 1
+                self.counters["gave_up"] += 1
+                self.breaker.on_failure()
+                raise error
+
+            if not retryable:
+                # Answers (including 4xx errors) mean the upstream itself is healthy
+                self.breaker.on_success()
+                self.bucket.on_success()
+                if error is not None:
+                    raise error
+                return result
+
+            if throttled:
+                self.counters["throttled"] += 1
+                self.bucket.on_throttle(retry_after)
+                self.breaker.on_success()
+            else:
+                self.counters["failures"] += 1
+                self.breaker.on_failure()
+
+            delay = self._backoff(attempt, retry_after)
+            if (
+                attempt >= self.max_attempts
+                or self.breaker.state == CircuitBreaker.OPEN
+                or time.monotonic() + delay >= deadline
+            ):
+                self.counters["gave_up"] += 1
+                if error is not None:
+                    raise error
+                return result
+            self.counters["retries"] += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "breaker_state": self.breaker.state,
+            "breaker_failures": self.breaker.failures,
+            "breaker_opened": self.breaker.times_opened,
+            "rate": round(self.bucket.rate, 3),
+            "max_rate": self.bucket.max_rate,
+        }
+
+
+class Resilience:
+    """Registry of per-model and per-host upstream guards sharing one configuration."""
+
+    def __init__(self, config: Optional[Configuration] = None):
+        self.config = config or Configuration()
+        self._upstreams: Dict[str, Upstream] = {}
+
+    def upstream(self, kind: str, name: str) -> Upstream:
+        """Guard for ``kind`` ('llm' per model, 'http' per host), created on first use."""
+        key = f"{kind}:{name}"
+        upstream = self._upstreams.get(key)
+        if upstream is None:
+            config = self.config
+            rate, burst = (
+                (config.llm_rate_limit_rps, config.llm_rate_limit_burst)
+                if kind == "llm"
+                else (config.http_rate_limit_rps, config.http_rate_limit_burst)
+            )
+            upstream = self._upstreams[key] = Upstream(
+                key,
+                TokenBucket(rate, burst, min_rate=rate * 0.05),
+                CircuitBreaker(config.breaker_failure_threshold, config.breaker_reset_timeout),
+                max_attempts=config.retry_max_attempts,
+                base_delay=config.retry_base_delay,
+                max_delay=config.retry_max_delay,
+            )
+        return upstream
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: upstream.stats() for key, upstream in self._upstreams.items()}
+
+
+def classify_llm_error(result: Any, error: Optional[BaseException]) -> Verdict:
+    """Retry provider throttling (429), 5xx, timeouts and connection errors."""
+    if error is None:
+        return False, None, False
+    if isinstance(error, PartialOutputError) and error.__cause__ is not None:
+        # Judged by the underlying error; Upstream.call never retries it
+        return classify_llm_error(result, error.__cause__)
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    retry_after = parse_retry_after(getattr(response, "headers", {}).get("retry-after")) if response is not None else None
+    if status == 429:
+        return True, retry_after, True
+    if status in RETRYABLE_STATUS or type(error).__name__ in _TRANSIENT_ERRORS or isinstance(error, asyncio.TimeoutError):
+        return True, retry_after, False
+    return False, None, False
+
+
+def classify_http_result(result: Any, error: Optional[BaseException]) -> Verdict:
+    """Retry APIClient error responses for 429, 5xx, timeouts and connection failures (status 0)."""
+    if error is not None:
+        return classify_llm_error(result, error)
+    if not isinstance(result, dict) or result.get("success"):
+        return False, None, False
+    status = result.get("status_code")
+    if status == 429:
+        return True, result.get("retry_after"), True
+    if status == 0 or status in RETRYABLE_STATUS:
+        return True, result.get("retry_after"), False
+    return False, None, False
+
+
+resilience = Resilience()
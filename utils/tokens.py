@@ -0,0 +1,74 @@
+"""Token counting helpers for the OnboardKit agent starter kit."""
+
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Tuple
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Token counts of recently seen texts, keyed by a digest so the cache never holds the texts themselves
+_COUNT_CACHE_SIZE = 8192
+_counts: "OrderedDict[Tuple[bytes, str], int]" = OrderedDict()
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Optional[Any]:
+    """Return the tiktoken encoding for a model, or None when tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken downloads encodings on first use; offline hosts fall back to the heuristic
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count tokens in ``text``; falls back to ~4 characters per token without tiktoken.
+
+    Counts are cached by a 16-byte digest of the text (hashing is far cheaper
+    than encoding), so repeated history and tool results are counted once
+    without the cache keeping every long string alive.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    key = (hashlib.blake2b(text.encode(), digest_size=16).digest(), model)
+    count = _counts.get(key)
+    if count is not None:
+        _counts.move_to_end(key)
+        return count
+    count = _counts[key] = len(encoding.encode(text, disallowed_special=()))
+    if len(_counts) > _COUNT_CACHE_SIZE:
+        _counts.popitem(last=False)
+    return count
+
+
+def message_text(message: Any) -> str:
+    """Flatten a message's content (string or content blocks) and tool calls into text."""
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        content = "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block) for block in content
+        )
+    text = content if isinstance(content, str) else str(content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps([{"name": call["name"], "args": call["args"]} for call in tool_calls])
+    return text
+
+
+def count_message_tokens(messages: Iterable[Any], model: str = "gpt-4o") -> int:
+    """Approximate prompt tokens for a sequence of messages."""
+    return sum(count_tokens(message_text(message), model) + MESSAGE_OVERHEAD_TOKENS for message in messages)
@@ -1,26 +1,42 @@
 """Streamlined utility functions and helpers for the OnboardKit agent starter kit."""
 
+import asyncio
 import httpx
 import json
 import os
+import time
 import uuid
 from typing import Dict, Any, Optional, List, Union, AsyncGenerator
-from langchain_core.messages import ToolMessage, AIMessage, HumanMessage
+from langchain_core.messages import ToolMessage, AIMessage, HumanMessage, message_chunk_to_message
 from langchain_core.runnables import RunnableConfig
-import aiohttp
+from .concurrency import ConcurrencyLimiter
 from .config import Configuration
-from .state import State
-from .tools import TOOLS
+from .metrics import (
+    HTTP_DURATION, HTTP_ERRORS, HTTP_RESPONSE_BYTES, LLM_COMPLETION_TOKENS, LLM_DURATION, LLM_ERRORS,
+    LLM_PROMPT_TOKENS, LLM_TTFT, log_event, redact
+)
+from .model_tiers import ROUTER_TAG, record_tier_call
+from .prompt_builder import build_prompt, record_usage
+from .resilience import (
+    CircuitOpenError, DeadlineExceededError, PartialOutputError, classify_http_result, classify_llm_error,
+    parse_retry_after, resilience
+)
 
 
 # ===============================================
 # ====================debug======================
 # ===============================================
+# Read once: debug_print sits on the hot path and is a no-op outside development
+_DEBUG = os.getenv("DEVELOPMENT_SERVER", "FALSE") == "TRUE"
+
+
 def debug_print(*args, **kwargs):
-    if os.getenv("DEVELOPMENT_SERVER", "FALSE") == "TRUE":
-        print("===============================================")
-        print(*args, **kwargs)
-        print("===============================================")
+    if not _DEBUG:
+        return
+    print("===============================================")
+    # Never print credentials (the state carries the user's auth_token)
+    print(*(redact(arg) for arg in args), **kwargs)
+    print("===============================================")
 
 
 # --- API Configuration ---
@@ -31,10 +47,133 @@ KNOWLEDGE_BASE_URL = os.getenv("STARTERKIT_KNOWLEDGE_BASE_URL", "https://knowled
 
 # --- API Client ---
 class APIClient:
-    """A minimal asynchronous client for making API requests."""
+    """
+    A minimal asynchronous client for making API requests.
+
+    All requests share one process-wide ``httpx.AsyncClient`` so keep-alive
+    connections (and TLS sessions) are reused across tool calls. The pool is
+    opened and closed by the FastAPI lifespan; callers outside the server
+    (CLI, LangGraph Studio) get a lazily opened pool on first use.
+    """
+
+    _client: Optional[httpx.AsyncClient] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _config: Optional[Configuration] = None
+    _global_slots: Optional[asyncio.Semaphore] = None
+    _host_slots: Dict[str, asyncio.Semaphore] = {}
+    _stats: Dict[str, Any] = {
+        "requests": 0,
+        "in_use": 0,
+        "waits": 0,
+        "wait_seconds": 0.0,
+        "in_use_per_host": {},
+    }
+
+    @classmethod
+    async def open(cls, config: Optional[Configuration] = None) -> httpx.AsyncClient:
+        """Open the shared connection pool (idempotent within an event loop)."""
+        loop = asyncio.get_running_loop()
+        if cls._client is not None and not cls._client.is_closed and cls._loop is loop:
+            return cls._client
+
+        config = config or Configuration()
+        http2 = config.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                debug_print("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1")
+                http2 = False
+
+        cls._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.http_max_connections,
+                max_keepalive_connections=config.http_max_keepalive_connections,
+                keepalive_expiry=config.http_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(60.0, connect=config.http_connect_timeout),
+            http2=http2,
+        )
+        cls._loop = loop
+        cls._config = config
+        cls._global_slots = asyncio.Semaphore(config.http_max_connections)
+        cls._host_slots = {}
+        return cls._client
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared connection pool and drop all keep-alive connections."""
+        client, cls._client, cls._loop = cls._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
 
-    @staticmethod
+    @classmethod
+    def pool_stats(cls) -> Dict[str, Any]:
+        """Snapshot of pool usage for sizing the connection limits."""
+        idle = connections = 0
+        pool = getattr(getattr(cls._client, "_transport", None), "_pool", None)
+        for connection in getattr(pool, "connections", []) or []:
+            connections += 1
+            if connection.is_idle():
+                idle += 1
+        config = cls._config or Configuration()
+        return {
+            "open": cls._client is not None and not cls._client.is_closed,
+            "connections": connections,
+            "idle": idle,
+            "in_use": cls._stats["in_use"],
+            "in_use_per_host": dict(cls._stats["in_use_per_host"]),
+            "requests": cls._stats["requests"],
+            "waits": cls._stats["waits"],
+            "wait_seconds": round(cls._stats["wait_seconds"], 6),
+            "max_connections": config.http_max_connections,
+            "max_keepalive_connections": config.http_max_keepalive_connections,
+            "max_connections_per_host": config.http_max_connections_per_host,
+        }
+
+    @classmethod
+    async def _acquire(cls, host: str) -> asyncio.Semaphore:
+        """
+        Take a per-host and then a global slot, recording whether the caller had to wait.
+
+        The host slot comes first so a request queued behind a busy host does
+        not hold a global slot that requests to other hosts could use.
+        """
+        host_slot = cls._host_slots.get(host)
+        if host_slot is None:
+            host_slot = cls._host_slots[host] = asyncio.Semaphore(cls._config.http_max_connections_per_host)
+
+        waited = cls._global_slots.locked() or host_slot.locked()
+        started = time.perf_counter()
+        await host_slot.acquire()
+        try:
+            await cls._global_slots.acquire()
+        except BaseException:
+            host_slot.release()
+            raise
+        if waited:
+            cls._stats["waits"] += 1
+            cls._stats["wait_seconds"] += time.perf_counter() - started
+
+        per_host = cls._stats["in_use_per_host"]
+        per_host[host] = per_host.get(host, 0) + 1
+        cls._stats["in_use"] += 1
+        cls._stats["requests"] += 1
+        return host_slot
+
+    @classmethod
+    def _release(cls, host: str, host_slot: asyncio.Semaphore) -> None:
+        per_host = cls._stats["in_use_per_host"]
+        per_host[host] -= 1
+        if not per_host[host]:
+            del per_host[host]
+        cls._stats["in_use"] -= 1
+        host_slot.release()
+        cls._global_slots.release()
+
+    @classmethod
     async def make_request(
+        cls,
         url: str,
         method: str = "GET",
         data: Optional[Dict[str, Any]] = None,
@@ -42,89 +181,203 @@ class APIClient:
         use_form_data: bool = False,
         timeout: float = 60.0
     ) -> Dict[str, Any]:
-        """Generic asynchronous API request."""
+        """Generic asynchronous API request, rate limited and retried per upstream host."""
         headers = {}
         if auth_token:
             headers["Authorization"] = f"Bearer {auth_token}"
 
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        request_kwargs = {"headers": headers}
+        if data:
+            if use_form_data:
+                request_kwargs["data"] = data
+            else:
+                request_kwargs["json"] = data
+
+        client = await cls.open(cls._config)
+        host = httpx.URL(url).host
+        started = time.perf_counter()
+        if not resilience.config.resilience_enabled:
+            result = await cls._request_once(client, host, method, url, request_kwargs, timeout)
+        else:
+            try:
+                result = await resilience.upstream("http", host).call(
+                    lambda remaining: cls._request_once(client, host, method, url, request_kwargs, min(timeout, remaining)),
+                    classify_http_result,
+                    deadline_seconds=resilience.config.llm_timeout,
+                )
+            except CircuitOpenError:
+                result = _create_error_response(f"{host} is temporarily unavailable (circuit open)", status_code=503)
+            except DeadlineExceededError:
+                result = _create_error_response(f"Request to {host} could not complete within the deadline", status_code=0)
+
+        elapsed = time.perf_counter() - started
+        status = "ok" if result.get("success") else str(result.get("status_code", 0))
+        HTTP_DURATION.observe(elapsed, host=host, status=status)
+        if status != "ok":
+            HTTP_ERRORS.inc(host=host, status=status)
+        log_event("http_request", host=host, method=method, status=status, duration_ms=round(elapsed * 1000, 2))
+        return result
+
+    @classmethod
+    async def _request_once(
+        cls,
+        client: httpx.AsyncClient,
+        host: str,
+        method: str,
+        url: str,
+        request_kwargs: Dict[str, Any],
+        timeout: float
+    ) -> Dict[str, Any]:
+        """A single attempt over the shared pool."""
+        host_slot = await cls._acquire(host)
+        try:
+            response = await client.request(method, url, timeout=timeout, **request_kwargs)
+            response.raise_for_status()
+            HTTP_RESPONSE_BYTES.observe(len(response.content), host=host)
+
+            try:
+                response_json = response.json()
+                return _create_success_response(response_json, {}, "API call successful")
+            except json.JSONDecodeError:
+                return _create_error_response(f"API call successful but response is not valid JSON. Status: {response.status_code}", status_code=response.status_code)
+
+        except httpx.HTTPStatusError as e:
             try:
-                request_kwargs = {"headers": headers}
-                if data:
-                    if use_form_data:
-                        request_kwargs["data"] = data
-                    else:
-                        request_kwargs["json"] = data
-                
-                response = await client.request(method, url, **request_kwargs)
-                response.raise_for_status()
-
-                try:
-                    response_json = response.json()
-                    return _create_success_response(response_json, {}, "API call successful")
-                except json.JSONDecodeError:
-                    return _create_error_response(f"API call successful but response is not valid JSON. Status: {response.status_code}", status_code=response.status_code)
-
-            except httpx.HTTPStatusError as e:
-                try:
-                    error_json = e.response.json()
-                    error_message = error_json.get("message") or error_json.get("error") or f"HTTP Error: {e.response.status_code}"
-                except:
-                    error_message = f"HTTP Error: {e.response.status_code} - {e.response.text[:100]}"
-                return _create_error_response(error_message, status_code=e.response.status_code)
-                
-            except httpx.RequestError as e:
-                return _create_error_response(f"Request Error: Could not connect to API or request timed out: {e.__class__.__name__}", status_code=0)
-            except Exception as e:
-                return _create_error_response(f"An unexpected error occurred during API request: {e.__class__.__name__}", status_code=0)
+                error_json = e.response.json()
+                error_message = error_json.get("message") or error_json.get("error") or f"HTTP Error: {e.response.status_code}"
+            except:
+                error_message = f"HTTP Error: {e.response.status_code} - {e.response.text[:100]}"
+            error = _create_error_response(error_message, status_code=e.response.status_code)
+            error["retry_after"] = parse_retry_after(e.response.headers.get("retry-after"))
+            return error
+            
+        except httpx.RequestError as e:
+            return _create_error_response(f"Request Error: Could not connect to API or request timed out: {e.__class__.__name__}", status_code=0)
+        except Exception as e:
+            return _create_error_response(f"An unexpected error occurred during API request: {e.__class__.__name__}", status_code=0)
+        finally:
+            cls._release(host, host_slot)
 
 
 # --- Agent Core Helpers ---
 
-async def generate_llm_response(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+_llm_config = Configuration()
+# Caps in-flight LLM calls across all graph runs in this worker
+llm_limiter = ConcurrencyLimiter(
+    "llm",
+    max_concurrent=_llm_config.llm_max_concurrent,
+    max_queue=_llm_config.llm_max_queue,
+    queue_timeout=_llm_config.llm_queue_timeout,
+)
+
+# Bound LLM clients, memoized per LLM-relevant configuration
+_bound_llms: Dict[tuple, Any] = {}
+
+
+def get_llm_with_tools(config: Configuration, role: str = "answer"):
+    """Return the tool-bound LLM of a role, creating and binding it only once per role and model settings."""
+    key = (role, *config.llm_settings(role))
+    llm_with_tools = _bound_llms.get(key)
+    if llm_with_tools is None:
+        # Imported here: the tools module itself depends on this module
+        from .tools import TOOLS
+        llm_with_tools = config.create_llm(role).bind_tools(TOOLS)
+        if role == "router":
+            # Lets the server keep router tokens out of the client stream
+            llm_with_tools = llm_with_tools.with_config(tags=[ROUTER_TAG])
+        _bound_llms[key] = llm_with_tools
+    return llm_with_tools
+
+
+async def generate_llm_response(
+    state: Dict[str, Any], config: Optional[RunnableConfig] = None, role: str = "answer"
+) -> Dict[str, Any]:
     """
     Generates a response from the LLM based on the current state.
-    This function wraps the LLM call with tool binding.
+    This function wraps the LLM call with tool binding; ``role`` picks the model tier.
     """
-    # Create LLM and bind tools
-    llm = Configuration.from_runnable_config(config).create_llm()
-    llm_with_tools = llm.bind_tools(TOOLS)
+    configuration = Configuration.from_runnable_config(config)
+    model, _, llm_timeout = configuration.llm_settings(role)
+    llm_with_tools = get_llm_with_tools(configuration, role)
     
-    # Format current state for prompt injection
-    current_state_vars = {
-        k: v for k, v in state.items() if k in State.__annotations__ or k in ["last_error"]
-    }
-    
-    from .prompts import SYSTEM_PROMPT
-    # Fallback/placeholder values for missing keys in state for prompt formatting
-    prompt_kwargs = {
-        "auth_token": "", "user_id": 0, "company_id": 0, "email": "", "first_name": "", 
-        "last_name": "", "full_name": "", "company_name": "", "init": False, 
-        "welcome_message": False, "last_error": "", "personalized_name": state.get("full_name") or "valued user",
-        "knowledge_base_search_performed": False,
-        **current_state_vars
-    }
+    # Static prefix + history, with the per-session state in a trailing block
+    messages, prompt_tokens = await build_prompt(state, model)
     
-    system_prompt = SYSTEM_PROMPT.format(**prompt_kwargs)
-    
-    # Prepare messages
-    messages = [
-        ("system", system_prompt),
-        *state.get("messages", [])
-    ]
-    
-    debug_print("LLM Input Messages (last 2 only):", messages[-2:])
+    debug_print("LLM Input Messages (last 2 only):", messages[-2:], prompt_tokens)
+
+    first_chunk_at: List[float] = []
 
-    # Invoke LLM
+    async def stream_response():
+        # Streamed so time-to-first-token can be measured; the chunks are merged into one message
+        response = None
+        async for chunk in llm_with_tools.astream(messages):
+            if response is None:
+                first_chunk_at.append(time.perf_counter())
+                response = chunk
+            else:
+                response = response + chunk
+        return message_chunk_to_message(response) if response is not None else AIMessage(content="")
+
+    async def invoke_once(remaining: float = llm_timeout):
+        await llm_limiter.acquire()
+        attempt_started = time.perf_counter()
+        first_chunk_at.clear()
+        try:
+            response = await asyncio.wait_for(stream_response(), remaining)
+            if first_chunk_at:
+                LLM_TTFT.observe(first_chunk_at[0] - attempt_started, model=model, tier=role)
+            return response
+        except Exception as e:
+            # Tokens of this attempt may already be on their way to the client; a retry would send them twice
+            if first_chunk_at:
+                raise PartialOutputError(f"Stream failed after output was sent: {e.__class__.__name__}: {e}") from e
+            raise
+        finally:
+            llm_limiter.release(time.perf_counter() - attempt_started)
+
+    # Invoke LLM (rate limited, retried with backoff and circuit-broken per model)
+    started = time.perf_counter()
     try:
-        response = await llm_with_tools.ainvoke(messages)
+        if configuration.resilience_enabled:
+            response = await resilience.upstream("llm", model).call(
+                invoke_once, classify_llm_error, deadline_seconds=llm_timeout
+            )
+        else:
+            response = await invoke_once()
+        _record_llm_call(model, role, response, time.perf_counter() - started, prompt_tokens)
         return {"messages": [response], "last_error": ""}
     except Exception as e:
         error_msg = f"LLM generation failed: {e.__class__.__name__}: {str(e)}"
+        elapsed = time.perf_counter() - started
         debug_print(error_msg)
+        LLM_ERRORS.inc(model=model, tier=role, error=e.__class__.__name__)
+        record_tier_call(role, model, elapsed, 0, 0, failed=True)
+        log_event("llm_error", model=model, tier=role, error=e.__class__.__name__,
+                  duration_ms=round(elapsed * 1000, 2))
         return {"messages": [AIMessage(content=error_msg)], "last_error": error_msg}
 
 
+def _record_llm_call(model: str, role: str, response: Any, elapsed: float, estimated: Dict[str, int]) -> None:
+    """Token and latency metrics for one LLM call; falls back to the local token estimate without usage data."""
+    usage = getattr(response, "usage_metadata", None)
+    record_usage(usage)
+    prompt_tokens = (usage or {}).get("input_tokens") or estimated["prompt_tokens"]
+    completion_tokens = (usage or {}).get("output_tokens", 0)
+    LLM_DURATION.observe(elapsed, model=model, tier=role)
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, model=model, tier=role)
+    LLM_COMPLETION_TOKENS.observe(completion_tokens, model=model, tier=role)
+    record_tier_call(role, model, elapsed, prompt_tokens, completion_tokens)
+    log_event(
+        "llm_call",
+        model=model,
+        tier=role,
+        duration_ms=round(elapsed * 1000, 2),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        tool_calls=len(getattr(response, "tool_calls", None) or []),
+    )
+
+
 def build_result(llm_output: Dict[str, Any]) -> Dict[str, Any]:
     """
     Processes the raw LLM output and tool results, aggregating state updates.